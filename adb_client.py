@@ -0,0 +1,304 @@
+"""
+Client thuần Python cho giao thức của adb server (localhost:5037).
+Không fork process `adb` cho mỗi lệnh: lệnh host (devices, forward) dùng
+một kết nối TCP ngắn tới server, còn lệnh shell chạy qua một phiên shell
+giữ mở cho từng thiết bị và được dùng lại giữa các lần gọi.
+"""
+import os
+import select
+import socket
+import threading
+import uuid
+
+
+ADB_HOST = "127.0.0.1"
+# same environment variable the adb binary honours
+ADB_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+DEFAULT_TIMEOUT = 5.0  # seconds
+
+
+class AdbError(Exception):
+    pass
+
+
+class ShellUnsupported(AdbError):
+    """adbd không hỗ trợ `shell,raw:` (Android < 7)."""
+
+
+class SessionClosed(AdbError):
+    """Phiên shell đã đóng trước khi gửi lệnh: chạy lại ở chỗ khác là an toàn."""
+
+
+def _send_request(sock, request):
+    data = request.encode("utf-8")
+    sock.sendall(b"%04x" % len(data) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise AdbError("connection closed by adb server")
+        buf += chunk
+    return bytes(buf)
+
+
+def _read_length_prefixed(sock):
+    n = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, n).decode("utf-8", "replace")
+
+
+def _read_status(sock):
+    status = _recv_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(_read_length_prefixed(sock))
+    raise AdbError(f"unexpected adb status {status!r}")
+
+
+def _recv_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_devices(text):
+    """Nội dung 'host:devices' -> [(serial, state)]."""
+    res = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            res.append((parts[0], parts[1]))
+    return res
+
+
+class ShellSession:
+    """
+    Một phiên shell không PTY (`shell,raw:`) được giữ mở trên một thiết bị.
+    Mỗi lệnh được bọc để in ra marker + exit code, nhờ đó biết output kết
+    thúc ở đâu mà không cần mở kết nối mới.
+    """
+
+    def __init__(self, client, serial):
+        self.serial = serial
+        self.lock = threading.Lock()
+        self.marker = f"__ADBRC_{uuid.uuid4().hex[:12]}__"
+        self.sock = client._transport(serial)
+        try:
+            _send_request(self.sock, "shell,raw:")
+            _read_status(self.sock)
+        except AdbError as e:
+            self.close()
+            raise ShellUnsupported(str(e))
+        except Exception:
+            self.close()
+            raise
+        self.buf = b""
+
+    def alive(self):
+        """False nếu server/thiết bị đã đóng phiên (peek không chặn)."""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return not readable or self.sock.recv(1, socket.MSG_PEEK) != b""
+        except (OSError, ValueError):
+            return False
+
+    def run(self, cmd, timeout):
+        """
+        Chạy cmd trong phiên. SessionClosed nếu phiên đã chết trước khi
+        gửi; lỗi sau khi đã gửi (timeout, thiết bị rút giữa chừng) thì lệnh
+        có thể đã chạy, nên không được gửi lại.
+        """
+        if not self.alive():
+            raise SessionClosed("shell session closed")
+        wrapped = f"({cmd}) </dev/null; printf '\\n%s%d\\n' {self.marker} $?\n"
+        self.sock.settimeout(timeout)
+        self.sock.sendall(wrapped.encode("utf-8"))
+        marker = b"\n" + self.marker.encode()
+        while True:
+            idx = self.buf.find(marker)
+            if idx >= 0:
+                end = self.buf.find(b"\n", idx + len(marker))
+                if end >= 0:
+                    out = self.buf[:idx]
+                    code = int(self.buf[idx + len(marker):end])
+                    self.buf = self.buf[end + 1:]
+                    return out.decode("utf-8", "replace"), code
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise AdbError("shell session closed")
+            self.buf += chunk
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class AdbClient:
+    def __init__(self, host=ADB_HOST, port=ADB_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sessions = {}  # serial -> ShellSession
+        self._no_session = set()  # serials without raw shell support
+        self._lock = threading.Lock()
+
+    # ---------------- connections ----------------
+    def _connect(self, timeout=None):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=timeout or self.timeout
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _host_query(self, request, read_payload=True):
+        sock = self._connect()
+        try:
+            _send_request(sock, request)
+            _read_status(sock)
+            return _read_length_prefixed(sock) if read_payload else None
+        finally:
+            sock.close()
+
+    def _transport(self, serial):
+        sock = self._connect()
+        try:
+            _send_request(sock, f"host:transport:{serial}")
+            _read_status(sock)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    # ---------------- host services ----------------
+    def version(self):
+        return int(self._host_query("host:version"), 16)
+
+    def devices(self):
+        return parse_devices(self._host_query("host:devices"))
+
+    def open_tracker(self):
+        """
+        Mở kết nối host:track-devices. Server gửi danh sách thiết bị ngay,
+        rồi gửi lại mỗi khi có thay đổi; đọc bằng read_tracker().
+        """
+        sock = self._connect()
+        try:
+            _send_request(sock, "host:track-devices")
+            _read_status(sock)
+        except Exception:
+            sock.close()
+            raise
+        sock.settimeout(None)  # idle until something changes
+        return sock
+
+    @staticmethod
+    def read_tracker(sock):
+        return parse_devices(_read_length_prefixed(sock))
+
+    def forward(self, serial, local_port, remote_port):
+        self._forward_cmd(f"host-serial:{serial}:forward:tcp:{local_port};tcp:{remote_port}")
+
+    def killforward(self, serial, local_port):
+        self._forward_cmd(f"host-serial:{serial}:killforward:tcp:{local_port}")
+
+    def _forward_cmd(self, request):
+        sock = self._connect()
+        try:
+            _send_request(sock, request)
+            _read_status(sock)  # host-serial accepted
+            _read_status(sock)  # forward installed / removed
+        finally:
+            sock.close()
+
+    # ---------------- device services ----------------
+    def shell(self, serial, cmd, timeout=None):
+        """Chạy lệnh shell, trả về (output, exit_code). Dùng lại phiên shell nếu rảnh."""
+        timeout = timeout or self.timeout
+        session = self._get_session(serial)
+        if session is not None and session.lock.acquire(blocking=False):
+            try:
+                return session.run(cmd, timeout)
+            except SessionClosed:
+                # went stale while idle (device replugged, server restart): nothing
+                # was sent, so the one-shot fallback below runs the command once
+                self._drop_session(serial, session)
+            except (OSError, AdbError):
+                # the command may already have run (input tap, am start): never resend
+                self._drop_session(serial, session)
+                raise
+            finally:
+                session.lock.release()
+        # session busy on another thread, or unavailable
+        return self.shell_oneshot(serial, cmd, timeout)
+
+    def _get_session(self, serial):
+        with self._lock:
+            session = self._sessions.get(serial)
+            if session is not None or serial in self._no_session:
+                return session
+        try:
+            session = ShellSession(self, serial)
+        except ShellUnsupported:
+            # device refuses `shell,raw:` (old adbd): always use one-shot shells
+            with self._lock:
+                self._no_session.add(serial)
+            return None
+        except (OSError, AdbError):
+            return None
+        with self._lock:
+            existing = self._sessions.get(serial)
+            if existing is not None:
+                session.close()
+                return existing
+            self._sessions[serial] = session
+        return session
+
+    def shell_oneshot(self, serial, cmd, timeout=None):
+        """Một kết nối cho một lệnh (dùng khi phiên chung đang bận hoặc lỗi)."""
+        marker = f"__ADBRC_{uuid.uuid4().hex[:12]}__"
+        sock = self._transport(serial)
+        try:
+            sock.settimeout(timeout or self.timeout)
+            _send_request(sock, f"shell:{cmd}; printf '\\n%s%d\\n' {marker} $?")
+            _read_status(sock)
+            data = _recv_all(sock).decode("utf-8", "replace")
+        finally:
+            sock.close()
+        idx = data.rfind("\n" + marker)
+        if idx < 0:
+            return data, 0
+        try:
+            code = int(data[idx + 1 + len(marker):].strip())
+        except ValueError:
+            code = 0
+        return data[:idx], code
+
+    def _drop_session(self, serial, session):
+        with self._lock:
+            if self._sessions.get(serial) is session:
+                del self._sessions[serial]
+        session.close()
+
+    def forget(self, serial):
+        """Đóng phiên shell của thiết bị (khi thiết bị bị rút)."""
+        with self._lock:
+            session = self._sessions.pop(serial, None)
+            self._no_session.discard(serial)
+        if session is not None:
+            session.close()
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for s in sessions:
+            s.close()
@@ -0,0 +1,353 @@
+"""
+benchmark.py
+Benchmark đầu-cuối không cần điện thoại: mỗi lần chạy khởi động một process
+fake_droidcam.py (N DroidCam giả + fake adb server), rồi chạy DeviceManager,
+CameraClient, preview và recorder ở chế độ headless. Kết quả (throughput,
+CPU mỗi camera, RAM, latency đầu-cuối, tốc độ ghi đĩa) ghi ra file JSON.
+
+    python benchmark.py --cameras 1,2,4 --fps 24 --sizes 640x480,1280x720 \\
+        --duration 10 --record png --out bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import psutil
+from event_bus import EventBus
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DURATION = 10.0  # measured seconds per case
+DEFAULT_WARMUP = 2.0
+ATTACH_TIMEOUT = 15.0  # seconds to wait for every fake device to come up
+RECORD_NONE = "none"
+DEFAULT_OUT = "benchmark.json"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(values):
+    if not values:
+        return {"samples": 0, "p50": None, "p95": None, "max": None}
+    v = sorted(values)
+    pick = lambda p: round(v[min(len(v) - 1, int(p / 100.0 * len(v)))] * 1000, 2)
+    return {"samples": len(v), "p50": pick(50), "p95": pick(95), "max": round(v[-1] * 1000, 2)}
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class _LatencyProbe:
+    """Bọc preview của camera: đo thời gian từ lúc DroidCam giả gửi frame tới lúc GUI lấy frame."""
+
+    def __init__(self, inner, frame_timestamp, jpeg_type):
+        self.inner = inner
+        self.frame_timestamp = frame_timestamp
+        self.jpeg_type = jpeg_type
+        self.samples = []
+
+    @property
+    def taken_ts(self):
+        return self.inner.taken_ts
+
+    def put(self, frame):
+        self.inner.put(frame)
+
+    def take(self):
+        frame = self.inner.take()
+        if isinstance(frame, self.jpeg_type):
+            ts = self.frame_timestamp(frame.data)
+            if ts is not None:
+                self.samples.append(time.time() - ts)
+        return frame
+
+
+def _start_rig(cameras, size, source_fps, adb_port, cpus=None):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(HERE, "fake_droidcam.py"),
+            "--cameras", str(cameras),
+            "--size", f"{size[0]}x{size[1]}",
+            "--fps", str(source_fps),
+            "--adb-port", str(adb_port),
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    if cpus:
+        # the fake phones on their own cores, so their encoding is not counted as pipeline load
+        psutil.Process(proc.pid).cpu_affinity(cpus)
+    line = proc.stdout.readline()
+    if not line:
+        proc.kill()
+        raise RuntimeError("fake_droidcam.py did not start")
+    return proc, json.loads(line)
+
+
+def _stop_rig(proc):
+    try:
+        proc.stdin.close()
+        proc.wait(5)
+    except Exception:
+        proc.kill()
+
+
+def _camera_cpu_seconds(client, threads_by_id):
+    """CPU (user+system) đã dùng bởi capture + writer của một camera."""
+    proc = getattr(client, "proc", None)
+    if proc is not None:
+        try:
+            t = psutil.Process(proc.pid).cpu_times()
+            return t.user + t.system
+        except psutil.Error:
+            return 0.0
+    ids = [getattr(getattr(client, "thread", None), "native_id", None)]
+    recorder = getattr(client, "recorder", None)
+    if recorder is not None:
+        ids += [getattr(t, "native_id", None) for t in recorder.workers]
+    return sum(threads_by_id.get(i, 0.0) for i in ids if i is not None)
+
+
+def _threads_cpu():
+    return {t.id: t.user_time + t.system_time for t in psutil.Process().threads()}
+
+
+def _rss_bytes(clients):
+    rss = psutil.Process().memory_info().rss
+    for client in clients.values():
+        proc = getattr(client, "proc", None)
+        if proc is not None:
+            try:
+                rss += psutil.Process(proc.pid).memory_info().rss
+            except psutil.Error:
+                pass
+    return rss
+
+
+def run_case(cameras, fps, size, args, adb_port):
+    # imported here: adb_client reads ANDROID_ADB_SERVER_PORT at import time
+    from camera_registry import CameraRegistry, MAX_CAMERAS
+    from camera_process import create_camera_client
+    from device_manager import DeviceManager
+    from fake_droidcam import frame_timestamp
+    from mjpeg_stream import JpegFrame
+    from preview import PreviewPump, preview_size_for
+    from utils import _adb_client
+
+    out_dir = tempfile.mkdtemp(prefix="droidcam_bench_", dir=args.workdir)
+    rig, rig_info = _start_rig(cameras, size, max(fps, args.source_fps), adb_port, args.rig_cpus)
+    window = EventBus()
+    registry = CameraRegistry(max(cameras, 1))
+    devmgr = DeviceManager(window, registry)
+    clients, probes, attach = {}, {}, {}
+    # the GUI's tile size (capture.py) whatever the camera count, so rows compare
+    previews = PreviewPump(size=preview_size_for(MAX_CAMERAS))
+    me = psutil.Process()
+    rss_before = _rss_bytes({})
+
+    def step():
+        event, values = window.read(timeout=previews.interval_ms)
+        if event == "DEVICE_ADDED":
+            cam_idx, _ = values[event]
+            client = create_camera_client(cam_idx, registry.port(cam_idx), window, fps=fps, mode=args.mode)
+            client.start_capture()
+            if args.record != RECORD_NONE:
+                client.set_save_folder(os.path.join(out_dir, f"cam{cam_idx+1}"))
+                client.set_saving(True, mode=args.record)
+            probes[cam_idx] = client.preview = _LatencyProbe(client.preview, frame_timestamp, JpegFrame)
+            clients[cam_idx] = client
+            attach[cam_idx] = time.time() - t_start
+        previews.pump(window, clients)
+
+    try:
+        t_start = time.time()
+        devmgr.start()
+        while len(clients) < cameras and time.time() - t_start < ATTACH_TIMEOUT:
+            step()
+        end = time.time() + args.warmup
+        while time.time() < end:
+            step()
+
+        # measurement window
+        for client in clients.values():
+            client.metrics_snapshot()
+        for probe in probes.values():
+            probe.samples.clear()
+        threads0 = _threads_cpu()
+        gui_tid = threading.main_thread().native_id
+        cam_cpu0 = {i: _camera_cpu_seconds(c, threads0) for i, c in clients.items()}
+        cpu0, disk0, t0 = me.cpu_times(), _dir_bytes(out_dir), time.time()
+        written0 = {i: (c.record_stats() or {}).get("written", 0) for i, c in clients.items()}
+        end = t0 + args.duration
+        while time.time() < end:
+            step()
+        elapsed = time.time() - t0
+        cpu1, disk1 = me.cpu_times(), _dir_bytes(out_dir)
+        threads1 = _threads_cpu()
+        rss_after = _rss_bytes(clients)
+
+        per_camera, latencies, total_frames, total_written = [], [], 0, 0
+        for idx, client in sorted(clients.items()):
+            snap = client.metrics_snapshot()
+            stats = client.record_stats() or {}
+            cam_cpu = _camera_cpu_seconds(client, threads1) - cam_cpu0[idx]
+            written = stats.get("written", 0) - written0[idx]
+            total_frames += snap["frames"]
+            total_written += written
+            latencies += probes[idx].samples
+            per_camera.append(
+                {
+                    "cam": idx + 1,
+                    "attach_s": round(attach[idx], 3),
+                    "fps": round(snap["fps"], 2),
+                    "target_fps": fps,
+                    "preview_fps": round(snap["preview_fps"], 2),
+                    "read_failures": snap["read_failures"],
+                    "frames_written": written,
+                    "dropped": snap["dropped"],
+                    "queue_depth": snap["queue_depth"],
+                    "cpu_pct": round(cam_cpu / elapsed * 100, 2),
+                    "latency_ms": _percentiles(probes[idx].samples),
+                    "stages_ms": {
+                        name: {k: (round(v, 3) if isinstance(v, float) else v) for k, v in s.items()}
+                        for name, s in snap["stages"].items()
+                    },
+                }
+            )
+        process_cpu = (cpu1.user + cpu1.system) - (cpu0.user + cpu0.system)
+        children_cpu = sum(c["cpu_pct"] for c in per_camera) if args.mode == "process" else 0.0
+        return {
+            "cameras": cameras,
+            "attached": len(clients),
+            "fps": fps,
+            "size": f"{size[0]}x{size[1]}",
+            "mode": args.mode,
+            "record": args.record,
+            "duration_s": round(elapsed, 2),
+            "throughput_fps": round(total_frames / elapsed, 2),
+            "cpu_pct": round(process_cpu / elapsed * 100 + children_cpu, 2),
+            "cpu_pct_per_camera": round(
+                (process_cpu / elapsed * 100 + children_cpu) / max(1, len(clients)), 2
+            ),
+            # preview decode/resize/encode on the GUI (here: main) thread
+            "gui_cpu_pct": round((threads1.get(gui_tid, 0.0) - threads0.get(gui_tid, 0.0)) / elapsed * 100, 2),
+            "rss_mb": round(rss_after / 1e6, 1),
+            "rss_delta_mb": round((rss_after - rss_before) / 1e6, 1),
+            "latency_ms": _percentiles(latencies),
+            "disk_write_mb_s": round((disk1 - disk0) / elapsed / 1e6, 3),
+            "frames_written_per_s": round(total_written / elapsed, 2),
+            "per_camera": per_camera,
+        }
+    finally:
+        for client in clients.values():
+            client.stop_capture()
+        devmgr.stop()
+        _stop_rig(rig)
+        _adb_client.close()
+        if not args.keep:
+            # give writer threads a moment to close their files
+            time.sleep(0.5)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def _csv(text, cast):
+    return [cast(v) for v in text.split(",") if v.strip()]
+
+
+def _size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def host_info():
+    import cv2
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "cpu_affinity": psutil.Process().cpu_affinity() if hasattr(psutil.Process, "cpu_affinity") else None,
+        "memory_mb": round(psutil.virtual_memory().total / 1e6),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless DroidCam pipeline benchmark (no phones needed)")
+    ap.add_argument("--cameras", default="1,2,4", help="comma separated camera counts")
+    ap.add_argument("--fps", default="24", help="comma separated target FPS values")
+    ap.add_argument("--sizes", default="640x480", help="comma separated WxH stream sizes")
+    ap.add_argument("--source-fps", type=float, default=30.0, help="FPS of the fake DroidCam streams")
+    ap.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    ap.add_argument("--warmup", type=float, default=DEFAULT_WARMUP)
+    ap.add_argument("--record", default=RECORD_NONE, choices=[RECORD_NONE, "png", "segment"])
+    ap.add_argument("--mode", default="thread", choices=["thread", "process"])
+    ap.add_argument("--workdir", default=None, help="where recordings go (default: temp dir)")
+    ap.add_argument("--keep", action="store_true", help="keep recorded files")
+    ap.add_argument(
+        "--rig-cpus",
+        type=lambda text: _csv(text, int),
+        default=None,
+        help="comma separated CPUs for the fake phones; the benchmark runs on the other CPUs",
+    )
+    # the app's own [camN] prints go to stdout, so results always go to a file
+    ap.add_argument("--out", default=DEFAULT_OUT, help="JSON results file")
+    args = ap.parse_args()
+
+    adb_port = _free_port()
+    os.environ["ANDROID_ADB_SERVER_PORT"] = str(adb_port)
+    os.environ["DROIDCAM_ADB_BACKEND"] = "native"
+    sys.path.insert(0, HERE)
+    if args.rig_cpus:
+        others = [c for c in psutil.Process().cpu_affinity() if c not in args.rig_cpus]
+        if not others:
+            ap.error("--rig-cpus leaves no CPU for the benchmark")
+        psutil.Process().cpu_affinity(others)
+
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": host_info(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": [],
+    }
+    for size in _csv(args.sizes, _size):
+        for fps in _csv(args.fps, float):
+            for cameras in _csv(args.cameras, int):
+                print(f"[Benchmark] {cameras} cam @ {fps:g} fps {size[0]}x{size[1]} ...", file=sys.stderr)
+                case = run_case(cameras, fps, size, args, adb_port)
+                print(
+                    f"[Benchmark]   {case['throughput_fps']} fps total, cpu {case['cpu_pct']}%, "
+                    f"latency p95 {case['latency_ms']['p95']} ms",
+                    file=sys.stderr,
+                )
+                results["results"].append(case)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"[Benchmark] results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
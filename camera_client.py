@@ -2,19 +2,78 @@ import cv2
 import threading
 import time
 import os
-import datetime
+import random
+from recorder import (
+    FrameRecorder,
+    make_sink,
+    DEFAULT_RECORD_MODE,
+    DEFAULT_SEGMENT_CODEC,
+    DEFAULT_SEGMENT_SECONDS,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_WRITER_WORKERS,
+    DEFAULT_OVERFLOW_POLICY,
+    DEFAULT_JPEG_QUALITY,
+    DRAIN_TIMEOUT,
+)
+from mjpeg_stream import MjpegStream, frame_signature
+from preview import PreviewMailbox
+from metrics import CameraMetrics
+from sync_capture import monotonic_to_datetime
+from frame_index import FrameIndexWriter
+from motion import MotionTrigger, TRIGGER_MOTION, DEFAULT_TRIGGER
+from retention import STORAGE_OK, STORAGE_FULL
 
 
 DEFAULT_FPS = 24
+# "mjpeg": read DroidCam's JPEG parts directly (no decode unless needed)
+# "opencv": cv2.VideoCapture decodes every frame to BGR
+CAPTURE_SOURCE_MJPEG = "mjpeg"
+CAPTURE_SOURCE_OPENCV = "opencv"
+DEFAULT_CAPTURE_SOURCE = CAPTURE_SOURCE_MJPEG
 
+# supervised reconnect
+STREAM_LOST_AFTER = 1.0  # seconds of failed reads before the stream is reopened
+RECONNECT_BASE_DELAY = 0.5  # seconds, doubled per failed attempt
+RECONNECT_MAX_DELAY = 10.0
+RECONNECT_JITTER = 0.25  # +/- fraction of the delay, spreads out retries of many cameras
+REFORWARD_AFTER_ATTEMPTS = 1  # recreate the adb forward after this many failed reopens
+# stall detection: open/read deadline for the stream, checked by a watchdog thread
+CAPTURE_TIMEOUT = 5.0  # seconds
+WATCHDOG_INTERVAL = 0.5
 
-class CameraClient(threading.Thread):
-    def __init__(self, cam_id, local_port, window, fps=DEFAULT_FPS):
-        super().__init__(daemon=True)
-        self.cam_id = cam_id  # 0 or 1
+
+class CameraClient:
+    """
+    Capture một camera trên thread riêng. Mỗi lần start_capture() tạo thread
+    mới nên có thể dừng/chạy lại cùng một object. Khi stream mất, thread tự
+    mở lại với exponential backoff + jitter (kèm tạo lại adb forward qua
+    reforward nếu cần) và báo CAM_RECONNECTING / CAM_RECONNECTED. Một
+    watchdog cắt stream nếu một lần đọc bị treo quá read_timeout (CAM_STALLED).
+    Khi gắn vào một SyncGroup (sync), camera lấy frame theo tick chung và
+    frame được ghi theo từng set thay vì ghi thẳng. usage (DiskUsage của
+    session) đếm byte đã ghi; khi đĩa sắp đầy chỉ ghi một nửa số frame,
+    khi hết chỗ thì tạm dừng ghi (preview vẫn chạy).
+    profile / record_profile (StreamProfile) chọn độ phân giải xin DroidCam
+    (/video?WxH) và FPS; DroidCam chỉ phục vụ một stream nên stream được mở
+    lại với record_profile khi bắt đầu ghi và quay về profile khi dừng.
+    """
+
+    def __init__(
+        self,
+        cam_id,
+        local_port,
+        window,
+        fps=DEFAULT_FPS,
+        source=DEFAULT_CAPTURE_SOURCE,
+        read_timeout=CAPTURE_TIMEOUT,
+    ):
+        self.cam_id = cam_id
         self.local_port = local_port
         self.window = window
-        self.fps = fps
+        self.user_fps = fps  # -APPLYFPS- / --fps, used while the active profile has no fps
+        self._fps = fps
+        self.source = source
+        self.read_timeout = read_timeout
         self.running = False
         self.capture = None
         self.last_frame_ts = 0
@@ -22,102 +81,542 @@ class CameraClient(threading.Thread):
         self.save_folder = None
         self.error_msg = None
         self.lock = threading.Lock()
+        self.thread = None
+        self.uri = None
+        self._generation = 0  # bumped by stop_capture(); a start token from before a stop is refused
+        self._reader = 0  # token of the current capture thread; stale threads exit
+        self._opening = False  # start_capture() is opening the stream
+        self._stop_event = threading.Event()
+        # callable that recreates the adb forward for this camera (set by the GUI)
+        self.reforward = None
+        self.reconnects = 0
+        self.watchdog = None
+        self._watch_stop = None  # stop event of the current watchdog
+        self._read_started = None  # (reader token, monotonic start) while a read is in flight
+        self.stalls = 0
+        self.sync = None  # SyncGroup while recording in synchronized mode
+        self.usage = None  # session DiskUsage: bytes written + storage level
+        self.profile = None  # StreamProfile while not recording (None = app default)
+        self.record_profile = None  # StreamProfile while recording (None = keep profile)
+        self._reopen = False  # capture thread reopens self.uri (profile switch)
+        self.stream_id = 0  # bumped on every (re)open; the preview relearns the frame size
+        self._first_frame_pending = False  # FIRST_FRAME not yet sent for this start
+        self._storage_count = 0  # frames seen while storage is low
+        # newest frame for the GUI; FRAME only wakes the GUI when the slot was empty
+        self.preview = PreviewMailbox(notify=self._notify_frame)
+        # recording stage (runs on its own writer threads)
+        self.recorder = None
+        self.last_record_stats = None
+        self.stopped_recorder = None  # still writing its queued frames after set_saving(False)
+        self.record_queue_size = DEFAULT_QUEUE_SIZE
+        self.record_workers = DEFAULT_WRITER_WORKERS
+        self.record_policy = DEFAULT_OVERFLOW_POLICY
+        self.record_mode = DEFAULT_RECORD_MODE
+        self.segment_codec = DEFAULT_SEGMENT_CODEC
+        self.segment_seconds = DEFAULT_SEGMENT_SECONDS
+        self.jpeg_quality = DEFAULT_JPEG_QUALITY
+        self.record_trigger = DEFAULT_TRIGGER
+        self.motion = None  # MotionTrigger while recording with trigger "motion"
+        # per-stage latency / counters, read by MetricsExporter
+        self.metrics = CameraMetrics(cam_id)
+
+    @property
+    def fps(self):
+        """FPS capture hiện hành: fps của profile đang dùng, không có thì user_fps."""
+        return self._fps
+
+    @fps.setter
+    def fps(self, value):
+        self.user_fps = value
+        self._apply_profile_fps()
 
-    def start_capture(self):
+    def start_token(self):
+        """Token cho start_capture(token): start bị bỏ nếu có stop_capture() ở giữa."""
+        return self._generation
+
+    def start_capture(self, token=None):
+        """
+        Mở stream và chạy capture thread. Trả về True/False (mở được hay
+        không), None nếu không làm gì (đang chạy, hoặc đã bị stop sau token).
+        """
         with self.lock:
-            if self.running:
-                return
-            uri = f"http://127.0.0.1:{self.local_port}/video"
-            print(f"[cam{self.cam_id+1}] Opening capture: {uri}")
-            self.capture = cv2.VideoCapture(uri)
-            self.running = True
-            self.error_msg = None
-            if not self.capture.isOpened():
-                self.error_msg = "Cannot open VideoCapture"
-                self.running = False
-            else:
-                # Set some properties if helpful
-                self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 2)
-                self.last_frame_ts = time.time()
-                self.start()
+            if self.running or self._opening or (token is not None and token != self._generation):
+                return None
+            self._opening = True
+            gen = self._generation
+            self._apply_profile_fps()
+            self.uri = uri = self._stream_uri()
+            self._reopen = False
+        print(f"[cam{self.cam_id+1}] Opening capture ({self.source}): {uri}")
+        # opened outside the lock: stop_capture() on the GUI thread never waits for it
+        cap = None
+        try:
+            cap = self._open_source(uri)
+        finally:
+            with self.lock:
+                self._opening = False
+                stopped = gen != self._generation
+                if cap is not None and not stopped:
+                    self._started(cap)
+        if stopped:
+            if cap is not None:
+                cap.release()  # stop_capture() came in while the stream was opening
+            return None
+        return self.running
+
+    def _started(self, cap):
+        # caller holds self.lock
+        self.capture = cap
+        self.error_msg = None
+        if not cap.isOpened():
+            self.error_msg = "Cannot open VideoCapture"
+            return
+        self.running = True
+        self.stream_id += 1
+        self.last_frame_ts = time.time()
+        self._first_frame_pending = True
+        self._stop_event.clear()
+        self._spawn_capture_thread()
+        # its own event: a quick stop/start never leaves the old watchdog running
+        self._watch_stop = threading.Event()
+        self.watchdog = threading.Thread(
+            target=self._watch, args=(self._watch_stop,), name=f"cam{self.cam_id+1}-watchdog", daemon=True
+        )
+        self.watchdog.start()
+
+    def _spawn_capture_thread(self):
+        # caller holds self.lock; the previous capture thread (if any) exits on its next check
+        self._reader += 1
+        self.thread = threading.Thread(
+            target=self.run,
+            args=(self._reader,),
+            name=f"cam{self.cam_id+1}-capture",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def _open_source(self, uri):
+        if self.source == CAPTURE_SOURCE_MJPEG:
+            cap = MjpegStream(uri, timeout=self.read_timeout)
+            if cap.isOpened():
+                return cap
+            print(f"[cam{self.cam_id+1}] MJPEG passthrough unavailable, falling back to OpenCV")
+        timeout_ms = int(self.read_timeout * 1000)
+        if hasattr(cv2, "CAP_PROP_READ_TIMEOUT_MSEC"):  # OpenCV >= 4.6 (FFmpeg backend)
+            cap = cv2.VideoCapture(
+                uri,
+                cv2.CAP_FFMPEG,
+                [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms],
+            )
+        else:
+            cap = cv2.VideoCapture(uri)
+        if cap.isOpened():
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)
+        return cap
+
+    def _active_profile(self):
+        if self.saving and self.record_profile is not None:
+            return self.record_profile
+        return self.profile
+
+    def _stream_uri(self):
+        # DroidCam picks the camera resolution from the query: /video?1280x720
+        profile = self._active_profile()
+        query = f"?{profile.size[0]}x{profile.size[1]}" if profile is not None and profile.size else ""
+        return f"http://127.0.0.1:{self.local_port}/video{query}"
+
+    def _apply_profile_fps(self):
+        profile = self._active_profile()
+        self._fps = profile.fps if profile is not None and profile.fps else self.user_fps
+
+    def _switch_profile(self):
+        """Gọi khi bật/tắt ghi: đổi FPS, và mở lại stream nếu URL khác."""
+        self._apply_profile_fps()
+        with self.lock:
+            uri = self._stream_uri()
+            if self.running and uri != self.uri:
+                self.uri = uri
+                self._reopen = True
 
     def stop_capture(self):
         with self.lock:
             self.running = False
-            if self.capture:
-                try:
-                    self.capture.release()
-                except:
-                    pass
-                self.capture = None
+            self._generation += 1
+            self._stop_event.set()
+            if self._watch_stop is not None:
+                self._watch_stop.set()
+            cap, self.capture = self.capture, None
+            if cap:
+                abort = getattr(cap, "abort", None)
+                thread = self.thread
+                # cv2.VideoCapture crashes if released during grab(): the capture thread
+                # releases it on exit; MjpegStream can be aborted from here
+                if abort is not None or thread is None or not thread.is_alive():
+                    try:
+                        if abort is not None:
+                            abort()  # unblock a read in progress on the capture thread
+                        cap.release()
+                    except:
+                        pass
+        self.set_saving(False)
+
+    def _current(self, gen):
+        """True khi capture thread mang token `gen` vẫn là thread hiện hành."""
+        return self.running and gen == self._reader
 
     def set_save_folder(self, folder):
         self.save_folder = folder
         os.makedirs(folder, exist_ok=True)
 
-    def set_saving(self, saving: bool):
-        self.saving = saving
+    def set_saving(self, saving: bool, mode=None, codec=None, segment_seconds=None, trigger=None):
+        """
+        Bật/tắt ghi. mode: "png" (mỗi frame một file) hoặc "segment"
+        (video segment cuộn theo segment_seconds, codec "mjpg"/"mp4v").
+        trigger: "always" hoặc "motion" (chỉ ghi quanh lúc có chuyển động;
+        không áp dụng trong sync mode).
+        """
+        if mode is not None:
+            self.record_mode = mode
+        if codec is not None:
+            self.segment_codec = codec
+        if segment_seconds is not None:
+            self.segment_seconds = segment_seconds
+        if trigger is not None:
+            self.record_trigger = trigger
+        profile = self.record_profile
+        if saving and self.save_folder is not None:
+            if self.sync is not None:
+                self.sync.join(self.cam_id)
+            if self.recorder is None:
+                self.saving = True
+                self._switch_profile()
+                # the record profile may pin the format of this camera
+                sink = make_sink(
+                    profile.format if profile is not None and profile.format else self.record_mode,
+                    self.save_folder,
+                    self.fps,
+                    codec=self.segment_codec,
+                    segment_seconds=self.segment_seconds,
+                    usage=self.usage,
+                    jpeg_quality=profile.quality if profile is not None and profile.quality else self.jpeg_quality,
+                )
+                self.recorder = FrameRecorder(
+                    self.cam_id,
+                    sink,
+                    on_error=self._on_record_error,
+                    queue_size=self.record_queue_size,
+                    workers=self.record_workers,
+                    policy=self.record_policy,
+                    metrics=self.metrics,
+                    index=FrameIndexWriter(self.save_folder),
+                )
+                self.recorder.start()
+                if self.record_trigger == TRIGGER_MOTION and self.sync is None:
+                    self.motion = MotionTrigger()
+            self.saving = True
+            return
+        self.saving = False
+        self._switch_profile()
+        self.motion = None
+        if self.sync is not None:
+            self.sync.leave(self.cam_id)
+        if self.recorder is not None:
+            # writers finish the queued frames in the background
+            self.recorder.stop()
+            self.last_record_stats = self.recorder.stats()
+            self.stopped_recorder, self.recorder = self.recorder, None
 
-    def run(self):
-        # thread capture loop
-        desired_interval = 1.0 / max(1.0, self.fps)
-        fail_count = 0
+    def record_stats(self):
+        """Thống kê ghi của lần recording hiện tại (hoặc lần gần nhất)."""
+        rec = self.recorder
+        if rec is not None:
+            return rec.stats()
+        return self.last_record_stats
+
+    def flush_recording(self, timeout=DRAIN_TIMEOUT):
+        """
+        Chờ recorder vừa dừng ghi hết hàng đợi (gọi sau stop_capture(), trước
+        khi lưu dung lượng session). False nếu writer chưa xong sau timeout.
+        """
+        rec = self.stopped_recorder
+        if rec is None:
+            return True
+        done = rec.join(timeout)
+        self.last_record_stats = rec.stats()
+        if done:
+            self.stopped_recorder = None
+        return done
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot(self.fps, self.record_stats())
+
+    def _notify_frame(self):
+        self.window.write_event_value("FRAME", (self.cam_id, None))
+
+    def _on_record_error(self, msg):
+        self.window.write_event_value("CAM_ERROR", (self.cam_id, msg))
+
+    def run(self, gen):
+        """
+        Capture loop theo lịch deadline (monotonic): grab() liên tục để stream
+        không bị dồn buffer, chỉ retrieve() (decode với OpenCV) frame đầu tiên
+        tới sau mỗi deadline. Deadline tăng đúng 1/fps nên không bị trôi;
+        fps được đọc lại mỗi tick nên -APPLYFPS- có hiệu lực ngay. Trong sync
+        mode thì lấy frame đầu tiên tới sau mỗi tick của SyncClock chung.
+        Frame mang thời điểm capture monotonic (lúc grab() xong).
+        """
+        due = None  # deadline of the last kept frame
+        last_tick = None  # sync mode: tick of the last kept frame
+        last_sig = None  # frame_signature() of the last kept frame
+        last_ok = time.monotonic()
+        cap = None
         while True:
             with self.lock:
-                if not self.running or self.capture is None:
+                if not self._current(gen):
                     break
                 cap = self.capture
-            start = time.time()
+            if cap is None:
+                # fresh thread after the watchdog gave up on a stuck one
+                if not self._reconnect(gen, "Stream stalled"):
+                    break
+                continue
+            if self._reopen:
+                if not self._reopen_stream(gen):
+                    break
+                due = None
+                last_sig = None
+                last_ok = time.monotonic()
+                continue
+            t_read = time.perf_counter()
+            self._read_started = (gen, time.monotonic())
             try:
-                ret, frame = cap.read()
+                ret = cap.grab()
+                frame = None
+                tick = None
+                if ret:
+                    now = time.monotonic()
+                    interval = 1.0 / max(1.0, self.fps)
+                    sync = self.sync
+                    if sync is not None:
+                        tick = sync.clock.tick_at(now)
+                        if last_tick is not None and tick <= last_tick:
+                            self.metrics.count("skipped")
+                            last_ok = now
+                            continue
+                        last_tick = tick
+                    elif due is not None and now < due + interval:
+                        # not needed at the target FPS: dropped undecoded
+                        self.metrics.count("skipped")
+                        last_ok = now
+                        continue
+                    else:
+                        # advance on a fixed grid; restart it if we fell behind
+                        due = now if due is None or now - due >= 2 * interval else due + interval
+                    ret, frame = cap.retrieve()
             except Exception as e:
                 ret = False
                 frame = None
-                print(f"[cam{self.cam_id+1}] Exception reading frame: {e}")
+                if self._current(gen):  # not just stop_capture() closing the stream under us
+                    print(f"[cam{self.cam_id+1}] Exception reading frame: {e}")
+            finally:
+                self._read_started = None
 
             if not ret or frame is None:
-                fail_count += 1
-                if fail_count >= int(self.fps * 2):  # prolonged failure
-                    self.error_msg = "No frames (read failed)"
-                    # notify GUI
-                    self.window.write_event_value(
-                        f"CAM_ERROR", (self.cam_id, self.error_msg)
-                    )
-                    # stop and attempt to reconnect
-                    self.running = False
-                    try:
-                        cap.release()
-                    except:
-                        pass
-                    break
-                time.sleep(0.1)
+                self.metrics.count("read_failures")
+                if time.monotonic() - last_ok >= STREAM_LOST_AFTER:
+                    if not self._reconnect(gen, "No frames (read failed)"):
+                        break
+                    due = None
+                    last_sig = None
+                    last_ok = time.monotonic()
+                else:
+                    self._stop_event.wait(0.05)
                 continue
 
-            fail_count = 0
-            # convert BGR to PNG bytes for GUI
+            last_ok = time.monotonic()
+            self.metrics.observe("read", time.perf_counter() - t_read)
+            self.metrics.count("frames")
+            if self._first_frame_pending:
+                # once per start_capture(), for the startup timeline
+                self._first_frame_pending = False
+                self.window.write_event_value("FIRST_FRAME", (self.cam_id, now))
+            # the phone delivers slower than self.fps: same image again, so
+            # skip preview encode and disk write (kept as a repeat in the index;
+            # a video segment writes the previous frame again to keep its timing)
+            sig = frame_signature(frame)
+            if sig == last_sig:
+                self.metrics.count("repeats")
+                recorder = self.recorder
+                motion = self.motion
+                if self.saving and motion is not None and motion.repeat(now):
+                    # a static scene repeats the last image: the post-roll still ends
+                    self.window.write_event_value("MOTION", (self.cam_id, motion.active, motion.last_score))
+                if (
+                    self.saving
+                    and recorder is not None
+                    and self.sync is None
+                    and self.motion is None
+                    and self._storage_level() != STORAGE_FULL
+                ):
+                    recorder.mark_repeat(monotonic_to_datetime(now))
+                continue
+            last_sig = sig
+            # latest-frame-wins: the GUI decodes/downscales at its own rate
+            self.preview.put(frame)
+
+            # hand the frame to the writer queue; disk I/O never blocks capture
+            recorder = self.recorder
+            # not while the stream still runs at the old profile's resolution
+            if self.saving and recorder is not None and not self._reopen and self._storage_allows(tick):
+                sync = self.sync
+                motion = self.motion
+                if sync is not None and tick is not None:
+                    sync.offer(self.cam_id, tick, now, frame, recorder)
+                elif motion is not None:
+                    self._record_on_motion(motion, recorder, frame, now)
+                else:
+                    recorder.submit(frame, monotonic_to_datetime(now))
+        # end loop
+        if cap is not None and cap is not self.capture:
             try:
-                _, png = cv2.imencode(".png", frame)
-                png_bytes = png.tobytes()
-                # push to GUI
-                self.window.write_event_value(f"FRAME", (self.cam_id, png_bytes))
-            except Exception as e:
-                print(f"[cam{self.cam_id+1}] encode error: {e}")
+                cap.release()  # no-op if stop_capture() already released it
+            except Exception:
+                pass
+        print(f"[cam{self.cam_id+1}] capture thread ending")
+
+    def _storage_level(self):
+        usage = self.usage
+        return STORAGE_OK if usage is None else usage.level
+
+    def _storage_allows(self, tick):
+        """Disk sắp đầy: ghi frame xen kẽ (theo tick khi sync, để mọi camera giữ cùng set)."""
+        level = self._storage_level()
+        if level == STORAGE_OK:
+            return True
+        if level == STORAGE_FULL:
+            return False
+        if tick is not None:
+            return tick % 2 == 0
+        self._storage_count += 1
+        return self._storage_count % 2 == 1
 
-            # save if requested (save every frame or sample at FPS)
-            if self.saving and self.save_folder is not None:
-                ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                fname = os.path.join(self.save_folder, f"frame_{ts}.png")
+    def _record_on_motion(self, motion, recorder, frame, ts):
+        t0 = time.perf_counter()
+        discarded = motion.discarded
+        keep, changed = motion.process(frame, ts)
+        self.metrics.observe("motion", time.perf_counter() - t0)
+        if motion.discarded != discarded:
+            self.metrics.count("idle", motion.discarded - discarded)
+        if changed:
+            self.window.write_event_value("MOTION", (self.cam_id, motion.active, motion.last_score))
+        # pre-roll frames first, in capture order
+        for frame_ts, kept in keep:
+            recorder.submit(kept, monotonic_to_datetime(frame_ts))
+
+    def _reopen_stream(self, gen):
+        """
+        Đổi profile: đóng stream cũ trước (DroidCam chỉ nhận một client) rồi
+        mở self.uri. Lỗi thì chuyển sang _reconnect(). False nếu camera bị dừng.
+        """
+        with self.lock:
+            if not self._current(gen):
+                return False
+            self._reopen = False
+            cap, self.capture = self.capture, None
+            uri = self.uri
+        try:
+            cap.release()
+        except Exception:
+            pass
+        cap = self._open_source(uri)
+        if not cap.isOpened():
+            return self._reconnect(gen, f"Cannot open {uri}")
+        with self.lock:
+            if not self._current(gen):
+                cap.release()
+                return False
+            self.capture = cap
+            self.stream_id += 1
+        print(f"[cam{self.cam_id+1}] Stream reopened: {uri}")
+        return True
+
+    def _reconnect(self, gen, reason):
+        """
+        Mở lại stream cho tới khi được hoặc camera bị dừng. Trả về False nếu
+        camera đã bị stop / start lại trong lúc chờ.
+        """
+        lost_at = time.monotonic()
+        with self.lock:
+            if not self._current(gen):
+                return False
+            cap, self.capture = self.capture, None
+        if cap is not None:
+            try:
+                cap.release()
+            except Exception:
+                pass
+        self.error_msg = reason
+        print(f"[cam{self.cam_id+1}] Stream lost ({reason}), reconnecting")
+        self.window.write_event_value("CAM_RECONNECTING", (self.cam_id, reason))
+        attempt = 0
+        while True:
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt)
+            delay *= random.uniform(1 - RECONNECT_JITTER, 1 + RECONNECT_JITTER)
+            if self._stop_event.wait(delay) or not self._current(gen):
+                return False
+            attempt += 1
+            if attempt > REFORWARD_AFTER_ATTEMPTS and self.reforward is not None:
                 try:
-                    cv2.imwrite(fname, frame)
+                    self.reforward()
                 except Exception as e:
-                    print(f"[cam{self.cam_id+1}] save error: {e}")
-                    self.window.write_event_value(
-                        "CAM_ERROR", (self.cam_id, f"Save error: {e}")
-                    )
-
-            elapsed = time.time() - start
-            to_sleep = desired_interval - elapsed
-            if to_sleep > 0:
-                time.sleep(to_sleep)
-        # end loop
-        print(f"[cam{self.cam_id+1}] capture thread ending")
+                    print(f"[cam{self.cam_id+1}] re-forward failed: {e}")
+            cap = self._open_source(self.uri)
+            if not cap.isOpened():
+                print(f"[cam{self.cam_id+1}] Reconnect attempt {attempt} failed")
+                continue
+            with self.lock:
+                if not self._current(gen):
+                    cap.release()
+                    return False
+                self.capture = cap
+                self.stream_id += 1
+            downtime = time.monotonic() - lost_at
+            gap = int(round(downtime * max(1.0, self.fps)))  # frames missed at the target FPS
+            self.reconnects += 1
+            self.error_msg = None
+            print(f"[cam{self.cam_id+1}] Reconnected after {downtime:.1f}s ({attempt} attempts, ~{gap} frames)")
+            self.window.write_event_value("CAM_RECONNECTED", (self.cam_id, downtime, gap, attempt))
+            return True
+
+    def _watch(self, stop):
+        """
+        Watchdog: nếu grab()/retrieve() treo quá read_timeout thì báo
+        CAM_STALLED và cắt socket (capture thread sẽ reconnect). Nếu sau
+        2 x read_timeout thread vẫn kẹt (backend bỏ qua timeout), bỏ thread đó
+        và chạy capture thread mới.
+        """
+        handled = None
+        while not stop.wait(WATCHDOG_INTERVAL):
+            reading = self._read_started
+            if reading is None or reading[0] != self._reader:
+                continue
+            stalled = time.monotonic() - reading[1]
+            if stalled < self.read_timeout:
+                continue
+            if handled != reading:
+                handled = reading
+                self.stalls += 1
+                self.metrics.count("stalls")
+                print(f"[cam{self.cam_id+1}] Read stalled for {stalled:.1f}s, tearing down stream")
+                self.window.write_event_value("CAM_STALLED", (self.cam_id, stalled))
+                abort = getattr(self.capture, "abort", None)
+                if abort is not None:
+                    abort()
+            elif stalled >= 2 * self.read_timeout:
+                with self.lock:
+                    if not self._current(reading[0]):
+                        continue
+                    print(f"[cam{self.cam_id+1}] Capture thread stuck, starting a new one")
+                    # the stuck capture object stays with the old thread; start tokens stay valid
+                    self.capture = None
+                    self._spawn_capture_thread()
@@ -0,0 +1,133 @@
+import collections
+import http.client
+import threading
+import time
+
+
+CONTROL_TIMEOUT = 2.0  # seconds per HTTP request
+# tile button -> DroidCam control path under /cam/1/
+CONTROL_ACTIONS = {
+    "LED": "led_toggle",
+    "AF": "af",
+    "ZOOMIN": "zoomin",
+    "ZOOMOUT": "zoomout",
+    "EXPLON": "set_exposure_lock",
+    "EXPLOFF": "set_exposure_unlock",
+}
+ZOOM_ACTIONS = {"zoomin": 1, "zoomout": -1}
+# a reused keep-alive connection that failed before any response byte: safe to resend
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+def control_path(action):
+    return f"/cam/1/{action}"
+
+
+class CameraControl(threading.Thread):
+    """
+    Kênh điều khiển cho một camera: gửi lệnh /cam/1/<action> trên một kết nối
+    HTTP keep-alive, ở thread riêng để GUI không bị treo. Các lần bấm zoom
+    dồn lại khi đang chờ được cộng theo hướng (Zoom+ và Zoom- triệt tiêu
+    nhau) rồi gửi liền từng bước trên cùng kết nối. Kết quả, số bước đã gửi
+    và round-trip latency được gửi về GUI qua event CTRL_RESULT.
+    """
+
+    def __init__(self, cam_idx, local_port, window, host="127.0.0.1"):
+        super().__init__(daemon=True)
+        self.cam_idx = cam_idx
+        self.local_port = local_port
+        self.window = window
+        self.host = host
+        self.cond = threading.Condition()
+        self.pending = collections.deque()  # non-zoom actions, in order
+        self.zoom_steps = 0  # net pending zoom presses (+in / -out)
+        self.running = True
+        self.conn = None
+        self.sent = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+
+    def submit(self, action):
+        with self.cond:
+            if action in ZOOM_ACTIONS:
+                self.zoom_steps += ZOOM_ACTIONS[action]
+            else:
+                self.pending.append(action)
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def avg_latency_ms(self):
+        return self.total_latency / self.sent * 1000 if self.sent else None
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.pending and self.zoom_steps == 0:
+                    self.cond.wait()
+                if not self.running:
+                    break
+                if self.pending:
+                    action, steps = self.pending.popleft(), 1
+                else:
+                    action = "zoomin" if self.zoom_steps > 0 else "zoomout"
+                    steps = abs(self.zoom_steps)
+                    self.zoom_steps = 0
+            # DroidCam zooms one step per request: send them back to back
+            sent, latency = 0, 0.0
+            for _ in range(steps):
+                ok, detail, elapsed = self._request(action)
+                latency += elapsed
+                if not ok:
+                    break
+                sent += 1
+            if not ok and steps > 1:
+                detail = f"{detail} after {sent}/{steps} steps"
+            self.window.write_event_value(
+                "CTRL_RESULT",
+                (self.cam_idx, action, ok, latency * 1000, sent, detail),
+            )
+        self._close()
+
+    def _request(self, action):
+        start = time.perf_counter()
+        for attempt in range(2):
+            reused = self.conn is not None
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection(
+                        self.host, self.local_port, timeout=CONTROL_TIMEOUT
+                    )
+                self.conn.request("GET", control_path(action))
+                resp = self.conn.getresponse()
+                resp.read()  # drain so the connection can be reused
+                latency = time.perf_counter() - start
+                self.sent += 1
+                self.total_latency += latency
+                self.last_latency = latency
+                if resp.will_close:
+                    self._close()
+                return resp.status < 400, f"HTTP {resp.status}", latency
+            except STALE_CONNECTION_ERRORS as e:
+                # the phone closed the idle keep-alive connection before answering:
+                # the request was not handled, send it once more on a new connection
+                self._close()
+                if not reused or attempt == 1:
+                    return False, str(e), time.perf_counter() - start
+            except (OSError, http.client.HTTPException) as e:
+                # timeout or error once the request may have arrived: LED toggle,
+                # exposure lock and zoom steps are not idempotent, never resend
+                self._close()
+                return False, str(e) or type(e).__name__, time.perf_counter() - start
+        return False, "unreachable", time.perf_counter() - start
+
+    def _close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
@@ -0,0 +1,365 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from camera_client import CameraClient, DEFAULT_FPS, DEFAULT_CAPTURE_SOURCE, CAPTURE_TIMEOUT
+from metrics import CameraMetrics
+from retention import DiskUsage, STORAGE_OK
+from recorder import DRAIN_TIMEOUT
+from mjpeg_stream import JpegFrame
+from shm_ring import (
+    SharedFrameRing,
+    frame_from_ring,
+    KIND_JPEG,
+    KIND_BGR,
+    DEFAULT_SLOTS,
+    DEFAULT_SLOT_BYTES,
+)
+
+
+# "thread": CameraClient threads share the GUI interpreter (default)
+# "process": each camera's capture/decode/record runs in its own process
+EXECUTION_MODE_THREAD = "thread"
+EXECUTION_MODE_PROCESS = "process"
+DEFAULT_EXECUTION_MODE = EXECUTION_MODE_THREAD
+
+STATS_INTERVAL = 1.0  # seconds between record-stats reports from a worker
+STOP_TIMEOUT = 5.0  # seconds to wait for a worker before terminating it
+_MP = mp.get_context("spawn")  # same behaviour on Windows/macOS/Linux
+
+
+def create_camera_client(
+    cam_id, local_port, window, fps=DEFAULT_FPS, mode=DEFAULT_EXECUTION_MODE, read_timeout=CAPTURE_TIMEOUT
+):
+    """Tạo camera theo execution mode; hai loại có cùng giao diện."""
+    if mode == EXECUTION_MODE_PROCESS:
+        return CameraProcess(cam_id, local_port, window, fps=fps, read_timeout=read_timeout)
+    return CameraClient(cam_id, local_port, window, fps=fps, read_timeout=read_timeout)
+
+
+# ---------------- worker process side ----------------
+class _QueueWindow:
+    """Thay cho window trong process con: event được gửi về process chính."""
+
+    def __init__(self, evt_q):
+        self.evt_q = evt_q
+
+    def write_event_value(self, key, value):
+        self.evt_q.put((key, value))
+
+
+class _RingMailbox:
+    """Thay PreviewMailbox: frame mới nhất đi vào shared-memory ring."""
+
+    def __init__(self, ring, notify):
+        self.ring = ring
+        self.notify = notify
+        self.oversized = 0
+
+    def put(self, frame):
+        caught_up = self.ring.consumer_caught_up()
+        if isinstance(frame, JpegFrame):
+            seq = self.ring.write(frame.data, KIND_JPEG, ts=time.time())
+        else:
+            seq = self.ring.write(frame, KIND_BGR, frame.shape[:2], time.time())
+        if seq is None:
+            self.oversized += 1
+            return
+        if caught_up:
+            self.notify()
+
+
+def _camera_worker(
+    cam_id, local_port, fps, source, read_timeout, profiles, ring_name, slots, slot_bytes, cmd_q, evt_q
+):
+    ring = SharedFrameRing.attach(ring_name, slots, slot_bytes)
+    window = _QueueWindow(evt_q)
+    client = CameraClient(cam_id, local_port, window, fps=fps, source=source, read_timeout=read_timeout)
+    client.profile, client.record_profile = profiles
+    client.preview = _RingMailbox(ring, client._notify_frame)
+    # bytes are counted here and reported with _STATUS; the level comes from the GUI side
+    client.usage = DiskUsage()
+    # the adb forward lives in the GUI process: ask it to recreate the forward
+    client.reforward = lambda: window.write_event_value("_REFORWARD", None)
+    client.start_capture()
+    evt_q.put(("_STARTED", (client.running, client.error_msg)))
+    last_stats = 0.0
+    try:
+        while True:
+            try:
+                cmd, args = cmd_q.get(timeout=STATS_INTERVAL)
+            except queue.Empty:
+                cmd, args = None, None
+            if cmd == "stop":
+                break
+            if cmd == "fps":
+                client.fps = args
+            elif cmd == "save_folder":
+                client.set_save_folder(args)
+            elif cmd == "saving":
+                saving, kwargs = args
+                client.set_saving(saving, **kwargs)
+            elif cmd == "storage":
+                client.usage.level = args
+            now = time.time()
+            if now - last_stats >= STATS_INTERVAL or cmd == "saving":
+                evt_q.put(
+                    (
+                        "_STATUS",
+                        (client.running, client.record_stats(), client.metrics.drain(), client.usage.total),
+                    )
+                )
+                last_stats = now
+    finally:
+        client.stop_capture()
+        # the writers are daemon threads: finish the queued frames before the process exits
+        client.flush_recording()
+        evt_q.put(("_STATUS", (False, client.record_stats(), client.metrics.drain(), client.usage.total)))
+        ring.close()
+
+
+# ---------------- GUI process side ----------------
+class _RingPreview:
+    """Phía GUI của ring: take() trả về frame mới nhất chưa hiển thị."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.last_seq = 0
+        self.taken_ts = 0.0
+
+    def take(self):
+        ring = self.ring
+        if ring is None:
+            return None
+        got = ring.read_latest(self.last_seq)
+        if got is None:
+            return None
+        seq, kind, data, shape, ts = got
+        self.last_seq = seq
+        self.taken_ts = ts
+        return frame_from_ring(kind, data, shape)
+
+
+class CameraProcess:
+    """
+    Camera chạy trong process riêng (capture + decode + record), cùng giao
+    diện với CameraClient. Frame preview đi qua SharedFrameRing, các event
+    FRAME / CAM_ERROR được chuyển tiếp nguyên vẹn tới window.
+    """
+
+    def __init__(
+        self,
+        cam_id,
+        local_port,
+        window,
+        fps=DEFAULT_FPS,
+        source=DEFAULT_CAPTURE_SOURCE,
+        slots=DEFAULT_SLOTS,
+        slot_bytes=DEFAULT_SLOT_BYTES,
+        read_timeout=CAPTURE_TIMEOUT,
+    ):
+        self.cam_id = cam_id
+        self.local_port = local_port
+        self.window = window
+        self._fps = fps
+        self.source = source
+        self.read_timeout = read_timeout
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.running = False
+        self.error_msg = None
+        self.save_folder = None
+        self.saving = False
+        self.saving_kwargs = {}  # options of the last set_saving(True), replayed on start
+        self.proc = None
+        self.ring = None
+        self.preview = _RingPreview(None)
+        self.cmd_q = None
+        self.evt_q = None
+        self.pump = None
+        self.last_record_stats = None
+        self.reforward = None  # same hook as CameraClient.reforward, run on this side
+        self.usage = None  # session DiskUsage; the worker's byte count is added to it
+        self.profile = None  # StreamProfile pair handed to the worker at start
+        self.record_profile = None
+        self.usage_reported = 0  # worker bytes already added to usage
+        self.usage_level = STORAGE_OK  # storage level the worker was last sent
+        # worker-side stages arrive with _STATUS; preview stages are observed here
+        self.metrics = CameraMetrics(cam_id)
+        self.lock = threading.Lock()
+        self._generation = 0  # bumped by stop_capture(); a pending start with an older token gives up
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @fps.setter
+    def fps(self, value):
+        self._fps = value
+        self._send("fps", value)
+
+    def start_token(self):
+        """Như CameraClient.start_token()."""
+        return self._generation
+
+    def start_capture(self, token=None):
+        with self.lock:
+            if token is None:
+                token = self._generation
+            if self.running or token != self._generation:
+                return None
+            self.ring = SharedFrameRing.create(self.slots, self.slot_bytes)
+            self.preview = _RingPreview(self.ring)
+            self.cmd_q = _MP.Queue()
+            self.evt_q = _MP.Queue()
+            self.proc = _MP.Process(
+                target=_camera_worker,
+                args=(
+                    self.cam_id,
+                    self.local_port,
+                    self._fps,
+                    self.source,
+                    self.read_timeout,
+                    (self.profile, self.record_profile),
+                    self.ring.name,
+                    self.slots,
+                    self.slot_bytes,
+                    self.cmd_q,
+                    self.evt_q,
+                ),
+                name=f"cam{self.cam_id+1}-worker",
+                daemon=True,
+            )
+            self.proc.start()
+            if not self._wait_started(token):
+                stopped = token != self._generation
+                if not stopped:
+                    print(f"[cam{self.cam_id+1}] worker failed: {self.error_msg}")
+                self._shutdown()
+                return None if stopped else False
+            self.usage_reported = 0
+            self.usage_level = STORAGE_OK
+            self.pump = threading.Thread(target=self._pump_events, daemon=True)
+            self.pump.start()
+            self.running = True
+            if self.save_folder is not None:
+                self._send("save_folder", self.save_folder)
+            if self.saving:
+                # set_saving() may come before the worker is up (parallel start)
+                self._send("saving", (True, self.saving_kwargs))
+            self._sync_storage_level()
+            return True
+
+    def _wait_started(self, token):
+        # the worker reports whether the stream opened, like CameraClient does
+        deadline = time.time() + STOP_TIMEOUT * 2
+        while time.time() < deadline and self.proc.is_alive():
+            if token != self._generation:
+                self.error_msg = "Stopped while starting"
+                return False
+            try:
+                key, value = self.evt_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if key == "_STARTED":
+                running, self.error_msg = value
+                return running
+            self._forward(key, value)
+        self.error_msg = "Camera worker did not start"
+        return False
+
+    def stop_capture(self):
+        # outside the lock: a start_capture() waiting for its worker sees it and gives up
+        self._generation += 1
+        with self.lock:
+            self._shutdown()
+
+    def _shutdown(self):
+        self.running = False
+        self.saving = False
+        proc = self.proc
+        if proc is not None:
+            self._send("stop", None)
+            # the worker finishes its queued frames (up to DRAIN_TIMEOUT) before exiting
+            proc.join(STOP_TIMEOUT + DRAIN_TIMEOUT)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1.0)
+            self.proc = None
+        if self.pump is not None:
+            self.pump.join(STATS_INTERVAL * 2)
+            self.pump = None
+        self.preview = _RingPreview(None)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def set_save_folder(self, folder):
+        self.save_folder = folder
+        self._send("save_folder", folder)
+
+    def set_saving(self, saving: bool, mode=None, codec=None, segment_seconds=None, trigger=None):
+        kwargs = {"mode": mode, "codec": codec, "segment_seconds": segment_seconds, "trigger": trigger}
+        self.saving = bool(saving) and self.save_folder is not None
+        if self.saving:
+            self.saving_kwargs = kwargs
+        self._send("saving", (saving, kwargs))
+
+    def record_stats(self):
+        return self.last_record_stats
+
+    def flush_recording(self, timeout=None):
+        """Worker đã ghi xong trước _STATUS cuối (xem _camera_worker)."""
+        return True
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot(self._fps, self.last_record_stats)
+
+    def _sync_storage_level(self):
+        level = STORAGE_OK if self.usage is None else self.usage.level
+        if level != self.usage_level:
+            self.usage_level = level
+            self._send("storage", level)
+
+    def _send(self, cmd, args):
+        q = self.cmd_q
+        if q is not None and self.proc is not None:
+            q.put((cmd, args))
+
+    def _forward(self, key, value):
+        if key == "_STATUS":
+            running, stats, raw_metrics, written = value
+            if stats is not None:
+                self.last_record_stats = stats
+            self.metrics.merge(raw_metrics)
+            if self.usage is not None:
+                self.usage.add(written - self.usage_reported)
+                self.usage_reported = max(self.usage_reported, written)
+                self._sync_storage_level()
+            if not running:
+                self.running = False
+            return
+        if key == "_STARTED":
+            return
+        if key == "_REFORWARD":
+            if self.reforward is not None:
+                try:
+                    self.reforward()
+                except Exception as e:
+                    print(f"[cam{self.cam_id+1}] re-forward failed: {e}")
+            return
+        self.window.write_event_value(key, value)
+
+    def _pump_events(self):
+        evt_q = self.evt_q
+        while True:
+            proc = self.proc
+            try:
+                key, value = evt_q.get(timeout=0.5)
+            except queue.Empty:
+                if proc is None or not proc.is_alive():
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            self._forward(key, value)
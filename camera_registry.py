@@ -0,0 +1,107 @@
+import socket
+import threading
+
+
+BASE_LOCAL_PORT = 4747  # cam1 -> 4747, cam2 -> 4748, ...
+MAX_CAMERAS = 8
+DEVICE_REMOTE_PORT = 4747  # typical DroidCam server port on device
+
+
+def port_is_free(port, host="127.0.0.1"):
+    """True nếu local port chưa bị process khác chiếm."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind((host, port))
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+class PortAllocator:
+    """
+    Cấp local port cho adb forward. Ưu tiên port quen thuộc BASE + cam_idx
+    (giữ 4747/4748 cho cam1/cam2), bỏ qua port đang bận trên máy.
+    """
+
+    def __init__(self, base=BASE_LOCAL_PORT, span=64, check_free=port_is_free):
+        self.base = base
+        self.span = span
+        self.check_free = check_free
+        self.in_use = set()
+        self.lock = threading.Lock()
+
+    def allocate(self, preferred=None):
+        with self.lock:
+            candidates = list(range(self.base, self.base + self.span))
+            if preferred in candidates:
+                candidates.remove(preferred)
+                candidates.insert(0, preferred)
+            for port in candidates:
+                if port in self.in_use:
+                    continue
+                if self.check_free and not self.check_free(port):
+                    continue
+                self.in_use.add(port)
+                return port
+        return None
+
+    def release(self, port):
+        with self.lock:
+            self.in_use.discard(port)
+
+
+class CameraRegistry:
+    """
+    Bảng cam_idx -> (serial, local_port) cho số camera bất kỳ.
+    cam_idx luôn là chỉ số trống nhỏ nhất, nên ô GUI -IMG{cam_idx+1}- ổn định.
+    """
+
+    def __init__(self, max_cameras=MAX_CAMERAS, allocator=None):
+        self.max_cameras = max_cameras
+        self.allocator = allocator or PortAllocator()
+        self.lock = threading.Lock()
+        self._slots = {}  # cam_idx -> (serial, port)
+
+    def assign(self, serial):
+        """Gán serial vào cam trống. Trả về (cam_idx, port) hoặc None."""
+        with self.lock:
+            for idx, (s, port) in self._slots.items():
+                if s == serial:
+                    return idx, port
+            free = [i for i in range(self.max_cameras) if i not in self._slots]
+            if not free:
+                return None
+            cam_idx = free[0]
+            port = self.allocator.allocate(preferred=BASE_LOCAL_PORT + cam_idx)
+            if port is None:
+                return None
+            self._slots[cam_idx] = (serial, port)
+            return cam_idx, port
+
+    def release(self, cam_idx):
+        with self.lock:
+            entry = self._slots.pop(cam_idx, None)
+        if entry is not None:
+            self.allocator.release(entry[1])
+        return entry
+
+    def port(self, cam_idx):
+        with self.lock:
+            entry = self._slots.get(cam_idx)
+        return entry[1] if entry else None
+
+    def assigned(self):
+        """Snapshot {cam_idx: serial}."""
+        with self.lock:
+            return {idx: s for idx, (s, _) in self._slots.items()}
+
+    def items(self):
+        """Snapshot [(cam_idx, serial, port)] theo thứ tự cam_idx."""
+        with self.lock:
+            return [(idx, s, p) for idx, (s, p) in sorted(self._slots.items())]
+
+    def __len__(self):
+        with self.lock:
+            return len(self._slots)
@@ -1,160 +1,119 @@
 """
 droidcam_usb_multi.py
-- Kết nối tối đa 2 Android devices qua cáp USB (ADB)
-- Forward mỗi device local tcp ports 4747, 4748 --> device:4747
-- Hiển thị realtime 2 camera (cam1, cam2)
+- Kết nối nhiều Android devices qua cáp USB (ADB), tối đa MAX_CAMERAS
+- Forward mỗi device một local tcp port (4747, 4748, ...) --> device:4747
+- Hiển thị realtime các camera dạng lưới (cam1, cam2, ...)
 - Cho phép điều khiển app trên Android (adb start app, adb input tap)
-- Lưu frames vào folder OUTPUT_ROOT/<timestamp>_<MAC>/cam1 and cam2
+- Lưu frames vào folder OUTPUT_ROOT/<timestamp>_<MAC>/camN
 """
-import time
-import os
-import datetime
-import PySimpleGUI as sg # tránh circular import
-from utils import (
-    adb_start_app,
-    adb_input_tap,
-    now_timestamp_str,
-    mac_address_hex,
-
-)
-from device_manager import DeviceManager
-from ui import make_main_window
-from event_handlers import handle_device_added, handle_device_removed,handle_led_toggle, handle_zoom
+import sys
+from utils import log
+from log_sink import log_sink
+from metrics import format_stats
+from camera_registry import MAX_CAMERAS
+from preview import PreviewPump, preview_size_for
+from camera_process import DEFAULT_EXECUTION_MODE
+from capture_settings import load_settings, CaptureSettings, SETTINGS_FILE
+from startup import StartupTimeline
+from camera_control import CONTROL_ACTIONS
+from capture_core import CaptureCore
+from event_handlers import handle_camera_action, handle_app_start, parse_record_options
 
 
 
 # --------------- Config mặc định ---------------
 DEFAULT_FPS = 24
-LOCAL_PORTS = [4747, 4748]  # local ports for cam1, cam2
-DEVICE_REMOTE_PORT = 4747  # typical DroidCam server port on device
 OUTPUT_ROOT = "recordings"
-RECONNECT_INTERVAL = 2.0  # seconds between device checks
-CAPTURE_TIMEOUT = 5.0  # seconds
+CAPTURE_TIMEOUT = 5.0  # seconds: a stream read stalled this long is torn down and reopened
+# "thread" (default) or "process": one worker process per camera, frames to
+# the GUI through shared-memory rings (use with 4+ cameras)
+EXECUTION_MODE = DEFAULT_EXECUTION_MODE
+# "Sync cameras": frame sets whose capture times spread wider than this are dropped
+SYNC_MAX_SKEW = 0.025  # seconds
+# retention of OUTPUT_ROOT: oldest sessions are deleted (or moved to
+# RETENTION_ARCHIVE_ROOT, e.g. another disk) past the budget / free-space floor;
+# both are off by default, only finished sessions of this app are ever removed
+RETENTION_BUDGET_BYTES = 0  # 0 = no cap
+RETENTION_MIN_FREE_BYTES = 0  # e.g. 2 * retention.GIB; 0 = do not delete for free space
+RETENTION_ARCHIVE_ROOT = None
 
 
-def log(window, msg):
+def main():
+    # bring-up marks per camera (detected -> first frame) -> startup_timeline.csv
+    timeline = StartupTimeline()
+    # the GUI toolkit is loaded only when a window is shown (see headless.py)
+    import PySimpleGUI as sg
+    from ui import make_main_window, parse_tile_event
+
+    window = make_main_window(DEFAULT_FPS, MAX_CAMERAS)
+    # stream profiles (resolution / fps / record format per camera), device port
     try:
-        cur = window["-LOG-"].get()
-        new = cur + "\n" + f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {msg}"
-        window["-LOG-"].update(new)
-    except:
-        pass
+        settings = load_settings(SETTINGS_FILE)
+    except (OSError, ValueError) as e:
+        log(window, f"Ignoring {SETTINGS_FILE}: {e}", "error")
+        settings = CaptureSettings()
+    # devices, cameras, recording and shutdown order are shared with headless.py
+    core = CaptureCore(
+        window,
+        OUTPUT_ROOT,
+        DEFAULT_FPS,
+        settings,
+        EXECUTION_MODE,
+        CAPTURE_TIMEOUT,
+        MAX_CAMERAS,
+        sync_max_skew=SYNC_MAX_SKEW,
+        budget_bytes=RETENTION_BUDGET_BYTES,
+        min_free_bytes=RETENTION_MIN_FREE_BYTES,
+        archive_root=RETENTION_ARCHIVE_ROOT,
+        timeline=timeline,
+    )
+    previews = PreviewPump(size=preview_size_for(MAX_CAMERAS))
+    core.start()
 
-
-def main():
-    window = make_main_window(DEFAULT_FPS)
-    # state
-    cam_clients = [None, None]
-    cam_running = [False, False]
-    cam_saving = [False, False]
-    cam_save_dirs = [None, None]
-    fps = DEFAULT_FPS
-
-    # prepare root output folder
-    os.makedirs(OUTPUT_ROOT, exist_ok=True)
-    # create session folder with timestamp + mac
-    session_name = f"{now_timestamp_str()}_{mac_address_hex()}"
-    session_root = os.path.join(OUTPUT_ROOT, session_name)
-    os.makedirs(session_root, exist_ok=True)
-    log(window, f"Session root: {session_root}")
-
-    # start device manager
-    devmgr = DeviceManager(window)
-    devmgr.start()
-   
     # event loop
     try:
         while True:
-            event, values = window.read(timeout=200)
+            event, values = window.read(timeout=previews.interval_ms)
             if event == sg.WIN_CLOSED or event == "Exit":
                 break
+            # pull the newest frame of each camera at the GUI refresh rate
+            previews.pump(window, core.cam_clients)
+            log_sink.flush(window)
+            # FRAME only wakes the loop; previews.pump() above draws the frame
+            core.dispatch(event, values)
+
             if event == "-APPLYFPS-":
                 try:
                     newfps = float(values["-FPS-"])
-                    fps = max(1.0, newfps)
-                    # apply to existing clients
-                    for c in cam_clients:
-                        if c:
-                            c.fps = fps
-                    log(window, f"Applied FPS = {fps}")
+                    core.set_fps(max(1.0, newfps))
+                    log(window, f"Applied FPS = {core.fps}")
                 except Exception as e:
-                    log(window, f"Bad FPS value: {e}")
+                    log(window, f"Bad FPS value: {e}", "error")
 
             if event == "-START_ALL-":
-                print(f"[Main] Currently assigned devices: {devmgr.assigned}")
-                # attempt to start capture on any assigned device
-                for cam_idx, serial in devmgr.assigned.items():
-                    print(f"[Main] Starting cam{cam_idx+1} for device {serial}")
-                    handle_device_added(
-                        cam_idx,
-                        serial,
-                        window,
-                        cam_clients,
-                        cam_running,
-                        cam_save_dirs,
-                        session_root,
-                        fps,
-                        LOCAL_PORTS,
-                    )
+                core.start_all()
 
             if event == "-STOP_ALL-":
-                for idx in range(2):
-                    if cam_clients[idx]:
-                        cam_clients[idx].stop_capture()
-                        cam_clients[idx] = None
-                        window[f"-DEV{idx+1}-"].update("")
-                        log(window, f"Stopped cam{idx+1}")
+                for idx in core.stop_all():
+                    window[f"-DEV{idx+1}-"].update("")
+                    window[f"-STATS{idx+1}-"].update("")
 
             if event == "-START_REC-":
-                # start saving frames
-                for idx in range(2):
-                    if cam_clients[idx]:
-                        cam_clients[idx].set_saving(True)
-                        cam_saving[idx] = True
-                        log(
-                            window,
-                            f"Start recording cam{idx+1} -> {cam_save_dirs[idx]}",
-                        )
-                # optional: start recording on device via adb if configured (tap or start app)
-                pkgact = values.get("-PKGACT-", "").strip()
-                tap1 = values.get("-TAP1-", "").strip()
-                tap2 = values.get("-TAP2-", "").strip()
-                # handle devices
-
-                for cam_idx, serial in devmgr.assigned.items():
-                    if pkgact:
-                        ok = adb_start_app(serial, pkgact)
-                        log(window, f"adb start app for {serial}: {ok}")
-                        time.sleep(0.5)
-                    # if tap configured for this cam, send tap
-                    coords = tap1 if cam_idx == 0 else tap2
-                    if coords:
-                        try:
-                            x, y = coords.split(",")
-                            ok = adb_input_tap(serial, int(x), int(y))
-                            log(window, f"adb tap for {serial} at ({x},{y}): {ok}")
-                        except Exception as e:
-                            log(window, f"Bad tap coords for cam{cam_idx+1}: {e}")
+                # start saving frames, then optional adb start app / tap per device
+                core.start_recording(*parse_record_options(values), sync=bool(values.get("-SYNC-")))
+                handle_app_start(window, core.devmgr, values)
 
             if event == "-STOP_REC-":
-                for idx in range(2):
-                    if cam_clients[idx]:
-                        cam_clients[idx].set_saving(False)
-                        cam_saving[idx] = False
-                        log(window, f"Stop recording cam{idx+1}")
-            if event == '-LED1-':
-                   handle_led_toggle(window, cam_idx=0)
-            if event == '-LED2-':
-                   handle_led_toggle(window, cam_idx=1)
-            if event == '-ZOOMIN1-':
-                   handle_zoom(window, cam_idx=0, zoom_in=True)
-            if event == '-ZOOMOUT1-':
-                   handle_zoom(window, cam_idx=0, zoom_in=False)
-            if event == '-ZOOMIN2-':
-                   handle_zoom(window, cam_idx=1, zoom_in=True)
-            if event == '-ZOOMOUT2-':
-                   handle_zoom(window, cam_idx=1, zoom_in=False)
-
+                core.stop_recording()
+
+            # per-camera tile buttons: -LED3-, -ZOOMIN5-, -AF2-, ...
+            # sent on the camera's control thread, never blocks this loop
+            action, cam_idx = parse_tile_event(event)
+            client = core.cam_clients.get(cam_idx) if action else None
+            if action in CONTROL_ACTIONS and client:
+                handle_camera_action(
+                    window, core.cam_controls, cam_idx, client.local_port, CONTROL_ACTIONS[action]
+                )
 
             if event == "-WB_SETTINGS-":
                 sg.popup(
@@ -162,54 +121,22 @@ def main():
                     "Chức năng này sẽ mở menu White Balance...",
                 )
 
-            # frames/events from camera threads
-            if event == "FRAME":
-                cam_idx, png_bytes = values[event]
-                key = "-IMG1-" if cam_idx == 0 else "-IMG2-"
-                try:
-                    window[key].update(data=png_bytes)
-                except Exception as e:
-                    log(window, f"Error updating GUI image {cam_idx+1}: {e}")
-
-            if event == "CAM_ERROR":
-                cam_idx, errstr = values[event]
-                log(window, f"ERROR cam{cam_idx+1}: {errstr}")
-                sg.popup_ok(f"Camera {cam_idx+1} error: {errstr}")
-
-            if event == "DEVICE_ADDED":
-                print(f"[Main] DEVICE_ADDED event: {values[event]}", flush=True)
-                cam_idx, serial = values[event]
-                handle_device_added(
-                    cam_idx,
-                    serial,
-                    window,
-                    cam_clients,
-                    cam_running,
-                    cam_save_dirs,
-                    session_root,
-                    fps,
-                    LOCAL_PORTS,
-                )
-
-            if event == "DEVICE_REMOVED":
-                print(f"[Main] DEVICE_REMOVED event: {values[event]}", flush=True)
-                cam_idx, serial = values[event]
-                handle_device_removed(
-                    cam_idx, serial, window, cam_clients, cam_running
-                )
-                
-                
-                
-                
+            if event == "METRICS":
+                for cam_idx, snap in values[event].items():
+                    try:
+                        window[f"-STATS{cam_idx+1}-"].update(format_stats(snap))
+                    except Exception:
+                        pass
 
     finally:
-        # cleanup
-        devmgr.stop()
-        for idx in range(2):
-            if cam_clients[idx]:
-                cam_clients[idx].stop_capture()
+        core.close()
         window.close()
 
 
 if __name__ == "__main__":
-    main()
+    if "--headless" in sys.argv[1:]:
+        import headless
+
+        headless.main([a for a in sys.argv[1:] if a != "--headless"])
+    else:
+        main()
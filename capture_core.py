@@ -0,0 +1,296 @@
+"""
+capture_core.py
+Phần chung của GUI (capture.py) và headless.py: session folder, device
+manager, startup pool, battery, metrics, retention và state theo cam_idx.
+Front end đọc event (window hoặc EventBus) rồi gọi dispatch(); bắt đầu /
+dừng ghi và thứ tự dừng (close()) cũng nằm ở đây, để hai chế độ không lệch
+nhau. capture.py chỉ còn phần preview và widget.
+"""
+import time
+from utils import log
+from log_sink import log_sink
+from session_creator import SessionStore
+from device_manager import DeviceManager
+from telemetry import BatteryMonitor, BatteryStore
+from metrics import MetricsExporter
+from camera_registry import CameraRegistry, MAX_CAMERAS
+from camera_client import CAPTURE_TIMEOUT
+from camera_process import DEFAULT_EXECUTION_MODE, EXECUTION_MODE_PROCESS
+from sync_capture import SyncGroup, SYNC_MAX_SKEW, SYNC_SETTLE
+from motion import DEFAULT_TRIGGER
+from retention import RetentionManager
+from startup import StartupTimeline, StartupOrchestrator, STARTUP_WORKERS
+from event_handlers import (
+    handle_device_added,
+    handle_device_removed,
+    handle_ctrl_result,
+    stop_camera_control,
+    close_sync_group,
+    handle_status_event,
+    handle_startup_event,
+    STATUS_EVENTS,
+    STARTUP_EVENTS,
+)
+
+
+class CaptureCore:
+    """
+    Các service và state của một lần chạy capture. start() mở session và
+    chạy các service, dispatch() xử lý event chung (device, stream, startup,
+    CTRL_RESULT), close() dừng mọi thứ theo đúng thứ tự.
+    """
+
+    def __init__(
+        self,
+        window,
+        output_root,
+        fps,
+        settings,
+        execution_mode=DEFAULT_EXECUTION_MODE,
+        read_timeout=CAPTURE_TIMEOUT,
+        max_cameras=MAX_CAMERAS,
+        startup_workers=STARTUP_WORKERS,
+        sync_max_skew=SYNC_MAX_SKEW,
+        budget_bytes=0,
+        min_free_bytes=0,
+        archive_root=None,
+        timeline=None,
+    ):
+        self.window = window
+        self.output_root = output_root
+        self.fps = fps
+        self.settings = settings
+        self.execution_mode = execution_mode
+        self.read_timeout = read_timeout
+        self.startup_workers = startup_workers
+        self.sync_max_skew = sync_max_skew
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.archive_root = archive_root
+        # bring-up marks per camera (detected -> first frame) -> startup_timeline.csv
+        self.timeline = timeline or StartupTimeline()
+        # state, keyed by cam_idx
+        self.cam_clients = {}
+        self.cam_running = {}
+        self.cam_saving = {}
+        self.cam_save_dirs = {}
+        self.cam_controls = {}  # cam_idx -> CameraControl
+        self.sync = None  # SyncGroup while recording with sync
+        self.record_options = None  # set_saving() options while recording
+        self.retired = []  # stopped clients whose writers may still be draining
+        self.registry = CameraRegistry(max_cameras)
+        # session folder <output_root>/<timestamp>_<MAC>; camN/frames.idx indexes recorded frames
+        self.session = SessionStore(output_root=output_root)
+        self.session_root = self.session.root
+        self.devmgr = None
+        self.starter = None
+        self.battery = None
+        self.metrics = None
+        self.retention = None
+
+    def start(self):
+        window = self.window
+        log_sink.open_file(self.session_root)
+        self.timeline.open(self.session_root)
+        log(window, f"Session root: {self.session_root} ({self.timeline.mark_app('session'):.2f}s after launch)")
+        self.devmgr = DeviceManager(window, self.registry, self.settings.port, self.timeline)
+        self.devmgr.start()
+        # streams are opened on a bounded pool, not one after another on the event loop
+        self.starter = StartupOrchestrator(window, self.timeline, self.startup_workers)
+        # battery/temperature polling runs on its own, outside devmgr.lock
+        self.battery = BatteryMonitor(window, self.registry.assigned, BatteryStore(self.session_root))
+        self.battery.start()
+        # per-camera stage latencies / fps -> METRICS and session metrics.csv
+        self.metrics = MetricsExporter(window, lambda: self.cam_clients, self.session_root)
+        self.metrics.start()
+        # disk budget: removes old sessions, degrades recording before the disk fills
+        self.retention = RetentionManager(
+            window,
+            self.output_root,
+            self.session_root,
+            self.session.usage,
+            budget_bytes=self.budget_bytes,
+            min_free_bytes=self.min_free_bytes,
+            archive_root=self.archive_root,
+        )
+        self.retention.start()
+
+    # ---------------- events ----------------
+    def dispatch(self, event, values):
+        """Event chung của hai front end; gọi cho mọi event, kể cả timeout."""
+        self._settle_sync()
+        if event in STATUS_EVENTS:
+            handle_status_event(self.window, event, values[event])
+        elif event in STARTUP_EVENTS:
+            handle_startup_event(
+                self.window, event, values[event], self.cam_clients, self.cam_running, self.cam_save_dirs, self.timeline
+            )
+        elif event == "DEVICE_ADDED":
+            print(f"[Main] DEVICE_ADDED event: {values[event]}", flush=True)
+            cam_idx, serial = values[event]
+            port = self.registry.port(cam_idx)
+            if port is not None:
+                self.start_camera(cam_idx, serial, port)
+        elif event == "DEVICE_REMOVED":
+            print(f"[Main] DEVICE_REMOVED event: {values[event]}", flush=True)
+            cam_idx, serial = values[event]
+            self._retire(self.cam_clients.get(cam_idx))
+            handle_device_removed(cam_idx, serial, self.window, self.cam_clients, self.cam_running, self.starter)
+            self.cam_saving[cam_idx] = False
+            stop_camera_control(self.cam_controls, cam_idx)
+        elif event == "CTRL_RESULT":
+            handle_ctrl_result(self.window, values[event])
+
+    def _settle_sync(self):
+        # cameras that arrive one DEVICE_ADDED at a time: the group is fixed once that settles
+        sync = self.sync
+        if sync is not None and not sync.frozen and sync.members:
+            if time.monotonic() - sync.last_join >= SYNC_SETTLE:
+                members = ", ".join(f"cam{i+1}" for i in sync.freeze())
+                log(self.window, f"Sync group: {members}, recording frame sets")
+
+    # ---------------- cameras ----------------
+    def start_camera(self, cam_idx, serial, port):
+        handle_device_added(
+            cam_idx,
+            serial,
+            self.window,
+            self.cam_clients,
+            self.cam_running,
+            self.cam_save_dirs,
+            self.session_root,
+            self.fps,
+            port,
+            self.execution_mode,
+            self.read_timeout,
+            self.session.usage,
+            self.settings,
+            self.starter,
+        )
+        # while recording, a camera that comes (back) records from its first frame
+        client = self.cam_clients.get(cam_idx)
+        if self.record_options is not None and client is not None and not self.cam_saving.get(cam_idx):
+            self._record(cam_idx, client)
+
+    def start_all(self):
+        print(f"[Main] Currently assigned devices: {self.devmgr.assigned}")
+        for cam_idx, serial, port in self.registry.items():
+            print(f"[Main] Starting cam{cam_idx+1} for device {serial}")
+            self.start_camera(cam_idx, serial, port)
+
+    def stop_all(self):
+        """Dừng mọi camera (và recording). Trả về các cam_idx đã dừng."""
+        self.stop_recording()
+        stopped = []
+        for idx, client in list(self.cam_clients.items()):
+            if client:
+                self.starter.cancel(idx)
+                client.stop_capture()
+                self._retire(client)
+                self.cam_clients[idx] = None
+                self.cam_running[idx] = False
+                stop_camera_control(self.cam_controls, idx)
+                log(self.window, f"Stopped cam{idx+1}")
+                stopped.append(idx)
+        return stopped
+
+    def _retire(self, client):
+        # forget the ones whose writers are done, so the list stays short
+        self.retired = [c for c in self.retired if not c.flush_recording(0)]
+        if client is not None and client not in self.retired:
+            self.retired.append(client)
+
+    def set_fps(self, fps):
+        self.fps = fps
+        for client in self.cam_clients.values():
+            if client:
+                client.fps = fps
+        if self.sync is not None:
+            self.sync.clock.set_fps(fps)
+
+    # ---------------- recording ----------------
+    def start_recording(self, mode, codec, segment_seconds, trigger=DEFAULT_TRIGGER, sync=False):
+        if self.record_options is not None:
+            log(self.window, "Already recording")
+            return
+        if sync:
+            if self.execution_mode == EXECUTION_MODE_PROCESS:
+                log(self.window, "Sync cameras needs the thread execution mode, recording unsynced", "warning")
+            else:
+                self.sync = SyncGroup(self.session_root, self.fps, self.sync_max_skew)
+                log(
+                    self.window,
+                    f"Synchronized recording at {self.fps:g} fps, max skew {self.sync_max_skew*1000:.0f}ms",
+                )
+                if trigger != DEFAULT_TRIGGER:
+                    log(self.window, "Motion trigger is not used with Sync cameras, recording every frame set", "warning")
+        self.record_options = {"mode": mode, "codec": codec, "segment_seconds": segment_seconds, "trigger": trigger}
+        present = [idx for idx, client in self.cam_clients.items() if client]
+        if self.sync is not None and present:
+            # every member first: a set is only complete once all cameras are in the group
+            self.sync.join_all(present)
+        for idx in present:
+            self._record(idx, self.cam_clients[idx])
+
+    def _record(self, cam_idx, client):
+        options = self.record_options
+        # joins the sync group (if any) before the first frame is recorded
+        client.sync = self.sync
+        client.set_saving(True, **options)
+        self.cam_saving[cam_idx] = True
+        log(
+            self.window,
+            f"Start recording cam{cam_idx+1} ({options['mode']}, {options['trigger']}) -> {self.cam_save_dirs.get(cam_idx)}",
+        )
+
+    def stop_recording(self):
+        if self.record_options is None:
+            return
+        self.record_options = None
+        for idx, client in self.cam_clients.items():
+            if client:
+                client.set_saving(False)
+                client.sync = None
+                self.cam_saving[idx] = False
+                log(self.window, f"Stop recording cam{idx+1}")
+                self._log_record_stats(idx, client)
+        if self.sync is not None:
+            close_sync_group(self.window, self.sync)
+            self.sync = None
+
+    def _log_record_stats(self, idx, client):
+        stats = client.record_stats()
+        if stats:
+            log(
+                self.window,
+                f"cam{idx+1} recorded {stats['submitted']} frames, "
+                f"dropped {stats['dropped']}, queued {stats['queue_depth']}",
+            )
+
+    # ---------------- shutdown ----------------
+    def close(self):
+        log(self.window, "Stopping")
+        self.devmgr.stop()
+        self.starter.stop()
+        self.battery.stop()
+        self.metrics.stop()
+        for idx in list(self.cam_controls):
+            stop_camera_control(self.cam_controls, idx)
+        for client in self.cam_clients.values():
+            if client:
+                client.stop_capture()
+        # the session size saved by retention.stop() must count the frames still queued
+        for client in self.retired:
+            client.flush_recording()
+        for idx, client in self.cam_clients.items():
+            if client:
+                if not client.flush_recording():
+                    log(self.window, f"cam{idx+1} still writing at shutdown, session size may be low", "warning")
+                self._log_record_stats(idx, client)
+        if self.sync is not None:
+            close_sync_group(self.window, self.sync)
+            self.sync = None
+        # after the cameras, so the saved session size includes their last writes
+        self.retention.stop()
+        self.timeline.close()
+        log_sink.close()
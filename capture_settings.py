@@ -0,0 +1,149 @@
+"""
+capture_settings.py
+Đọc capture_settings.dat (dạng key=value, dòng bắt đầu bằng # là comment):
+
+    ip=192.168.0.7            # DroidCam over Wi-Fi (USB mode uses adb forwards)
+    port=4747                 # DroidCam port on the phone
+    ask_settings=True
+
+    profile.preview.size=640x480      # -> http://.../video?640x480
+    profile.preview.fps=15
+    profile.hd.size=1920x1080
+    profile.hd.fps=30
+    profile.hd.format=jpg             # record mode: png / segment / jpg
+    profile.hd.quality=90             # JPEG quality for format=jpg
+
+    preview_profile=preview   # every camera while not recording
+    record_profile=hd         # every camera while recording
+    cam2.record_profile=preview
+
+Không có profile thì camera mở /video như trước (độ phân giải mặc định của app).
+"""
+import collections
+import os
+from camera_registry import DEVICE_REMOTE_PORT
+from recorder import RECORD_MODES
+
+
+SETTINGS_FILE = "capture_settings.dat"
+PROFILE_FIELDS = ("size", "fps", "quality", "format")
+
+# size: (width, height) requested from DroidCam, None = app default;
+# fps: target capture FPS while the profile is active, None = keep the current one;
+# quality: JPEG quality for format "jpg"; format: record mode, None = the one chosen in the GUI/CLI
+StreamProfile = collections.namedtuple("StreamProfile", "name size fps quality format")
+
+
+def parse_size(text):
+    """'1280x720' -> (1280, 720)."""
+    w, sep, h = text.lower().partition("x")
+    if not sep:
+        raise ValueError(f"size must be WIDTHxHEIGHT, got {text!r}")
+    size = (int(w), int(h))
+    if min(size) <= 0:
+        raise ValueError(f"bad size {text!r}")
+    return size
+
+
+def _parse_bool(text):
+    value = text.strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"expected True/False, got {text!r}")
+
+
+def _parse_field(field, text):
+    if field == "size":
+        return parse_size(text)
+    if field == "fps":
+        fps = float(text)
+        if fps <= 0:
+            raise ValueError(f"fps must be > 0, got {text!r}")
+        return fps
+    if field == "quality":
+        quality = int(text)
+        if not 1 <= quality <= 100:
+            raise ValueError(f"quality must be 1..100, got {text!r}")
+        return quality
+    if text not in RECORD_MODES:
+        raise ValueError(f"format must be one of {', '.join(RECORD_MODES)}, got {text!r}")
+    return text
+
+
+class CaptureSettings:
+    """
+    Nội dung capture_settings.dat. camera_profiles(cam_idx) trả về
+    (profile preview, profile record) của camera; None = không đổi gì.
+    """
+
+    def __init__(self):
+        self.ip = None
+        self.port = DEVICE_REMOTE_PORT
+        self.ask_settings = False
+        self.profiles = {}  # name -> StreamProfile
+        self.preview_profile = None  # default profile names
+        self.record_profile = None
+        self.cameras = {}  # cam_idx -> {"preview_profile": name, "record_profile": name}
+
+    def camera_profiles(self, cam_idx):
+        chosen = self.cameras.get(cam_idx, {})
+        preview = chosen.get("preview_profile", self.preview_profile)
+        record = chosen.get("record_profile", self.record_profile)
+        return self.profiles.get(preview), self.profiles.get(record)
+
+
+def load_settings(path=SETTINGS_FILE):
+    """Đọc file settings; file không tồn tại -> settings mặc định. Sai cú pháp -> ValueError."""
+    settings = CaptureSettings()
+    if not os.path.exists(path):
+        return settings
+    fields = {}  # profile name -> {field: value}
+    chosen = []  # (line, cam_idx or None, key, profile name), checked after all profiles are read
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            key, sep, value = line.partition("=")
+            key, value = key.strip(), value.strip()
+            where = f"{path}:{lineno}"
+            if not sep or not value:
+                raise ValueError(f"{where}: expected key=value")
+            parts = key.split(".")
+            try:
+                if key == "ip":
+                    settings.ip = value
+                elif key == "port":
+                    settings.port = int(value)
+                elif key == "ask_settings":
+                    settings.ask_settings = _parse_bool(value)
+                elif len(parts) == 3 and parts[0] == "profile" and parts[2] in PROFILE_FIELDS:
+                    fields.setdefault(parts[1], {})[parts[2]] = _parse_field(parts[2], value)
+                elif key in ("preview_profile", "record_profile"):
+                    chosen.append((where, None, key, value))
+                elif (
+                    len(parts) == 2
+                    and parts[0].startswith("cam")
+                    and parts[0][3:].isdigit()
+                    and int(parts[0][3:]) > 0
+                    and parts[1] in ("preview_profile", "record_profile")
+                ):
+                    chosen.append((where, int(parts[0][3:]) - 1, parts[1], value))
+                else:
+                    raise ValueError(f"unknown key {key!r}")
+            except ValueError as e:
+                raise ValueError(f"{where}: {e}") from None
+    for name, values in fields.items():
+        settings.profiles[name] = StreamProfile(
+            name, values.get("size"), values.get("fps"), values.get("quality"), values.get("format")
+        )
+    for where, cam_idx, key, name in chosen:
+        if name not in settings.profiles:
+            raise ValueError(f"{where}: unknown profile {name!r}")
+        if cam_idx is None:
+            setattr(settings, key, name)
+        else:
+            settings.cameras.setdefault(cam_idx, {})[key] = name
+    return settings
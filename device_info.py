@@ -0,0 +1,181 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Optional
+from utils import run_adb
+
+
+DEVICE_INFO_TTL = 300.0  # seconds a cached DeviceInfo stays fresh
+DEVICE_INFO_WORKERS = 4
+SECTION = "==="  # prefix of the section markers in the batched command
+
+# One adb shell round-trip instead of six. /proc/cpuinfo is reduced on the
+# device to a core count and the hardware line.
+BATCH_COMMAND = "; ".join(
+    [
+        f"echo {SECTION}model",
+        "getprop ro.product.model",
+        f"echo {SECTION}manufacturer",
+        "getprop ro.product.manufacturer",
+        f"echo {SECTION}android_version",
+        "getprop ro.build.version.release",
+        f"echo {SECTION}battery",
+        "dumpsys battery",
+        f"echo {SECTION}storage",
+        "df /data",
+        f"echo {SECTION}cpu_cores",
+        "grep -c ^processor /proc/cpuinfo",
+        f"echo {SECTION}cpu_hardware",
+        "grep -m 1 Hardware /proc/cpuinfo",
+    ]
+)
+
+
+@dataclass
+class DeviceInfo:
+    serial: str
+    model: str = ""
+    manufacturer: str = ""
+    android_version: str = ""
+    battery_level: Optional[int] = None
+    battery_status: Optional[int] = None
+    temperature_c: Optional[float] = None
+    storage_total_kb: Optional[int] = None
+    storage_avail_kb: Optional[int] = None
+    cpu_cores: Optional[int] = None
+    cpu_hardware: str = ""
+    fetched_at: float = 0.0
+    error: Optional[str] = None
+
+    def as_dict(self):
+        return asdict(self)
+
+    def summary(self):
+        if self.error:
+            return f"{self.serial}: error {self.error}"
+        parts = [f"{self.manufacturer} {self.model}".strip(), f"Android {self.android_version}"]
+        if self.battery_level is not None:
+            parts.append(f"battery {self.battery_level}%")
+        if self.temperature_c is not None:
+            parts.append(f"{self.temperature_c:.1f}°C")
+        if self.storage_avail_kb is not None:
+            parts.append(f"free {self.storage_avail_kb / 1048576:.1f} GB")
+        if self.cpu_cores:
+            parts.append(f"{self.cpu_cores} cores")
+        return ", ".join(parts)
+
+
+def _split_sections(text):
+    sections, name = {}, None
+    for line in text.splitlines():
+        if line.startswith(SECTION):
+            name = line[len(SECTION):].strip()
+            sections[name] = []
+        elif name is not None:
+            sections[name].append(line)
+    return {k: "\n".join(v).strip() for k, v in sections.items()}
+
+
+def _to_int(s):
+    try:
+        return int(s.strip())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def parse_device_info(serial, text):
+    sec = _split_sections(text)
+    info = DeviceInfo(
+        serial=serial,
+        model=sec.get("model", ""),
+        manufacturer=sec.get("manufacturer", ""),
+        android_version=sec.get("android_version", ""),
+        cpu_cores=_to_int(sec.get("cpu_cores")),
+        fetched_at=time.time(),
+    )
+    for line in sec.get("battery", "").splitlines():
+        key, _, value = line.strip().partition(":")
+        if key == "level":
+            info.battery_level = _to_int(value)
+        elif key == "status":
+            info.battery_status = _to_int(value)
+        elif key == "temperature":
+            t = _to_int(value)
+            info.temperature_c = t / 10.0 if t is not None else None
+    # df: "Filesystem 1K-blocks Used Available Use% Mounted on" + one data row
+    rows = [r.split() for r in sec.get("storage", "").splitlines()[1:] if r.strip()]
+    if rows and len(rows[-1]) >= 4:
+        info.storage_total_kb = _to_int(rows[-1][1])
+        info.storage_avail_kb = _to_int(rows[-1][3])
+    hw = sec.get("cpu_hardware", "")
+    if ":" in hw:
+        info.cpu_hardware = hw.split(":", 1)[1].strip()
+    return info
+
+
+def fetch_device_info(serial, timeout=10):
+    """Lấy thông tin thiết bị bằng một lệnh adb shell duy nhất (blocking)."""
+    out, err, code = run_adb(["-s", serial, "shell", BATCH_COMMAND], timeout=timeout)
+    if code != 0 and not out:
+        return DeviceInfo(serial=serial, fetched_at=time.time(), error=err or f"exit {code}")
+    return parse_device_info(serial, out)
+
+
+class DeviceInfoCache:
+    """
+    Cache DeviceInfo theo serial với TTL. fetch_async() chạy trên executor
+    nền, không bao giờ chặn GUI thread; nhiều yêu cầu cùng lúc cho một serial
+    chỉ tạo một lần gọi adb.
+    """
+
+    def __init__(self, ttl=DEVICE_INFO_TTL, workers=DEVICE_INFO_WORKERS):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="devinfo")
+        self.lock = threading.Lock()
+        self._cache = {}  # serial -> DeviceInfo
+        self._pending = {}  # serial -> [callbacks]
+
+    def get(self, serial):
+        """DeviceInfo còn hạn trong cache, hoặc None."""
+        with self.lock:
+            info = self._cache.get(serial)
+        if info is not None and time.time() - info.fetched_at < self.ttl:
+            return info
+        return None
+
+    def fetch_async(self, serial, callback=None):
+        cached = self.get(serial)
+        if cached is not None:
+            if callback:
+                callback(cached)
+            return
+        with self.lock:
+            if serial in self._pending:
+                if callback:
+                    self._pending[serial].append(callback)
+                return
+            self._pending[serial] = [callback] if callback else []
+        self.executor.submit(self._fetch, serial)
+
+    def invalidate(self, serial):
+        with self.lock:
+            self._cache.pop(serial, None)
+
+    def _fetch(self, serial):
+        try:
+            info = fetch_device_info(serial)
+        except Exception as e:
+            info = DeviceInfo(serial=serial, fetched_at=time.time(), error=str(e))
+        with self.lock:
+            if info.error is None:
+                self._cache[serial] = info
+            callbacks = self._pending.pop(serial, [])
+        for cb in callbacks:
+            try:
+                cb(info)
+            except Exception as e:
+                print(f"[DeviceInfo] callback error for {serial}: {e}")
+
+
+device_info_cache = DeviceInfoCache()
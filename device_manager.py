@@ -1,96 +1,190 @@
 
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-LOCAL_PORTS = [4747, 4748]
-DEVICE_REMOTE_PORT = 4747
-RECONNECT_INTERVAL = 2.0  # seconds between device checks
-CAPTURE_TIMEOUT = 5.0  # seconds
-BATTERY_POLL_INTERVAL = 5.0  # typical DroidCam server port on device
+RECONNECT_INTERVAL = 2.0  # seconds between device checks (polling fallback)
+TRACKER_RETRY_INTERVAL = 5.0  # seconds before reconnecting host:track-devices
+TRACKED_IDLE_WAIT = 30.0  # seconds between safety re-syncs while track-devices is up
+FORWARD_WORKERS = 8  # adb forwards set up at the same time
 from utils import (
     list_adb_devices,
     adb_forward_for_device,
     adb_kill_forward_for_device,
-    get_battery_via_adb
+    ADB_BACKEND,
+    _adb_client,
 )
+from camera_registry import CameraRegistry, DEVICE_REMOTE_PORT
+
+
+class DeviceTracker(threading.Thread):
+    """
+    Giữ kết nối host:track-devices tới adb server; server đẩy danh sách thiết
+    bị mỗi khi có thay đổi nên không phải poll. Gọi on_change() sau mỗi lần
+    cập nhật. Nếu mất kết nối thì connected=False (DeviceManager quay về
+    poll) và thử kết nối lại sau TRACKER_RETRY_INTERVAL.
+    """
+
+    def __init__(self, client, on_change):
+        super().__init__(daemon=True)
+        self.client = client
+        self.on_change = on_change
+        self.running = True
+        self.connected = False
+        self.devices = []
+        self.sock = None
+        self.lock = threading.Lock()
+
+    def stop(self):
+        self.running = False
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.close()  # unblocks read_tracker()
+            except Exception:
+                pass
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.devices)
+
+    def run(self):
+        while self.running:
+            try:
+                self.sock = self.client.open_tracker()
+                print("[DeviceTracker] Tracking devices via host:track-devices")
+                while self.running:
+                    devices = self.client.read_tracker(self.sock)
+                    with self.lock:
+                        self.devices = devices
+                        self.connected = True
+                    self.on_change()
+            except Exception as e:
+                if self.running:
+                    print(f"[DeviceTracker] Tracking unavailable, polling instead: {e}")
+            finally:
+                with self.lock:
+                    self.connected = False
+                if self.sock is not None:
+                    try:
+                        self.sock.close()
+                    except Exception:
+                        pass
+                    self.sock = None
+            self.on_change()  # let DeviceManager fall back to polling now
+            end = time.time() + TRACKER_RETRY_INTERVAL
+            while self.running and time.time() < end:
+                time.sleep(0.2)
 
 
 class DeviceManager(threading.Thread):
-    def __init__(self, window):
+    def __init__(self, window, registry=None, remote_port=DEVICE_REMOTE_PORT, timeline=None):
         super().__init__(daemon=True)
         self.window = window
-        self.assigned = {}  # cam_index -> serial
+        self.registry = registry if registry is not None else CameraRegistry()
+        self.remote_port = remote_port  # DroidCam port on the phone ("port" in capture_settings.dat)
+        self.timeline = timeline  # optional StartupTimeline: detected / forwarded marks
+        self.forward_pool = ThreadPoolExecutor(max_workers=FORWARD_WORKERS, thread_name_prefix="adb-forward")
         self.lock = threading.Lock()
         self.running = True
-        self._last_battery_poll = 0.0
+        self._wake = threading.Event()
+        self.tracker = None
+        if ADB_BACKEND == "native":
+            self.tracker = DeviceTracker(_adb_client, self._wake.set)
+
+    @property
+    def assigned(self):
+        # cam_index -> serial (snapshot)
+        return self.registry.assigned()
 
     def stop(self):
         self.running = False
+        if self.tracker is not None:
+            self.tracker.stop()
+        self._wake.set()
+        self.forward_pool.shutdown(wait=False)
+
+    def _current_devices(self):
+        # pushed list when track-devices is up, otherwise poll `adb devices`
+        tracker = self.tracker
+        if tracker is not None and tracker.connected:
+            return tracker.snapshot()
+        return list_adb_devices()
+
+    def _next_wait(self):
+        if self.tracker is not None and self.tracker.connected:
+            # nothing to poll: sleep until the adb server pushes a change
+            return TRACKED_IDLE_WAIT
+        return RECONNECT_INTERVAL
 
     def run(self):
+        if self.tracker is not None:
+            self.tracker.start()
         while self.running:
+            self._wake.clear()
             try:
-                devices = list_adb_devices()  # list of (serial, status)
+                devices = self._current_devices()  # list of (serial, status)
                 serials = [s for s, st in devices if st == "device"]
 
                 removed = []
-                added = []
+                slots = []  # (cam_idx, serial, port) still to be forwarded
 
                 # --------------- Lock chỉ khi thao tác dữ liệu ---------------
                 with self.lock:
                     # xử lý thiết bị bị rút
-                    for cam_idx, serial in list(self.assigned.items()):
+                    for cam_idx, serial, port in self.registry.items():
                         if serial not in serials:
                             removed.append((cam_idx, serial))
                             try:
-                                adb_kill_forward_for_device(serial, LOCAL_PORTS[cam_idx])
+                                adb_kill_forward_for_device(serial, port)
                             except Exception:
                                 pass
-                            del self.assigned[cam_idx]
-
-                    # tìm các cam trống
-                    free_cam_indices = [0, 1]
-                    for idx in list(self.assigned.keys()):
-                        if idx in free_cam_indices:
-                            free_cam_indices.remove(idx)
+                            self.registry.release(cam_idx)
+                            _adb_client.forget(serial)
 
-                    # assign thiết bị mới
+                    # assign thiết bị mới vào cam trống (không giới hạn 2 cam)
+                    known = set(self.registry.assigned().values())
                     for s in serials:
-                        if s in self.assigned.values():
+                        if s in known:
                             continue
-                        if not free_cam_indices:
+                        slot = self.registry.assign(s)
+                        if slot is None:
+                            print(f"[DeviceManager] No free camera slot for {s}")
                             break
-                        cam_idx = free_cam_indices.pop(0)
-                        ok = adb_forward_for_device(s, LOCAL_PORTS[cam_idx], DEVICE_REMOTE_PORT)
-                        if ok:
-                            self.assigned[cam_idx] = s
-                            added.append((cam_idx, s))
-                        else:
-                            print(f"[DeviceManager] Forward failed for {s} -> local {LOCAL_PORTS[cam_idx]}")
-
-                    # poll battery nếu đủ thời gian
-                    now = time.time()
-                    battery_updates = []
-                    if now - self._last_battery_poll >= BATTERY_POLL_INTERVAL:
-                        for cam_idx, serial in self.assigned.items():
-                            try:
-                                print(f"[DeviceManager] Polling battery for cam{cam_idx+1} ({serial})")
-                                info = get_battery_via_adb(serial,self.window)
-                                print(f"[DeviceManager] Battery for cam{cam_idx+1} ({serial}): {info}")
-                                battery_updates.append((cam_idx, serial, info))
-                            except Exception:
-                                pass
-                        self._last_battery_poll = now
+                        cam_idx, port = slot
+                        slots.append((cam_idx, s, port))
+                        if self.timeline is not None:
+                            self.timeline.mark(cam_idx, "detected", serial=s)
 
                 # --------------- Push event ra ngoài lock ---------------
                 for cam_idx, serial in removed:
                     self.window.write_event_value('DEVICE_REMOVED', (cam_idx, serial))
-                for cam_idx, serial in added:
-                    self.window.write_event_value('DEVICE_ADDED', (cam_idx, serial))
-                for cam_idx, serial, info in battery_updates:
-                    self.window.write_event_value('BATTERY_UPDATE', (cam_idx, serial, info))
+                # forwards run in parallel, outside the lock; each camera is
+                # announced as soon as its own forward is up
+                self._forward_all(slots)
 
             except Exception as e:
                 print(f"[DeviceManager] Error in run loop: {e}")
 
-            time.sleep(RECONNECT_INTERVAL)
\ No newline at end of file
+            self._wake.wait(self._next_wait())
+
+    def _forward_all(self, slots):
+        futures = {
+            self.forward_pool.submit(adb_forward_for_device, s, port, self.remote_port): (cam_idx, s, port)
+            for cam_idx, s, port in slots
+        }
+        for fut in as_completed(futures):
+            cam_idx, s, port = futures[fut]
+            try:
+                ok = fut.result()
+            except Exception as e:
+                print(f"[DeviceManager] Forward error for {s}: {e}")
+                ok = False
+            if ok:
+                if self.timeline is not None:
+                    self.timeline.mark(cam_idx, "forwarded")
+                self.window.write_event_value('DEVICE_ADDED', (cam_idx, s))
+            else:
+                with self.lock:
+                    self.registry.release(cam_idx)
+                print(f"[DeviceManager] Forward failed for {s} -> local {port}")
\ No newline at end of file
@@ -0,0 +1,49 @@
+import queue
+
+
+TIMEOUT_EVENT = "__TIMEOUT__"  # same value as PySimpleGUI's TIMEOUT_KEY
+
+
+class _NullElement:
+    def update(self, *args, **kwargs):
+        pass
+
+
+class EventBus:
+    """
+    Hàng đợi event khi chạy không có GUI. Cùng giao diện với window
+    PySimpleGUI mà các thread đang dùng: write_event_value() từ mọi thread,
+    read() trả về (event, values) như window.read(), window[key].update()
+    là no-op. Consumer (stdout, file trạng thái, ...) đăng ký bằng subscribe()
+    và được gọi trong thread đang read().
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.subscribers = []
+
+    def write_event_value(self, key, value):
+        self.events.put((key, value))
+
+    def subscribe(self, callback):
+        """callback(event, value) cho mọi event đọc ra từ bus."""
+        self.subscribers.append(callback)
+
+    def __getitem__(self, key):
+        return _NullElement()
+
+    def read(self, timeout=None):
+        """timeout tính bằng ms như window.read(); None = chờ tới khi có event."""
+        try:
+            key, value = self.events.get(timeout=None if timeout is None else timeout / 1000.0)
+        except queue.Empty:
+            return TIMEOUT_EVENT, {}
+        for callback in list(self.subscribers):
+            try:
+                callback(key, value)
+            except Exception as e:
+                print(f"[EventBus] subscriber error on {key}: {e}")
+        return key, {key: value}
+
+    def close(self):
+        pass
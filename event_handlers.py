@@ -1,64 +1,143 @@
 import os
 import time
-import PySimpleGUI as sg
-from utils import log, adb_start_app, adb_input_tap
-from camera_client import CameraClient
-import urllib.request
-import subprocess
+from utils import log, adb_start_app, adb_input_tap, adb_forward_for_device
+from device_info import device_info_cache, fetch_device_info
+from camera_client import CAPTURE_TIMEOUT
+from camera_process import create_camera_client, DEFAULT_EXECUTION_MODE
+from camera_control import CameraControl
+from camera_registry import DEVICE_REMOTE_PORT
+from recorder import (
+    RECORD_MODES,
+    SEGMENT_CODECS,
+    DEFAULT_RECORD_MODE,
+    DEFAULT_SEGMENT_CODEC,
+    DEFAULT_SEGMENT_SECONDS,
+)
+from motion import RECORD_TRIGGERS, DEFAULT_TRIGGER
+from retention import STORAGE_OK, STORAGE_LOW, MIB
+from startup import format_bring_up
 
-CAM_PORTS = [4747, 4748]
+def get_device_info(serial):
+    """Blocking; GUI code should use device_info_cache.fetch_async instead."""
+    return fetch_device_info(serial).as_dict()
 
 
-def get_camera_url(cam_idx, action):
-    # cam_num = cam_idx + 1
-    port = CAM_PORTS[cam_idx]
-    return f"http://127.0.0.1:{port}/cam/1/{action}"
+def parse_record_options(values):
+    """Đọc record mode / codec / segment length / trigger từ các ô trên GUI."""
+    mode = values.get("-RECMODE-") or DEFAULT_RECORD_MODE
+    if mode not in RECORD_MODES:
+        mode = DEFAULT_RECORD_MODE
+    codec = values.get("-CODEC-") or DEFAULT_SEGMENT_CODEC
+    if codec not in SEGMENT_CODECS:
+        codec = DEFAULT_SEGMENT_CODEC
+    try:
+        segment_seconds = max(1.0, float(values.get("-SEGSEC-", "")))
+    except (TypeError, ValueError):
+        segment_seconds = DEFAULT_SEGMENT_SECONDS
+    trigger = values.get("-TRIGGER-") or DEFAULT_TRIGGER
+    if trigger not in RECORD_TRIGGERS:
+        trigger = DEFAULT_TRIGGER
+    return mode, codec, segment_seconds, trigger
 
 
-def get_device_info(serial):
-    def adb(cmd):
-        return subprocess.check_output(
-            ["adb", "-s", serial] + cmd, encoding="utf-8"
-        ).strip()
+def get_camera_control(cam_controls, cam_idx, port, window):
+    """Kênh điều khiển của camera, tạo mới nếu chưa có hoặc port đã đổi."""
+    ctrl = cam_controls.get(cam_idx)
+    if ctrl is not None and ctrl.local_port != port:
+        ctrl.stop()
+        ctrl = None
+    if ctrl is None:
+        ctrl = CameraControl(cam_idx, port, window)
+        ctrl.start()
+        cam_controls[cam_idx] = ctrl
+    return ctrl
 
-    info = {}
-    try:
-        info["model"] = adb(["shell", "getprop", "ro.product.model"])
-        info["manufacturer"] = adb(["shell", "getprop", "ro.product.manufacturer"])
-        info["android_version"] = adb(["shell", "getprop", "ro.build.version.release"])
-        info["battery"] = adb(["shell", "dumpsys", "battery"])
-        info["storage"] = adb(["shell", "df", "/data"])
-        info["cpu"] = adb(["shell", "cat", "/proc/cpuinfo"])
-    except subprocess.CalledProcessError as e:
-        info["error"] = str(e)
-    return info
-
-
-def handle_led_toggle(window, cam_idx):
-    url = get_camera_url(cam_idx, "led_toggle")
-    try:
-        urllib.request.urlopen(url, timeout=2)
-        window["-LOG-"].print(f"LED toggled for cam{cam_idx+1}")
-    except Exception as e:
-        window["-LOG-"].print(f"Error toggling LED for cam{cam_idx+1}: {e}")
+
+def stop_camera_control(cam_controls, cam_idx):
+    ctrl = cam_controls.pop(cam_idx, None)
+    if ctrl is not None:
+        ctrl.stop()
 
 
-def handle_zoom(window, cam_idx, zoom_in=True):
+def handle_camera_action(window, cam_controls, cam_idx, port, action):
     """
-    cam_idx: 0 hoặc 1
-    zoom_in: True để Zoom In, False để Zoom Out
+    Gửi lệnh /cam/1/<action> không chặn GUI; kết quả về qua CTRL_RESULT.
     """
-    action = "zoomin" if zoom_in else "zoomout"
-    url = get_camera_url(cam_idx, action)
-    try:
-        urllib.request.urlopen(url, timeout=2)
-        window["-LOG-"].print(
-            f"{'Zoom In' if zoom_in else 'Zoom Out'} executed for cam{cam_idx+1}"
-        )
-    except Exception as e:
-        window["-LOG-"].print(
-            f"Error {'Zoom In' if zoom_in else 'Zoom Out'} for cam{cam_idx+1}: {e}"
+    get_camera_control(cam_controls, cam_idx, port, window).submit(action)
+
+
+def handle_ctrl_result(window, result):
+    # presses: requests that went through (zoom steps are sent one by one)
+    cam_idx, action, ok, latency_ms, presses, detail = result
+    what = action if presses <= 1 else f"{action} x{presses}"
+    log(
+        window,
+        f"cam{cam_idx+1} {what}: {detail} ({latency_ms:.0f} ms)",
+        "info" if ok else "error",
+    )
+
+
+# events that only need logging; same handling in the GUI and headless mode
+STATUS_EVENTS = (
+    "CAM_ERROR",
+    "CAM_RECONNECTING",
+    "CAM_STALLED",
+    "CAM_RECONNECTED",
+    "MOTION",
+    "BATTERY_UPDATE",
+    "DEVICE_INFO",
+    "STORAGE",
+)
+
+
+def handle_status_event(window, event, value):
+    if event == "CAM_ERROR":
+        cam_idx, errstr = value
+        log(window, f"cam{cam_idx+1}: {errstr}", "error")
+    # stream drops are retried by the client itself; only logged here
+    elif event == "CAM_RECONNECTING":
+        cam_idx, reason = value
+        log(window, f"cam{cam_idx+1} stream lost ({reason}), reconnecting...", "warning")
+    elif event == "CAM_STALLED":
+        cam_idx, stalled = value
+        log(window, f"cam{cam_idx+1} stream stalled for {stalled:.1f}s, tearing down", "warning")
+    elif event == "CAM_RECONNECTED":
+        cam_idx, downtime, gap, attempts = value
+        log(
+            window,
+            f"cam{cam_idx+1} reconnected after {downtime:.1f}s "
+            f"({attempts} attempts, ~{gap} frames missed)",
         )
+    elif event == "MOTION":
+        cam_idx, active, score = value
+        if active:
+            log(window, f"cam{cam_idx+1} motion detected ({score:.1%} changed), recording")
+        else:
+            log(window, f"cam{cam_idx+1} no motion, recording paused")
+    elif event == "BATTERY_UPDATE":
+        cam_idx, serial, info = value
+        if info:
+            log(window, f"Battery cam{cam_idx+1} ({serial}): {info}")
+    elif event == "DEVICE_INFO":
+        cam_idx, info = value
+        log(window, f"Device info cam{cam_idx+1}: {info.summary()}")
+    # the clients read the new level from the session DiskUsage themselves
+    elif event == "STORAGE":
+        level, headroom, used = value
+        space = f"{headroom / MIB:.0f} MB left, recordings use {used / MIB:.0f} MB"
+        if level == STORAGE_OK:
+            log(window, f"Disk space recovered ({space}), recording normally")
+        elif level == STORAGE_LOW:
+            log(window, f"Disk space low ({space}): recording every other frame, JPEG instead of PNG", "warning")
+        else:
+            log(window, f"Disk almost full ({space}): recording paused", "error")
+
+
+def show_camera_tile(window, cam_idx):
+    try:
+        window[f"-TILE{cam_idx+1}-"].update(visible=True)
+    except Exception:
+        pass
 
 
 def handle_device_added(
@@ -70,53 +149,101 @@ def handle_device_added(
     cam_save_dirs,
     session_root,
     fps,
-    LOCAL_PORTS,
+    local_port,
+    execution_mode=DEFAULT_EXECUTION_MODE,
+    read_timeout=CAPTURE_TIMEOUT,
+    usage=None,
+    settings=None,
+    starter=None,
 ):
+    show_camera_tile(window, cam_idx)
     window[f"-DEV{cam_idx+1}-"].update(serial)
     log(window, f"Device assigned to cam{cam_idx+1}: {serial}")
-    # create camera client if none
-    info = get_device_info(serial)
-    log(window, f"Device info: {info}")
+    # device info is gathered in the background; camera start does not wait for it
+    device_info_cache.fetch_async(
+        serial,
+        lambda info: window.write_event_value("DEVICE_INFO", (cam_idx, info)),
+    )
 
-    if cam_clients[cam_idx] is None:
-        client = CameraClient(cam_idx, LOCAL_PORTS[cam_idx], window, fps=fps)
+    # create camera client if none
+    if cam_clients.get(cam_idx) is None:
+        client = create_camera_client(
+            cam_idx, local_port, window, fps=fps, mode=execution_mode, read_timeout=read_timeout
+        )
         cam_clients[cam_idx] = client
+    # used by the client's reconnect loop if reopening the stream keeps failing
+    if settings is not None:
+        remote_port = settings.port
+        # stream resolution / fps from capture_settings.dat, applied when the stream opens
+        cam_clients[cam_idx].profile, cam_clients[cam_idx].record_profile = settings.camera_profiles(cam_idx)
+    else:
+        remote_port = DEVICE_REMOTE_PORT
+    cam_clients[cam_idx].reforward = lambda: adb_forward_for_device(serial, local_port, remote_port)
+    # session DiskUsage: bytes recorded + storage level set by the RetentionManager
+    cam_clients[cam_idx].usage = usage
     # attempt to start captures
     try:
-        cam_clients[cam_idx].start_capture()
-        cam_running[cam_idx] = True
-        # set save folder for this cam
+        # set save folder for this cam (before start, so recording can begin right away)
         cam_folder = os.path.join(session_root, f"cam{cam_idx+1}")
         cam_clients[cam_idx].set_save_folder(cam_folder)
         cam_save_dirs[cam_idx] = cam_folder
+        if starter is not None:
+            # the stream is opened on the startup pool; CAM_STARTED reports back
+            starter.start(cam_idx, cam_clients[cam_idx])
+            return
+        cam_clients[cam_idx].start_capture()
+        cam_running[cam_idx] = True
         log(
             window,
-            f"Started capture for cam{cam_idx+1} -> local:{LOCAL_PORTS[cam_idx]} , save_folder={cam_folder}",
+            f"Started capture for cam{cam_idx+1} -> local:{local_port} , save_folder={cam_folder}",
         )
     except Exception as e:
-        log(window, f"Error starting capture cam{cam_idx+1}: {e}")
+        log(window, f"Error starting capture cam{cam_idx+1}: {e}", "error")
+
+
+# parallel bring-up: stream opened on the startup pool / first frame of a camera
+STARTUP_EVENTS = ("CAM_STARTED", "FIRST_FRAME")
 
 
-def handle_device_removed(cam_idx, serial, window, cam_clients, cam_running):
+def handle_startup_event(window, event, value, cam_clients, cam_running, cam_save_dirs, timeline=None):
+    """CAM_STARTED từ StartupOrchestrator, FIRST_FRAME từ camera (mốc timeline)."""
+    if event == "CAM_STARTED":
+        cam_idx, ok, error, seconds = value
+        client = cam_clients.get(cam_idx)
+        if not ok:
+            log(window, f"Error starting capture cam{cam_idx+1}: {error}", "error")
+            return
+        cam_running[cam_idx] = client is not None and client.running
+        log(
+            window,
+            f"Started capture for cam{cam_idx+1} -> local:{getattr(client, 'local_port', '?')} "
+            f"({seconds:.2f}s to open), save_folder={cam_save_dirs.get(cam_idx)}",
+        )
+    elif event == "FIRST_FRAME" and timeline is not None:
+        cam_idx, t = value
+        row = timeline.mark(cam_idx, "first_frame", t)
+        if row is not None:
+            log(window, format_bring_up(cam_idx, row))
+
+
+def handle_device_removed(cam_idx, serial, window, cam_clients, cam_running, starter=None):
     window[f"-DEV{cam_idx+1}-"].update("")
+    window[f"-STATS{cam_idx+1}-"].update("")
     print(f"Device removed from cam{cam_idx+1}: {serial}")
     log(window, f"Device removed from cam{cam_idx+1}: {serial}")
-    if cam_clients[cam_idx]:
+    device_info_cache.invalidate(serial)
+    if starter is not None:
+        # a bring-up still queued on the pool must not start the orphaned client
+        starter.cancel(cam_idx)
+    if cam_clients.get(cam_idx):
         cam_clients[cam_idx].stop_capture()
         cam_clients[cam_idx] = None
         cam_running[cam_idx] = False
 
 
-def handle_start_rec(window, cam_clients, cam_saving, cam_save_dirs, devmgr, values):
-    for idx in range(2):
-        if cam_clients[idx]:
-            cam_clients[idx].set_saving(True)
-            cam_saving[idx] = True
-            log(window, f"Start recording cam{idx+1} -> {cam_save_dirs[idx]}")
-
+def handle_app_start(window, devmgr, values):
+    """Start Recording trên GUI: adb start app / tap theo ô -PKGACT- và -TAPn-."""
     pkgact = values.get("-PKGACT-", "").strip()
-    tap1 = values.get("-TAP1-", "").strip()
-    tap2 = values.get("-TAP2-", "").strip()
 
     with devmgr.lock:
         for cam_idx, serial in devmgr.assigned.items():
@@ -124,19 +251,25 @@ def handle_start_rec(window, cam_clients, cam_saving, cam_save_dirs, devmgr, val
                 ok = adb_start_app(serial, pkgact)
                 log(window, f"adb start app for {serial}: {ok}")
                 time.sleep(0.5)
-            coords = tap1 if cam_idx == 0 else tap2
+            # tap coords are per camera tile: -TAP1-, -TAP2-, ...
+            coords = (values.get(f"-TAP{cam_idx+1}-") or "").strip()
             if coords:
                 try:
                     x, y = coords.split(",")
                     ok = adb_input_tap(serial, int(x), int(y))
                     log(window, f"adb tap for {serial} at ({x},{y}): {ok}")
                 except Exception as e:
-                    log(window, f"Bad tap coords for cam{cam_idx+1}: {e}")
+                    log(window, f"Bad tap coords for cam{cam_idx+1}: {e}", "error")
 
 
-def handle_stop_rec(window, cam_clients, cam_saving):
-    for idx in range(2):
-        if cam_clients[idx]:
-            cam_clients[idx].set_saving(False)
-            cam_saving[idx] = False
-            log(window, f"Stop recording cam{idx+1}")
+def close_sync_group(window, sync):
+    sync.close()
+    stats = sync.stats()
+    skew = stats["skew_ms"]
+    text = (
+        f"Sync: {stats['sets']} frame sets kept, {stats['dropped_skew']} dropped for skew, "
+        f"{stats['incomplete']} incomplete"
+    )
+    if skew["count"]:
+        text += f", skew p50 {skew['p50']:.1f}ms p95 {skew['p95']:.1f}ms"
+    log(window, text + f" -> {sync.path}")
@@ -0,0 +1,500 @@
+"""
+fake_adb_server.py
+adb server giả chạy trên localhost, nói cùng giao thức với adb server thật
+(host:version, host:devices, host:track-devices, host:transport, forward,
+killforward, shell:<cmd> và phiên `shell,raw:`). Dùng để chạy thử
+adb_client / DeviceManager mà không cần điện thoại:
+
+    python fake_adb_server.py --port 5037 --devices emu-1,emu-2
+"""
+import argparse
+import shlex
+import socket
+import socketserver
+import threading
+import time
+
+
+class FakeDevice:
+    def __init__(
+        self,
+        serial,
+        model="Pixel 7",
+        manufacturer="Google",
+        android_version="14",
+        battery_level=87,
+        battery_status=3,
+        temperature=312,
+        state="device",
+    ):
+        self.serial = serial
+        self.state = state
+        self.props = {
+            "ro.product.model": model,
+            "ro.product.manufacturer": manufacturer,
+            "ro.build.version.release": android_version,
+            "ro.serialno": serial,
+        }
+        self.battery_level = battery_level
+        self.battery_status = battery_status
+        self.temperature = temperature  # tenths of a degree C, like dumpsys
+        self.taps = []
+        self.started = []
+        # device tcp port -> (host, port) that a forward to it relays to,
+        # e.g. {4747: ("127.0.0.1", <fake DroidCam port>)}
+        self.services = {}
+
+    def dumpsys_battery(self):
+        return (
+            "Current Battery Service state:\n"
+            "  AC powered: false\n"
+            "  USB powered: true\n"
+            f"  status: {self.battery_status}\n"
+            "  health: 2\n"
+            "  present: true\n"
+            f"  level: {self.battery_level}\n"
+            "  scale: 100\n"
+            "  voltage: 4123\n"
+            f"  temperature: {self.temperature}\n"
+            "  technology: Li-ion\n"
+        )
+
+
+CPUINFO = (
+    "Processor\t: AArch64 Processor rev 0 (aarch64)\n"
+    + "".join(f"processor\t: {i}\nBogoMIPS\t: 38.40\n\n" for i in range(8))
+    + "Hardware\t: Fake SoC\n"
+)
+DF_DATA = (
+    "Filesystem       1K-blocks     Used Available Use% Mounted on\n"
+    "/dev/block/dm-5  115249236 40311200  74807964  36% /data\n"
+)
+
+
+def _split_commands(line):
+    """Tách `a; (b) </dev/null; c` theo ';' ở cấp ngoài cùng (bỏ qua trong quote/ngoặc)."""
+    parts, cur, depth, quote = [], [], 0, None
+    for ch in line:
+        if quote:
+            cur.append(ch)
+            if ch == quote:
+                quote = None
+            continue
+        if ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == ";" and depth == 0:
+            parts.append("".join(cur))
+            cur = []
+            continue
+        cur.append(ch)
+    parts.append("".join(cur))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _printf(fmt, args):
+    fmt = fmt.replace("\\n", "\n").replace("\\t", "\t")
+    out, i, args = [], 0, list(args)
+    while i < len(fmt):
+        if fmt[i] == "%" and i + 1 < len(fmt):
+            spec = fmt[i + 1]
+            if spec == "%":
+                out.append("%")
+            else:
+                val = args.pop(0) if args else ""
+                out.append(str(int(val or 0)) if spec == "d" else str(val))
+            i += 2
+            continue
+        out.append(fmt[i])
+        i += 1
+    return "".join(out)
+
+
+class FakeShell:
+    """Trình thông dịch shell tối giản, đủ cho các lệnh mà app gửi."""
+
+    def __init__(self, device):
+        self.device = device
+        self.rc = 0
+
+    def run_line(self, line):
+        out = []
+        for cmd in _split_commands(line):
+            out.append(self.run_one(cmd))
+        return "".join(out)
+
+    def run_one(self, cmd):
+        if cmd.startswith("("):
+            inner = cmd[1:cmd.rindex(")")]
+            return self.run_line(inner)
+        try:
+            argv = shlex.split(cmd.replace("$?", str(self.rc)))
+        except ValueError:
+            self.rc = 2
+            return "sh: syntax error\n"
+        # drop redirections such as </dev/null or 2>/dev/null
+        argv = [a for a in argv if not a.startswith(("<", ">", "2>"))]
+        if not argv:
+            return ""
+        out, self.rc = self._exec(argv)
+        return out
+
+    def _exec(self, argv):
+        dev, name, args = self.device, argv[0], argv[1:]
+        if name == "echo":
+            return " ".join(args) + "\n", 0
+        if name == "printf":
+            return _printf(args[0] if args else "", args[1:]), 0
+        if name == "true":
+            return "", 0
+        if name == "false":
+            return "", 1
+        if name == "sleep":
+            time.sleep(float(args[0]) if args else 0)
+            return "", 0
+        if name == "getprop":
+            if not args:
+                return "".join(f"[{k}]: [{v}]\n" for k, v in dev.props.items()), 0
+            return dev.props.get(args[0], "") + "\n", 0
+        if name == "dumpsys" and args[:1] == ["battery"]:
+            return dev.dumpsys_battery(), 0
+        if name == "df":
+            return DF_DATA, 0
+        if name == "cat" and args[:1] == ["/proc/cpuinfo"]:
+            return CPUINFO, 0
+        if name == "grep":
+            return self._grep(args)
+        if name == "input" and args[:1] == ["tap"] and len(args) == 3:
+            dev.taps.append((int(args[1]), int(args[2])))
+            return "", 0
+        if name == "am" and args[:1] == ["start"]:
+            dev.started.append(args[-1])
+            return f"Starting: Intent {{ cmp={args[-1]} }}\n", 0
+        if name == "settings":
+            return "", 0
+        return f"/system/bin/sh: {name}: not found\n", 127
+
+    def _grep(self, args):
+        # grep [-c] [-m N] PATTERN FILE, enough for /proc/cpuinfo
+        count, limit, rest = False, None, list(args)
+        while rest and rest[0].startswith("-"):
+            opt = rest.pop(0)
+            if opt == "-c":
+                count = True
+            elif opt == "-m":
+                limit = int(rest.pop(0))
+        if len(rest) != 2 or rest[1] != "/proc/cpuinfo":
+            return "", 2
+        pattern = rest[0]
+        anchored = pattern.startswith("^")
+        needle = pattern.lstrip("^")
+        lines = [
+            l for l in CPUINFO.splitlines()
+            if (l.startswith(needle) if anchored else needle in l)
+        ]
+        if limit is not None:
+            lines = lines[:limit]
+        if count:
+            return f"{len(lines)}\n", 0 if lines else 1
+        return "".join(l + "\n" for l in lines), 0 if lines else 1
+
+
+class _PortForward:
+    """Listener của một `adb forward`: relay mọi kết nối tới service của thiết bị."""
+
+    def __init__(self, local_port, target):
+        self.target = target
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", local_port))
+        self.sock.listen(8)
+        self.running = True
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection(self.target, timeout=5)
+            except OSError:
+                conn.close()
+                continue
+            upstream.settimeout(None)
+            for a, b in ((conn, upstream), (upstream, conn)):
+                threading.Thread(target=self._pipe, args=(a, b), daemon=True).start()
+
+    @staticmethod
+    def _pipe(src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for s in (src, dst):
+                try:
+                    s.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            src.close()
+
+    def close(self):
+        self.running = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes the blocked accept()
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        srv = self.server.owner
+        serial = None
+        while True:
+            try:
+                request = self._read_request()
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+            with srv.lock:
+                srv.requests += 1
+            if srv.latency:
+                time.sleep(srv.latency)
+            if serial is None:
+                keep, serial = self._host(srv, request)
+                if not keep:
+                    return
+            else:
+                self._device(srv, serial, request)
+                return
+
+    def _read_request(self):
+        hdr = self.rfile.read(4)
+        if len(hdr) < 4:
+            return None
+        n = int(hdr, 16)
+        return self.rfile.read(n).decode("utf-8")
+
+    def _okay(self, payload=None):
+        self.wfile.write(b"OKAY")
+        if payload is not None:
+            self._lp(payload)
+
+    def _fail(self, msg):
+        self.wfile.write(b"FAIL")
+        self._lp(msg)
+
+    def _lp(self, payload):
+        data = payload.encode("utf-8")
+        self.wfile.write(b"%04x" % len(data) + data)
+
+    def _host(self, srv, req):
+        """Trả về (giữ kết nối?, serial nếu đã chuyển sang transport)."""
+        if req == "host:version":
+            self._okay("0029")
+        elif req in ("host:devices", "host:devices-l"):
+            self._okay(srv.devices_text())
+        elif req == "host:track-devices":
+            self._track(srv)
+        elif req.startswith("host:transport:") or req == "host:transport-any":
+            serial = req[len("host:transport:"):] if ":" in req[5:] else None
+            dev = srv.get_device(serial)
+            if dev is None or dev.state != "device":
+                self._fail(f"device '{serial}' not found")
+                return False, None
+            self._okay()
+            return True, dev.serial
+        elif req.startswith("host-serial:"):
+            self._host_serial(srv, req)
+        else:
+            self._fail(f"unknown host service '{req}'")
+        return False, None
+
+    def _host_serial(self, srv, req):
+        _, serial, rest = req.split(":", 2)
+        dev = srv.get_device(serial)
+        if dev is None:
+            self._fail(f"device '{serial}' not found")
+            return
+        if rest.startswith("forward:"):
+            spec = rest[len("forward:"):]
+            if spec.startswith("norebind:"):
+                spec = spec[len("norebind:"):]
+            local, remote = spec.split(";", 1)
+            self._okay()
+            target = dev.services.get(int(remote[4:])) if remote.startswith("tcp:") else None
+            listener = None
+            srv.close_listener(local)
+            if target is not None:
+                try:
+                    listener = _PortForward(int(local[4:]), target)
+                except OSError as e:
+                    self._fail(f"cannot bind listener: {e}")
+                    return
+            with srv.lock:
+                srv.forwards[local] = (serial, remote)
+                if listener is not None:
+                    srv.listeners[local] = listener
+            self._okay()
+        elif rest.startswith("killforward:"):
+            local = rest[len("killforward:"):]
+            with srv.lock:
+                found = srv.forwards.pop(local, None)
+            srv.close_listener(local)
+            self._okay()
+            if found is None:
+                self._fail(f"listener '{local}' not found")
+            else:
+                self._okay()
+        elif rest == "list-forward":
+            with srv.lock:
+                lines = "".join(f"{s} {l} {r}\n" for l, (s, r) in srv.forwards.items())
+            self._okay(lines)
+        else:
+            self._fail(f"unknown service '{rest}'")
+
+    def _track(self, srv):
+        self._okay(srv.devices_text())
+        self.wfile.flush()
+        seen = srv.generation
+        while not srv.stopped:
+            with srv.changed:
+                srv.changed.wait_for(lambda: srv.generation != seen or srv.stopped, timeout=0.5)
+                gen = srv.generation
+            if gen == seen:
+                continue
+            seen = gen
+            try:
+                self._lp(srv.devices_text())
+                self.wfile.flush()
+            except OSError:
+                return
+
+    def _device(self, srv, serial, req):
+        shell = FakeShell(srv.get_device(serial))
+        if req.startswith("shell"):
+            _, _, cmd = req.partition(":")
+            self._okay()
+            if cmd:
+                self.wfile.write(shell.run_line(cmd).encode("utf-8"))
+                return
+            # interactive shell: one command line per input line
+            for raw in self.rfile:
+                line = raw.decode("utf-8").strip()
+                if line == "exit":
+                    return
+                self.wfile.write(shell.run_line(line).encode("utf-8"))
+                self.wfile.flush()
+            return
+        self._fail(f"unknown device service '{req}'")
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeAdbServer:
+    def __init__(self, host="127.0.0.1", port=0, devices=None, latency=0.0):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.generation = 0
+        self.stopped = False
+        self.latency = latency  # seconds added to every request
+        self.requests = 0
+        self.devices = {}
+        self.forwards = {}  # "tcp:L" -> (serial, "tcp:R")
+        self.listeners = {}  # "tcp:L" -> _PortForward, for devices with services
+        for d in devices or []:
+            dev = d if isinstance(d, FakeDevice) else FakeDevice(d)
+            self.devices[dev.serial] = dev
+        self.server = _TCPServer((host, port), _Handler)
+        self.server.owner = self
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.changed:
+            self.stopped = True
+            self.changed.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        for local in list(self.listeners):
+            self.close_listener(local)
+
+    def close_listener(self, local):
+        with self.lock:
+            listener = self.listeners.pop(local, None)
+        if listener is not None:
+            listener.close()
+
+    def get_device(self, serial):
+        with self.lock:
+            if serial is None:
+                return next(iter(self.devices.values()), None)
+            return self.devices.get(serial)
+
+    def devices_text(self):
+        with self.lock:
+            return "".join(f"{d.serial}\t{d.state}\n" for d in self.devices.values())
+
+    def add_device(self, device):
+        dev = device if isinstance(device, FakeDevice) else FakeDevice(device)
+        with self.changed:
+            self.devices[dev.serial] = dev
+            self.generation += 1
+            self.changed.notify_all()
+        return dev
+
+    def remove_device(self, serial):
+        with self.changed:
+            self.devices.pop(serial, None)
+            removed = [l for l, (s, _) in self.forwards.items() if s == serial]
+            for local in removed:
+                del self.forwards[local]
+            self.generation += 1
+            self.changed.notify_all()
+        for local in removed:
+            self.close_listener(local)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake adb server for testing without phones")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5037)
+    ap.add_argument("--devices", default="fake-0001", help="comma separated serials")
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = ap.parse_args()
+    serials = [s for s in args.devices.split(",") if s]
+    srv = FakeAdbServer(args.host, args.port, serials, args.latency).start()
+    print(f"[FakeAdb] listening on {srv.address[0]}:{srv.address[1]} with {serials}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+fake_droidcam.py
+DroidCam giả để chạy thử / benchmark không cần điện thoại:
+- /video: MJPEG multipart với kích thước, FPS và chất lượng JPEG tuỳ chọn;
+  /video?WxH đổi kích thước như app thật
+- /cam/1/<action>: các lệnh điều khiển (led_toggle, zoomin, af, ...) trả 200
+
+Mỗi frame mang thời điểm gửi trong một JPEG comment (COM) để đo latency
+đầu-cuối, xem frame_timestamp(). Chạy kèm fake adb server:
+
+    python fake_droidcam.py --cameras 2 --adb-port 5038
+    ANDROID_ADB_SERVER_PORT=5038 python capture.py
+"""
+import argparse
+import json
+import socketserver
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+import cv2
+import numpy as np
+from fake_adb_server import FakeAdbServer, FakeDevice
+
+
+DEFAULT_SIZE = (640, 480)
+DEFAULT_SOURCE_FPS = 30.0
+DEFAULT_QUALITY = 80
+DISTINCT_FRAMES = 16  # pre-encoded frames served in a loop
+BOUNDARY = "dcmjpeg"
+DROIDCAM_PORT = 4747  # device-side port the app forwards to
+_TS_TAG = b"DCTS"
+
+
+def make_frames(width, height, quality=DEFAULT_QUALITY, count=DISTINCT_FRAMES):
+    """Frame tổng hợp (gradient chạy ngang + nhiễu mịn), encode sẵn thành JPEG."""
+    rng = np.random.default_rng(0)
+    noise = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (15, 15), 0)
+    ramp = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+    frames = []
+    for i in range(count):
+        shift = np.roll(ramp, i * width // count, axis=1).astype(np.uint8)
+        img = cv2.addWeighted(noise, 0.6, cv2.merge([shift, shift[::-1], shift]), 0.4, 0)
+        cv2.putText(img, f"#{i}", (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        frames.append(buf.tobytes())
+    return frames
+
+
+def stamp_jpeg(data, ts):
+    """Chèn COM segment chứa timestamp ngay sau SOI."""
+    payload = _TS_TAG + struct.pack("<d", ts)
+    return data[:2] + b"\xff\xfe" + struct.pack(">H", len(payload) + 2) + payload + data[2:]
+
+
+def frame_timestamp(data):
+    """Timestamp do stamp_jpeg() chèn vào, hoặc None."""
+    if len(data) >= 18 and data[2:4] == b"\xff\xfe" and data[6:10] == _TS_TAG:
+        return struct.unpack("<d", data[10:18])[0]
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for /cam/1/* like the real app
+
+    def do_GET(self):
+        cam = self.server.owner
+        path, _, query = self.path.partition("?")
+        if path in ("/video", "/mjpegfeed"):
+            self._stream(cam, cam.frames_for(query))
+        elif path.startswith("/cam/1/"):
+            action = path[len("/cam/1/"):]
+            with cam.lock:
+                cam.controls[action] = cam.controls.get(action, 0) + 1
+            if cam.control_delay:
+                time.sleep(cam.control_delay)  # slow phone: handled, but answered late
+            body = b"OK"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def _stream(self, cam, frames):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        interval = 1.0 / cam.fps
+        due = time.monotonic()
+        i = 0
+        try:
+            while not cam.stopped:
+                if time.monotonic() < cam.stall_until:
+                    time.sleep(0.05)  # keep the connection open but send nothing
+                    due = time.monotonic()
+                    continue
+                frame = frames[0 if cam.still else (i // cam.repeat) % len(frames)]
+                data = stamp_jpeg(frame, time.time())
+                self.wfile.write(
+                    b"--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+                    % (BOUNDARY.encode(), len(data))
+                    + data
+                    + b"\r\n"
+                )
+                with cam.lock:
+                    cam.frames_sent += 1
+                i += 1
+                due += interval
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    due = time.monotonic()  # slow client: do not burst to catch up
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeDroidCam:
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        size=DEFAULT_SIZE,
+        fps=DEFAULT_SOURCE_FPS,
+        quality=DEFAULT_QUALITY,
+        repeat=1,
+    ):
+        self.size = size
+        self.repeat = max(1, repeat)  # send each image this many times (phone slower than its stream)
+        self.fps = max(1.0, fps)
+        self.quality = quality
+        self.frames = make_frames(size[0], size[1], quality)
+        self.sized_frames = {tuple(size): self.frames}  # frames per requested size
+        self.requested = []  # query of every /video request, e.g. "1280x720"
+        self.lock = threading.Lock()
+        self.controls = {}  # action -> count
+        self.control_delay = 0.0  # seconds before a /cam/1/* reply
+        self.frames_sent = 0
+        self.stopped = False
+        self.stall_until = 0.0
+        self.still = False  # True: keep sending the first frame (static scene)
+        self.server = _HTTPServer((host, port), _Handler)
+        self.server.owner = self
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def frames_for(self, query):
+        """Frame cho /video?WxH (query rỗng hoặc sai -> kích thước mặc định)."""
+        with self.lock:
+            self.requested.append(query)
+            try:
+                w, h = (int(v) for v in query.lower().split("x"))
+            except ValueError:
+                return self.frames
+            if (w, h) not in self.sized_frames:
+                self.sized_frames[(w, h)] = make_frames(w, h, self.quality)
+            return self.sized_frames[(w, h)]
+
+    def stall(self, seconds):
+        """Giữ kết nối /video nhưng ngừng gửi frame trong `seconds` giây."""
+        self.stall_until = time.monotonic() + seconds
+
+    def stop(self):
+        self.stopped = True
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_fake_rig(cameras, size=DEFAULT_SIZE, fps=DEFAULT_SOURCE_FPS, quality=DEFAULT_QUALITY, adb_port=0):
+    """
+    N DroidCam giả + một fake adb server có N thiết bị; `adb forward` tới
+    tcp:4747 của thiết bị nào sẽ relay tới DroidCam giả của thiết bị đó.
+    """
+    cams, devices = [], []
+    for i in range(cameras):
+        cam = FakeDroidCam(size=size, fps=fps, quality=quality).start()
+        dev = FakeDevice(f"fake-{i+1:04d}")
+        dev.services[DROIDCAM_PORT] = cam.address
+        cams.append(cam)
+        devices.append(dev)
+    adb = FakeAdbServer(port=adb_port, devices=devices).start()
+    return adb, cams
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake DroidCam (+ fake adb) for testing without phones")
+    ap.add_argument("--cameras", type=int, default=1)
+    ap.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="WxH")
+    ap.add_argument("--fps", type=float, default=DEFAULT_SOURCE_FPS)
+    ap.add_argument("--quality", type=int, default=DEFAULT_QUALITY)
+    ap.add_argument("--adb-port", type=int, default=5037)
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    adb, cams = start_fake_rig(args.cameras, (w, h), args.fps, args.quality, args.adb_port)
+    # one JSON line so a parent process (benchmark.py) can pick up the ports
+    print(
+        json.dumps(
+            {
+                "adb_port": adb.address[1],
+                "cameras": [{"serial": f"fake-{i+1:04d}", "port": c.address[1]} for i, c in enumerate(cams)],
+            }
+        ),
+        flush=True,
+    )
+    try:
+        # exit when the parent closes stdin, or on Ctrl+C
+        if sys.stdin is not None and not sys.stdin.isatty():
+            sys.stdin.read()
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for c in cams:
+            c.stop()
+        adb.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+frame_index.py
+Index nhị phân append-only cho frame đã ghi của một camera (camN/frames.idx):
+mỗi entry cố định 40 byte gồm capture timestamp (epoch), sequence number,
+vị trí tên file/segment trong frames.idx.names, offset, size và flags
+(FLAG_REPEAT: frame lặp lại, trỏ tới frame đã ghi trước đó). Đọc bằng
+mmap + tìm nhị phân nên tra theo khoảng thời gian là O(log n), không cần
+list/sort thư mục.
+"""
+import collections
+import mmap
+import os
+import struct
+import threading
+
+
+INDEX_FILE = "frames.idx"
+NAMES_FILE = "frames.idx.names"  # one file/segment name per line, referenced by byte position
+INDEX_MAGIC = b"DCFI"
+INDEX_VERSION = 1
+INDEX_FLUSH_EVERY = 32  # entries buffered before the index file is flushed
+FLAG_REPEAT = 1  # same image as the previous frame; points at that frame's file
+# ts (epoch seconds), seq, name position, offset, size, flags
+_HEADER = struct.Struct("<4sHH8x")
+_ENTRY = struct.Struct("<dQQQII")
+
+# offset/size: byte range of the frame in `path` (whole file for png/jpg);
+# for video segments offset is the frame number in the segment and size is 0
+FrameEntry = collections.namedtuple("FrameEntry", "ts seq path offset size flags")
+
+
+class FrameIndexWriter:
+    """
+    Ghi index trong lúc recording; seq là số thứ tự submit của recorder
+    (bắt đầu từ 0). Writer thread hoàn thành frame không theo thứ tự, nên
+    entry được giữ lại tới khi mọi seq nhỏ hơn đã được add() hoặc skip()
+    (frame bị bỏ / lỗi) rồi mới ghi, để file luôn theo thứ tự capture.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.pending = {}  # seq -> entry fields, or None for a skipped seq
+        self.next_seq = 0
+        self.seq_base = 0  # continues the numbering of an earlier recording
+        self.unflushed = 0
+        self.last_name = None
+        self.last_name_pos = 0
+        self.last_written = None  # (name position, offset, size) of the last frame in the file
+        path = os.path.join(folder, INDEX_FILE)
+        self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _HEADER.size:
+            self.file.truncate(0)
+            self.file.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, _ENTRY.size))
+        else:
+            # drop a partial entry left by a crash, then keep appending
+            size -= (size - _HEADER.size) % _ENTRY.size
+            self.file.truncate(size)
+            if size > _HEADER.size:
+                self.file.seek(size - _ENTRY.size)
+                _, last_seq, name_pos, offset, entry_size, _ = _ENTRY.unpack(self.file.read(_ENTRY.size))
+                self.seq_base = last_seq + 1
+                self.last_written = (name_pos, offset, entry_size)
+        self.file.seek(0, os.SEEK_END)
+        self.names = open(os.path.join(folder, NAMES_FILE), "ab")
+
+    def add(self, seq, ts, name, offset=0, size=0):
+        with self.lock:
+            if self.file is None:
+                return
+            if name != self.last_name:
+                self.last_name_pos = self.names.tell()
+                self.names.write(name.encode("utf-8") + b"\n")
+                self.last_name = name
+            self.pending[seq] = (ts.timestamp(), (self.last_name_pos, offset, size))
+            self._drain()
+
+    def add_repeat(self, seq, ts):
+        """Frame lặp lại: entry FLAG_REPEAT trỏ tới frame đứng trước nó."""
+        with self.lock:
+            if self.file is None:
+                return
+            self.pending[seq] = (ts.timestamp(), None)
+            self._drain()
+
+    def skip(self, seq):
+        """seq không được ghi (bị drop hoặc lỗi): không chờ nó nữa."""
+        with self.lock:
+            if self.file is None:
+                return
+            self.pending[seq] = None
+            self._drain()
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            # whatever is left (e.g. frames submitted after stop) in seq order
+            for seq in sorted(self.pending):
+                self._write_entry(seq, self.pending[seq])
+            self.pending.clear()
+            self.names.close()
+            self.file.close()
+            self.file = None
+
+    def _drain(self):
+        # caller holds self.lock
+        while self.next_seq in self.pending:
+            self._write_entry(self.next_seq, self.pending.pop(self.next_seq))
+            self.next_seq += 1
+        if self.unflushed >= INDEX_FLUSH_EVERY:
+            # names first, so a flushed entry never points past the names file
+            self.names.flush()
+            self.file.flush()
+            self.unflushed = 0
+
+
+    def _write_entry(self, seq, entry):
+        # caller holds self.lock; entries arrive here in seq order
+        if entry is None:
+            return
+        ts, location = entry
+        flags = 0
+        if location is None:
+            if self.last_written is None:
+                return  # repeat of a frame that is not in this index
+            location, flags = self.last_written, FLAG_REPEAT
+        name_pos, offset, size = location
+        self.file.write(_ENTRY.pack(ts, self.seq_base + seq, name_pos, offset, size, flags))
+        self.last_written = location
+        self.unflushed += 1
+
+
+class FrameIndex:
+    """
+    Đọc frames.idx qua mmap. Entry theo thứ tự capture; between() tìm nhị
+    phân theo timestamp. Index đang được ghi vẫn đọc được (tới lần flush cuối).
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.map = None
+        self.count = 0
+        with open(os.path.join(folder, INDEX_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"Empty frame index in {folder}")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, entry_size = _HEADER.unpack_from(self.map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or entry_size != _ENTRY.size:
+            self.close()
+            raise ValueError(f"Unsupported frame index in {folder}")
+        self.count = (size - _HEADER.size) // _ENTRY.size
+        self.names = open(os.path.join(folder, NAMES_FILE), "rb")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        ts, seq, name_pos, offset, size, flags = _ENTRY.unpack_from(self.map, _HEADER.size + i * _ENTRY.size)
+        self.names.seek(name_pos)
+        name = self.names.readline().rstrip(b"\n").decode("utf-8")
+        return FrameEntry(ts, seq, os.path.join(self.folder, name), offset, size, flags)
+
+    def ts(self, i):
+        return _ENTRY.unpack_from(self.map, _HEADER.size + i * _ENTRY.size)[0]
+
+    def bisect(self, ts):
+        """Vị trí entry đầu tiên có timestamp >= ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def between(self, start, end):
+        """Các frame có start <= ts < end (epoch seconds)."""
+        return [self[i] for i in range(self.bisect(start), self.bisect(end))]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        names = getattr(self, "names", None)
+        if names is not None:
+            names.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
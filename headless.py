@@ -0,0 +1,212 @@
+"""
+headless.py
+Chạy capture không cần màn hình (rack machine): tự nhận device qua adb,
+forward, capture và ghi hình; trạng thái ra stdout và/hoặc file JSON-lines.
+Không import PySimpleGUI / Tk.
+
+    python headless.py --record png --duration 3600
+    python headless.py --config rig.json --status-file status.jsonl
+    python capture.py --headless ...          (cùng các tham số)
+
+File --config là JSON với các key giống tham số dòng lệnh (vd. {"fps": 15,
+"record": "segment", "sync": true}); tham số dòng lệnh được ưu tiên.
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from event_bus import EventBus
+from log_sink import log_sink
+from metrics import format_stats
+from camera_registry import MAX_CAMERAS
+from camera_client import CAPTURE_TIMEOUT
+from camera_process import EXECUTION_MODE_THREAD, EXECUTION_MODE_PROCESS, DEFAULT_EXECUTION_MODE
+from recorder import RECORD_MODES, SEGMENT_CODECS, DEFAULT_SEGMENT_CODEC, DEFAULT_SEGMENT_SECONDS
+from motion import RECORD_TRIGGERS, DEFAULT_TRIGGER
+from retention import RETENTION_BUDGET_BYTES, RETENTION_MIN_FREE_BYTES, GIB
+from capture_settings import load_settings, SETTINGS_FILE
+from startup import StartupTimeline, STARTUP_WORKERS
+from capture_core import CaptureCore
+
+
+DEFAULT_FPS = 24
+OUTPUT_ROOT = "recordings"
+RECORD_NONE = "none"
+LOOP_TIMEOUT_MS = 500  # event loop wake-up to check --duration / Ctrl+C
+
+
+class StatusReporter:
+    """
+    Consumer của EventBus: mỗi event trạng thái (device, stream, metrics)
+    thành một dòng JSON trong file --status-file.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1, encoding="utf-8")
+
+    def on_event(self, event, value):
+        if event == "METRICS":
+            for cam_idx, snap in value.items():
+                self._emit("metrics", cam=cam_idx + 1, text=format_stats(snap), **_metrics_fields(snap))
+        elif event in ("DEVICE_ADDED", "DEVICE_REMOVED"):
+            cam_idx, serial = value
+            self._emit(event.lower(), cam=cam_idx + 1, serial=serial)
+        elif event == "CAM_ERROR":
+            self._emit("error", cam=value[0] + 1, detail=value[1])
+        elif event == "CAM_RECONNECTING":
+            self._emit("reconnecting", cam=value[0] + 1, reason=value[1])
+        elif event == "CAM_STALLED":
+            self._emit("stalled", cam=value[0] + 1, seconds=round(value[1], 2))
+        elif event == "CAM_RECONNECTED":
+            cam_idx, downtime, gap, attempts = value
+            self._emit("reconnected", cam=cam_idx + 1, downtime=round(downtime, 2), gap=gap, attempts=attempts)
+        elif event == "MOTION":
+            cam_idx, active, score = value
+            self._emit("motion", cam=cam_idx + 1, active=active, score=round(score, 4))
+        elif event == "CAM_STARTED":
+            cam_idx, ok, error, seconds = value
+            self._emit("started", cam=cam_idx + 1, ok=ok, error=error, seconds=round(seconds, 3))
+        elif event == "FIRST_FRAME":
+            self._emit("first_frame", cam=value[0] + 1)
+        elif event == "STORAGE":
+            level, headroom, used = value
+            self._emit("storage", level=level, headroom=headroom, used=used)
+
+    def _emit(self, kind, **fields):
+        record = {"ts": round(time.time(), 3), "event": kind}
+        record.update(fields)
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _print_metrics(event, value):
+    if event == "METRICS":
+        for cam_idx, snap in sorted(value.items()):
+            print(f"[cam{cam_idx+1}] {format_stats(snap)}", flush=True)
+
+
+def _metrics_fields(snap):
+    fields = {
+        k: snap[k] for k in ("fps", "source_fps", "preview_fps", "frames", "read_failures", "stalls", "idle", "repeats", "dropped", "queue_depth")
+    }
+    fields["fps"] = round(fields["fps"], 2)
+    fields["source_fps"] = round(fields["source_fps"], 2)
+    fields["preview_fps"] = round(fields["preview_fps"], 2)
+    return fields
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="DroidCam multi-camera capture without a GUI")
+    ap.add_argument("--config", help="JSON file with defaults for the options below")
+    ap.add_argument("--settings", help=f"stream profiles and device port (default: {SETTINGS_FILE})")
+    ap.add_argument("--fps", type=float)
+    ap.add_argument("--record", choices=(RECORD_NONE,) + tuple(RECORD_MODES), help="record mode (default: none)")
+    ap.add_argument("--codec", choices=tuple(SEGMENT_CODECS))
+    ap.add_argument("--segment-seconds", type=float)
+    ap.add_argument("--trigger", choices=tuple(RECORD_TRIGGERS), help="record every frame or only around motion")
+    ap.add_argument("--sync", action="store_true", default=None, help="synchronized recording (thread mode)")
+    ap.add_argument("--mode", choices=(EXECUTION_MODE_THREAD, EXECUTION_MODE_PROCESS))
+    ap.add_argument("--max-cameras", type=int)
+    ap.add_argument("--read-timeout", type=float)
+    ap.add_argument("--startup-workers", type=int, help="cameras whose streams are opened at once")
+    ap.add_argument("--output-root")
+    ap.add_argument("--budget-gb", type=float, help="cap on the size of the output root, 0 = none")
+    ap.add_argument("--min-free-gb", type=float, help="oldest sessions are removed to keep this much disk free")
+    ap.add_argument("--archive-root", help="move old sessions here (another disk) instead of deleting them")
+    ap.add_argument("--duration", type=float, help="seconds to run, 0 = until Ctrl+C")
+    ap.add_argument("--status-file", help="append JSON-lines status (devices, streams, metrics) here")
+    ap.add_argument("--quiet", action="store_true", default=None, help="do not echo the log to stdout")
+    args = ap.parse_args(argv)
+    defaults = {
+        "settings": SETTINGS_FILE,
+        "fps": DEFAULT_FPS,
+        "record": RECORD_NONE,
+        "codec": DEFAULT_SEGMENT_CODEC,
+        "segment_seconds": DEFAULT_SEGMENT_SECONDS,
+        "trigger": DEFAULT_TRIGGER,
+        "sync": False,
+        "mode": DEFAULT_EXECUTION_MODE,
+        "max_cameras": MAX_CAMERAS,
+        "read_timeout": CAPTURE_TIMEOUT,
+        "startup_workers": STARTUP_WORKERS,
+        "output_root": OUTPUT_ROOT,
+        "budget_gb": RETENTION_BUDGET_BYTES / GIB,
+        "min_free_gb": RETENTION_MIN_FREE_BYTES / GIB,
+        "archive_root": None,
+        "duration": 0.0,
+        "status_file": None,
+        "quiet": False,
+    }
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                key = key.replace("-", "_")
+                if key not in defaults:
+                    ap.error(f"unknown key in {args.config}: {key}")
+                defaults[key] = value
+    for key, value in defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    return args
+
+
+def main(argv=None):
+    timeline = StartupTimeline()
+    args = parse_args(argv)
+    try:
+        settings = load_settings(args.settings)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Bad settings file: {e}")
+    bus = EventBus()
+    if not args.quiet:
+        log_sink.echo = sys.stdout
+        bus.subscribe(_print_metrics)
+    reporter = None
+    if args.status_file:
+        reporter = StatusReporter(args.status_file)
+        bus.subscribe(reporter.on_event)
+
+    # devices, cameras, recording and shutdown order are shared with the GUI
+    core = CaptureCore(
+        bus,
+        args.output_root,
+        max(1.0, float(args.fps)),
+        settings,
+        args.mode,
+        args.read_timeout,
+        args.max_cameras,
+        args.startup_workers,
+        budget_bytes=int(args.budget_gb * GIB),
+        min_free_bytes=int(args.min_free_gb * GIB),
+        archive_root=args.archive_root,
+        timeline=timeline,
+    )
+    core.start()
+    if args.record != RECORD_NONE:
+        # cameras join as their DEVICE_ADDED arrives; recording starts with their first frame
+        core.start_recording(args.record, args.codec, args.segment_seconds, args.trigger, sync=args.sync)
+
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *a: stop.set())
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    try:
+        while not stop.is_set():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            event, values = bus.read(timeout=LOOP_TIMEOUT_MS)
+            core.dispatch(event, values)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.close()
+        if reporter is not None:
+            reporter.close()
+
+
+if __name__ == "__main__":
+    main()
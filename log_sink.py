@@ -0,0 +1,118 @@
+import collections
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+
+LOG_BUFFER_LINES = 1000  # lines kept in memory and shown in -LOG-
+LOG_FLUSH_INTERVAL = 0.25  # seconds between widget updates
+LOG_FILE = "session_log.jsonl"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+
+class LogSink:
+    """
+    Log của ứng dụng: ring buffer giới hạn trong RAM + file JSON-lines xoay
+    vòng theo session. write() gọi được từ mọi thread và không đụng tới
+    widget; chỉ GUI thread gọi flush(), gom các dòng mới thành một lần
+    append vào -LOG- (tối đa mỗi LOG_FLUSH_INTERVAL giây).
+    """
+
+    def __init__(self, max_lines=LOG_BUFFER_LINES, flush_interval=LOG_FLUSH_INTERVAL):
+        self.lock = threading.Lock()
+        self.lines = collections.deque(maxlen=max_lines)
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+        self.seq = 0  # lines written so far
+        self.shown_seq = 0  # lines already in the widget
+        self.widget_lines = 0
+        self.last_flush = 0.0
+        self.logger = None
+        self.echo = None  # text stream that also gets every line (headless mode)
+
+    def open_file(self, session_root, filename=LOG_FILE):
+        """Bắt đầu ghi file log của session (kèm các dòng đã có trong buffer)."""
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(session_root, filename),
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"droidcam.session.{id(self)}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        with self.lock:
+            backlog = list(self.lines)
+            self.logger = logger
+        for ts, level, msg in backlog:
+            self._write_record(logger, ts, level, msg)
+
+    def write(self, msg, level="info"):
+        ts = time.time()
+        with self.lock:
+            self.lines.append((ts, level, msg))
+            self.seq += 1
+            logger = self.logger
+            echo = self.echo
+        if logger is not None:
+            self._write_record(logger, ts, level, msg)
+        if echo is not None:
+            try:
+                echo.write(self._format((ts, level, msg)) + "\n")
+                echo.flush()
+            except (OSError, ValueError):
+                pass
+
+    @staticmethod
+    def _write_record(logger, ts, level, msg):
+        logger.info(json.dumps({"ts": round(ts, 3), "level": level, "msg": str(msg)}, ensure_ascii=False))
+
+    @staticmethod
+    def _format(entry):
+        ts, level, msg = entry
+        stamp = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+        prefix = "" if level == "info" else f"{level.upper()}: "
+        return f"[{stamp}] {prefix}{msg}"
+
+    def flush(self, window, force=False):
+        """Đẩy các dòng mới vào -LOG-. Chỉ gọi từ GUI thread."""
+        now = time.monotonic()
+        if not force and now - self.last_flush < self.flush_interval:
+            return
+        with self.lock:
+            new = self.seq - self.shown_seq
+            if new == 0:
+                return
+            self.shown_seq = self.seq
+            redraw = new > len(self.lines) or self.widget_lines + new > 2 * self.max_lines
+            entries = list(self.lines) if redraw else list(self.lines)[-new:]
+        self.last_flush = now
+        text = "\n".join(self._format(e) for e in entries)
+        try:
+            if redraw:
+                # widget grew past twice the buffer: re-render the tail once
+                window["-LOG-"].update(text)
+                self.widget_lines = len(entries)
+            else:
+                window["-LOG-"].update("\n" + text, append=True)
+                self.widget_lines += len(entries)
+        except Exception:
+            pass
+
+    def close(self):
+        with self.lock:
+            logger, self.logger = self.logger, None
+        if logger is not None:
+            for handler in list(logger.handlers):
+                handler.close()
+                logger.removeHandler(handler)
+
+
+log_sink = LogSink()
@@ -0,0 +1,224 @@
+import bisect
+import csv
+import os
+import threading
+import time
+
+
+METRICS_INTERVAL = 2.0  # seconds between GUI/CSV metric snapshots
+METRICS_FILE = "metrics.csv"
+# pipeline stages, in frame order
+STAGES = ("read", "motion", "decode", "preview_encode", "write", "gui_delivery")
+# idle: frames not recorded because the motion trigger saw no activity
+# repeats: frames identical to the previous one (source slower than the target fps)
+COUNTERS = ("frames", "skipped", "read_failures", "stalls", "idle", "repeats", "previewed")
+# histogram bucket upper bounds in ms; the last bucket is open-ended
+BUCKET_BOUNDS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """Histogram latency với bucket cố định (ms): rẻ để cập nhật và cộng dồn."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def merge(self, raw):
+        buckets, count, total, max_ms = raw
+        for i, n in enumerate(buckets):
+            self.buckets[i] += n
+        self.count += count
+        self.total += total
+        self.max = max(self.max, max_ms)
+
+    def raw(self):
+        return (list(self.buckets), self.count, self.total, self.max)
+
+    def percentile(self, p):
+        """Cận trên của bucket chứa percentile p (không vượt quá max)."""
+        if self.count == 0:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+        }
+
+
+class CameraMetrics:
+    """
+    Counter và histogram theo stage cho một camera. observe()/count() gọi
+    được từ capture thread, writer thread và GUI thread. snapshot() trả về
+    số liệu của khoảng thời gian kể từ lần snapshot trước.
+    """
+
+    def __init__(self, cam_id):
+        self.cam_id = cam_id
+        self.lock = threading.Lock()
+        self._reset()
+        self.last_snapshot = time.time()
+
+    def _reset(self):
+        self.stages = {name: Histogram() for name in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].observe(seconds * 1000.0)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def drain(self):
+        """Lấy dữ liệu thô (picklable) rồi reset — dùng để gửi từ process con."""
+        with self.lock:
+            raw = {
+                "stages": {name: h.raw() for name, h in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+            self._reset()
+        return raw
+
+    def merge(self, raw):
+        with self.lock:
+            for name, h in raw["stages"].items():
+                self.stages[name].merge(h)
+            for name, n in raw["counters"].items():
+                self.counters[name] += n
+
+    def snapshot(self, target_fps, record_stats=None):
+        with self.lock:
+            stages = {name: h.summary() for name, h in self.stages.items()}
+            counters = dict(self.counters)
+            self._reset()
+        now = time.time()
+        elapsed = max(1e-6, now - self.last_snapshot)
+        self.last_snapshot = now
+        record_stats = record_stats or {}
+        return {
+            "time": now,
+            "cam": self.cam_id + 1,
+            "fps": counters["frames"] / elapsed,
+            "target_fps": target_fps,
+            # distinct images per second, i.e. what the phone really delivers
+            "source_fps": (counters["frames"] - counters["repeats"]) / elapsed,
+            "preview_fps": counters["previewed"] / elapsed,
+            "frames": counters["frames"],
+            "skipped": counters["skipped"],
+            "read_failures": counters["read_failures"],
+            "stalls": counters["stalls"],
+            "idle": counters["idle"],
+            "repeats": counters["repeats"],
+            "dropped": record_stats.get("dropped", 0),
+            "queue_depth": record_stats.get("queue_depth", 0),
+            "stages": stages,
+        }
+
+
+def _ms(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+def format_stats(snap):
+    """Một dòng ngắn cho -STATSn- trên tile camera."""
+    read = snap["stages"]["read"]["p95"]
+    delivery = snap["stages"]["gui_delivery"]["p95"]
+    text = f"{snap['fps']:.1f}/{snap['target_fps']:g} fps"
+    if snap["repeats"]:
+        text += f" (src {snap['source_fps']:.1f})"
+    if read is not None:
+        text += f" | read p95 {read:.1f}ms"
+    if delivery is not None:
+        text += f" | gui {delivery:.0f}ms"
+    return text + f" | drop {snap['dropped']} | q {snap['queue_depth']}"
+
+
+class MetricsExporter(threading.Thread):
+    """
+    Mỗi METRICS_INTERVAL giây: lấy snapshot của từng camera, ghi thêm vào
+    metrics.csv trong thư mục session và gửi event METRICS cho GUI.
+    """
+
+    def __init__(self, window, get_clients, session_root, interval=METRICS_INTERVAL):
+        super().__init__(daemon=True)
+        self.window = window
+        self.get_clients = get_clients  # () -> {cam_idx: client}
+        self.interval = interval
+        self.path = os.path.join(session_root, METRICS_FILE)
+        self.running = True
+        self._wake = threading.Event()
+        self.columns = ["time", "cam", "fps", "target_fps", "source_fps", "preview_fps", "frames",
+                        "skipped", "read_failures", "stalls", "idle", "repeats", "dropped", "queue_depth"]
+        for stage in STAGES:
+            self.columns += [f"{stage}_count", f"{stage}_p50_ms", f"{stage}_p95_ms", f"{stage}_max_ms"]
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+
+    def run(self):
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.columns)
+            while not self._wake.wait(self.interval):
+                snaps = {}
+                for idx, client in list(self.get_clients().items()):
+                    if client is None or not client.running:
+                        continue
+                    try:
+                        snaps[idx] = client.metrics_snapshot()
+                    except Exception as e:
+                        print(f"[Metrics] cam{idx+1} error: {e}")
+                for snap in snaps.values():
+                    writer.writerow(self._row(snap))
+                f.flush()
+                if snaps and self.running:
+                    self.window.write_event_value("METRICS", snaps)
+
+    def _row(self, snap):
+        row = [
+            f"{snap['time']:.3f}",
+            snap["cam"],
+            f"{snap['fps']:.2f}",
+            snap["target_fps"],
+            f"{snap['source_fps']:.2f}",
+            f"{snap['preview_fps']:.2f}",
+            snap["frames"],
+            snap["skipped"],
+            snap["read_failures"],
+            snap["stalls"],
+            snap["idle"],
+            snap["repeats"],
+            snap["dropped"],
+            snap["queue_depth"],
+        ]
+        for stage in STAGES:
+            s = snap["stages"][stage]
+            row += [s["count"], _ms(s["p50"]), _ms(s["p95"]), _ms(s["max"])]
+        return row
@@ -0,0 +1,215 @@
+import http.client
+import socket
+import urllib.parse
+import zlib
+import cv2
+import numpy as np
+
+
+DEFAULT_READ_TIMEOUT = 5.0  # seconds
+MAX_FRAME_BYTES = 16 * 1024 * 1024  # sanity limit for one JPEG part
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+# frame_signature(): every Nth JPEG byte / every Nth pixel in both directions
+SIGNATURE_JPEG_STEP = 64
+SIGNATURE_PIXEL_STEP = 8
+
+
+class JpegFrame:
+    """
+    Một frame JPEG nguyên bản từ stream. Chỉ decode khi thực sự cần pixel,
+    kết quả decode được cache lại.
+    """
+
+    __slots__ = ("data", "_pixels")
+
+    def __init__(self, data):
+        self.data = data
+        self._pixels = None
+
+    def decode(self):
+        if self._pixels is None:
+            buf = np.frombuffer(self.data, dtype=np.uint8)
+            self._pixels = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        return self._pixels
+
+    def __len__(self):
+        return len(self.data)
+
+
+def frame_signature(frame):
+    """
+    Checksum lấy mẫu để nhận ra frame lặp lại (cùng ảnh với frame trước),
+    không cần decode hay hash toàn bộ buffer (~10 µs ở 640x480).
+    """
+    if isinstance(frame, JpegFrame):
+        data = frame.data
+        # a change anywhere shifts the entropy-coded bits after it, so a sparse sample is enough
+        return len(data), zlib.crc32(data[::SIGNATURE_JPEG_STEP])
+    sample = frame[::SIGNATURE_PIXEL_STEP, ::SIGNATURE_PIXEL_STEP]
+    return frame.shape, zlib.crc32(sample.tobytes())
+
+
+def as_array(frame):
+    """Trả về ảnh BGR (ndarray) cho cả JpegFrame lẫn frame đã decode."""
+    if isinstance(frame, JpegFrame):
+        return frame.decode()
+    return frame
+
+
+class MjpegStream:
+    """
+    Đọc trực tiếp stream multipart MJPEG của DroidCam (/video) mà không
+    decode. Giao diện giống cv2.VideoCapture (isOpened/grab/retrieve/read/
+    release/set) để CameraClient dùng thay thế được; read() trả về JpegFrame.
+    """
+
+    def __init__(self, url, timeout=DEFAULT_READ_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.conn = None
+        self.sock = None
+        self.resp = None
+        self.boundary = None
+        self._grabbed = None
+        self._open()
+
+    def _open(self):
+        parts = urllib.parse.urlsplit(self.url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        try:
+            self.conn = http.client.HTTPConnection(
+                parts.hostname, parts.port or 80, timeout=self.timeout
+            )
+            self.conn.request("GET", path)
+            # keep the socket: the response may outlive the connection object
+            self.sock = self.conn.sock
+            resp = self.conn.getresponse()
+            ctype = resp.getheader("Content-Type", "")
+            if resp.status != 200 or "multipart" not in ctype.lower():
+                print(f"[MjpegStream] Unexpected response {resp.status} {ctype!r}")
+                self.release()
+                return
+            self.boundary = _parse_boundary(ctype)
+            self.resp = resp
+        except (OSError, http.client.HTTPException) as e:
+            print(f"[MjpegStream] Cannot open {self.url}: {e}")
+            self.release()
+
+    def isOpened(self):
+        return self.resp is not None
+
+    def set(self, prop, value):
+        # OpenCV capture properties do not apply to the raw stream
+        return False
+
+    def grab(self):
+        """Đọc part kế tiếp khỏi socket (không tạo frame)."""
+        self._grabbed = None
+        if self.resp is None:
+            return False
+        try:
+            self._grabbed = self._read_part()
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            print(f"[MjpegStream] read error: {e}")
+            return False
+        return bool(self._grabbed)
+
+    def retrieve(self):
+        data, self._grabbed = self._grabbed, None
+        if not data:
+            return False, None
+        return True, JpegFrame(data)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def abort(self):
+        """Gọi từ thread khác: cắt socket để read() đang bị chặn trả về ngay."""
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def release(self):
+        resp, conn = self.resp, self.conn
+        self.resp = None
+        self.conn = None
+        self.sock = None
+        for obj in (resp, conn):
+            if obj is not None:
+                try:
+                    obj.close()
+                except Exception:
+                    pass
+
+    def _read_part(self):
+        fp = self.resp
+        # skip to the part headers (boundary line, possibly preceded by CRLF)
+        headers = {}
+        while True:
+            line = fp.readline(1024)
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                if headers:
+                    break
+                continue
+            if line.startswith(b"--"):
+                continue
+            if b":" in line:
+                k, v = line.split(b":", 1)
+                headers[k.strip().lower()] = v.strip()
+
+        length = headers.get(b"content-length")
+        if length is not None:
+            n = int(length)
+            if n <= 0 or n > MAX_FRAME_BYTES:
+                raise ValueError(f"bad part length {n}")
+            data = _read_exact(fp, n)
+        else:
+            # no Content-Length: read until the JPEG end-of-image marker
+            data = _read_until_eoi(fp)
+        if data is None or not data.startswith(JPEG_SOI):
+            return None
+        return data
+
+
+def _parse_boundary(content_type):
+    for param in content_type.split(";")[1:]:
+        k, _, v = param.strip().partition("=")
+        if k.lower() == "boundary":
+            v = v.strip('"')
+            return v[2:] if v.startswith("--") else v
+    return None
+
+
+def _read_exact(fp, n):
+    chunks = []
+    while n > 0:
+        chunk = fp.read(n)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_until_eoi(fp):
+    buf = bytearray()
+    while len(buf) < MAX_FRAME_BYTES:
+        chunk = fp.readline(65536)
+        if not chunk:
+            return None
+        buf += chunk
+        idx = buf.find(JPEG_EOI)
+        if idx >= 0:
+            return bytes(buf[: idx + 2])
+    raise ValueError("JPEG part exceeds MAX_FRAME_BYTES")
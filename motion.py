@@ -0,0 +1,159 @@
+import collections
+import cv2
+import numpy as np
+from mjpeg_stream import JpegFrame
+
+
+# Recording triggers
+TRIGGER_ALWAYS = "always"  # record every frame while saving (default)
+TRIGGER_MOTION = "motion"  # record only around frame-to-frame change
+RECORD_TRIGGERS = (TRIGGER_ALWAYS, TRIGGER_MOTION)
+DEFAULT_TRIGGER = TRIGGER_ALWAYS
+
+MOTION_WIDTH = 80  # width of the grayscale copy that is scored
+MOTION_PIXEL_DELTA = 25  # gray levels a pixel must change by to count
+MOTION_THRESHOLD = 0.01  # fraction of changed pixels that counts as activity
+MOTION_PRE_ROLL = 2.0  # seconds kept before activity starts
+MOTION_POST_ROLL = 3.0  # seconds still recorded after activity stops
+# memory cap of the pre-roll buffer: decoded 1280x720 BGR frames are 2.6 MB each, so
+# without MJPEG passthrough a long pre-roll is cut to what fits (JPEG frames ~50-150 kB)
+MOTION_PRE_ROLL_BYTES = 64 * 1024 ** 2
+# JPEG frames need an (entropy) decode to be scored, ~0.5 ms at 640x480 even at 1/8
+# scale: score them at most this often and reuse the score in between
+MOTION_JPEG_SCORE_INTERVAL = 0.1  # seconds
+
+
+def frame_bytes(frame):
+    """Bộ nhớ một frame chiếm trong pre-roll."""
+    if isinstance(frame, JpegFrame):
+        return len(frame.data)
+    return frame.nbytes
+
+
+def motion_gray(frame):
+    """
+    Bản grayscale nhỏ (~MOTION_WIDTH px) để chấm điểm. JpegFrame được decode
+    thẳng ở 1/8 kích thước (IMREAD_REDUCED_GRAYSCALE_8), không decode full.
+    """
+    if isinstance(frame, JpegFrame):
+        gray = cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if gray is None:
+            return None
+    else:
+        h, w = frame.shape[:2]
+        step = max(1, w // MOTION_WIDTH)
+        # strided view, then one small conversion; no full-size copy
+        small = frame[::step, ::step]
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else np.ascontiguousarray(small)
+    h, w = gray.shape[:2]
+    if w > MOTION_WIDTH:
+        gray = cv2.resize(gray, (MOTION_WIDTH, max(1, h * MOTION_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    # suppress sensor noise / JPEG block artefacts
+    return cv2.GaussianBlur(gray, (3, 3), 0)
+
+
+class MotionTrigger:
+    """
+    Quyết định frame nào được ghi khi trigger = "motion". Mỗi frame được chấm
+    điểm (tỉ lệ pixel thay đổi so với frame trước) trên bản grayscale nhỏ.
+    Khi điểm >= threshold thì ghi, kèm pre_roll giây trước đó (giữ trong
+    buffer) và tiếp tục ghi post_roll giây sau lần có chuyển động cuối.
+    Frame BGR được chấm mọi frame; JpegFrame tối đa mỗi jpeg_interval giây
+    (pre-roll bù cho độ trễ này). Buffer pre-roll không vượt quá
+    pre_roll_bytes: frame cũ nhất bị bỏ trước.
+    """
+
+    def __init__(
+        self,
+        threshold=MOTION_THRESHOLD,
+        pre_roll=MOTION_PRE_ROLL,
+        post_roll=MOTION_POST_ROLL,
+        pixel_delta=MOTION_PIXEL_DELTA,
+        jpeg_interval=MOTION_JPEG_SCORE_INTERVAL,
+        pre_roll_bytes=MOTION_PRE_ROLL_BYTES,
+    ):
+        self.threshold = threshold
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.pixel_delta = pixel_delta
+        self.jpeg_interval = jpeg_interval
+        self.pre_roll_bytes = pre_roll_bytes
+        self.last_scored = None
+        self.prev = None
+        self.buffer = collections.deque()  # (ts, frame) not recorded yet, at most pre_roll old
+        self.buffer_bytes = 0
+        self.discarded = 0  # frames that aged out of the pre-roll without being recorded
+        self.active_until = None
+        self.last_score = 0.0
+
+    @property
+    def active(self):
+        return self.active_until is not None
+
+    def score(self, frame):
+        """Tỉ lệ pixel thay đổi hơn pixel_delta so với frame trước (0..1)."""
+        gray = motion_gray(frame)
+        if gray is None:
+            return 0.0
+        prev, self.prev = self.prev, gray
+        if prev is None or prev.shape != gray.shape:
+            return 0.0
+        changed = cv2.absdiff(prev, gray) > self.pixel_delta
+        return np.count_nonzero(changed) / changed.size
+
+    def process(self, frame, ts):
+        """
+        ts: thời điểm capture (giây, monotonic). Trả về (các (ts, frame) cần
+        ghi ngay, trạng thái active đổi hay không).
+        """
+        if (
+            self.last_scored is None
+            or not isinstance(frame, JpegFrame)
+            or ts - self.last_scored >= self.jpeg_interval
+        ):
+            self.last_score = self.score(frame)
+            self.last_scored = ts
+        was_active = self.active
+        if self.last_score >= self.threshold:
+            self.active_until = ts + self.post_roll
+        elif self.active and ts > self.active_until:
+            self.active_until = None
+        if self.active:
+            out = list(self.buffer)
+            out.append((ts, frame))
+            self.buffer.clear()
+            self.buffer_bytes = 0
+            return out, not was_active
+        self.buffer.append((ts, frame))
+        self.buffer_bytes += frame_bytes(frame)
+        self._trim(ts)
+        return [], was_active
+
+    def repeat(self, ts):
+        """
+        Frame lặp lại (cùng ảnh, điểm 0, không ghi): chỉ cho post-roll hết hạn
+        và pre-roll trôi đi. Trả về True nếu trạng thái active đổi.
+        """
+        was_active = self.active
+        if was_active and ts > self.active_until:
+            self.active_until = None
+        self.last_score = 0.0
+        self._trim(ts)
+        return was_active != self.active
+
+    def _trim(self, ts):
+        # too old, or over the memory cap (the newest frame is always kept)
+        while self.buffer and (
+            self.buffer[0][0] < ts - self.pre_roll
+            or (self.buffer_bytes > self.pre_roll_bytes and len(self.buffer) > 1)
+        ):
+            _, frame = self.buffer.popleft()
+            self.buffer_bytes -= frame_bytes(frame)
+            self.discarded += 1
+
+    def reset(self):
+        self.prev = None
+        self.last_scored = None
+        self.buffer.clear()
+        self.buffer_bytes = 0
+        self.active_until = None
@@ -0,0 +1,161 @@
+import threading
+import time
+import cv2
+import numpy as np
+from mjpeg_stream import JpegFrame
+
+
+PREVIEW_SIZE = (480, 360)  # (w, h) of the -IMGn- widgets with 1-2 cameras
+GRID_PREVIEW_SIZE = (320, 240)  # tile size once the grid has 3+ cameras
+PREVIEW_FPS = 15  # GUI refresh rate, independent of the capture FPS
+# ".ppm" is the cheapest format Tk accepts; ".png" uses the lowest compression
+PREVIEW_FORMAT = ".ppm"
+PNG_COMPRESSION = 1
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def preview_size_for(num_cameras):
+    return PREVIEW_SIZE if num_cameras <= 2 else GRID_PREVIEW_SIZE
+
+
+class PreviewMailbox:
+    """
+    Hộp thư một ô cho preview: chỉ giữ frame mới nhất, frame cũ bị ghi đè.
+    notify() chỉ được gọi khi ô đang trống, nên mỗi camera có tối đa một
+    event FRAME đang chờ trong hàng đợi của GUI.
+    """
+
+    def __init__(self, notify=None):
+        self.notify = notify
+        self.lock = threading.Lock()
+        self._frame = None
+        self._put_ts = 0.0
+        self.taken_ts = 0.0  # put() time of the frame last returned by take()
+        self.seq = 0
+
+    def put(self, frame):
+        with self.lock:
+            was_empty = self._frame is None
+            self._frame = frame
+            self._put_ts = time.time()
+            self.seq += 1
+        if was_empty and self.notify:
+            self.notify()
+
+    def take(self):
+        with self.lock:
+            frame = self._frame
+            self._frame = None
+            self.taken_ts = self._put_ts
+        return frame
+
+
+class PreviewRenderer:
+    """Thu nhỏ frame về kích thước widget và encode sang định dạng rẻ."""
+
+    def __init__(self, size=PREVIEW_SIZE, fmt=PREVIEW_FORMAT):
+        self.size = size
+        self.fmt = fmt
+        self.source_size = None  # full (w, h) of the stream, relearned when it changes
+        self.stream_id = None  # client.stream_id the source size belongs to
+
+    def render(self, frame, metrics=None):
+        t0 = time.perf_counter()
+        img = self._decode(frame)
+        if img is None:
+            return None
+        t1 = time.perf_counter()
+        h, w = img.shape[:2]
+        scale = min(self.size[0] / w, self.size[1] / h, 1.0)
+        if scale < 1.0:
+            img = cv2.resize(
+                img,
+                (max(1, int(w * scale)), max(1, int(h * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        params = []
+        if self.fmt == ".png":
+            params = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+        ok, buf = cv2.imencode(self.fmt, img, params)
+        if metrics is not None:
+            metrics.observe("decode", t1 - t0)
+            metrics.observe("preview_encode", time.perf_counter() - t1)
+        return buf.tobytes() if ok else None
+
+    def _decode(self, frame):
+        if not isinstance(frame, JpegFrame):
+            self.source_size = (frame.shape[1], frame.shape[0])
+            return frame
+        buf = frame.data
+        if self.source_size is None:
+            img = frame.decode()
+            if img is not None:
+                self.source_size = (img.shape[1], img.shape[0])
+            return img
+        # let libjpeg do most of the downscale while decoding (DCT scaling)
+        w, h = self.source_size
+        for factor, flag in _REDUCED_FLAGS:
+            if w // factor >= self.size[0] and h // factor >= self.size[1]:
+                img = cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), flag)
+                # libjpeg rounds the scaled size up; anything else is a new resolution
+                if img is None or img.shape[:2] == (-(-h // factor), -(-w // factor)):
+                    return img
+                break
+        img = frame.decode()
+        if img is not None:
+            self.source_size = (img.shape[1], img.shape[0])
+        return img
+
+
+class PreviewPump:
+    """
+    Chạy trên GUI thread: lấy frame mới nhất của từng camera theo tần số
+    refresh của GUI rồi cập nhật -IMGn-.
+    """
+
+    def __init__(self, fps=PREVIEW_FPS, size=PREVIEW_SIZE, fmt=PREVIEW_FORMAT):
+        self.interval = 1.0 / max(1.0, fps)
+        self.size = size
+        self.fmt = fmt
+        self.renderers = {}
+        self.last_draw = {}
+
+    @property
+    def interval_ms(self):
+        return int(self.interval * 1000)
+
+    def pump(self, window, cam_clients):
+        now = time.time()
+        for idx, client in list(cam_clients.items()):
+            if client is None:
+                continue
+            if now - self.last_draw.get(idx, 0.0) < self.interval:
+                continue
+            frame = client.preview.take()
+            if frame is None:
+                continue
+            self.last_draw[idx] = now
+            renderer = self.renderers.get(idx)
+            if renderer is None:
+                renderer = self.renderers[idx] = PreviewRenderer(self.size, self.fmt)
+            stream_id = getattr(client, "stream_id", None)
+            if stream_id != renderer.stream_id:
+                # reopened (profile switch, reconnect): the resolution may differ
+                renderer.stream_id = stream_id
+                renderer.source_size = None
+            metrics = getattr(client, "metrics", None)
+            try:
+                data = renderer.render(frame, metrics)
+                if data:
+                    window[f"-IMG{idx+1}-"].update(data=data)
+                    if metrics is not None:
+                        metrics.observe("gui_delivery", time.time() - client.preview.taken_ts)
+                        metrics.count("previewed")
+            except Exception as e:
+                print(f"[Preview] cam{idx+1} render error: {e}")
+
@@ -0,0 +1,457 @@
+import os
+import queue
+import threading
+import time
+import datetime
+import cv2
+from mjpeg_stream import JpegFrame, as_array
+from retention import STORAGE_OK, DEGRADED_JPEG_QUALITY
+
+
+# Policy applied when the writer queue is full
+OVERFLOW_BLOCK = "block"  # capture thread waits for a free slot
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # discard the oldest queued frame
+OVERFLOW_DROP_NEWEST = "drop_newest"  # discard the incoming frame
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+# Recording modes
+RECORD_MODE_PNG = "png"  # one PNG file per frame
+RECORD_MODE_SEGMENT = "segment"  # rolling video segments via cv2.VideoWriter
+RECORD_MODE_JPEG = "jpg"  # one JPEG file per frame (decoded frames encoded at jpeg_quality)
+RECORD_MODES = (RECORD_MODE_PNG, RECORD_MODE_SEGMENT, RECORD_MODE_JPEG)
+DEFAULT_RECORD_MODE = RECORD_MODE_PNG
+DEFAULT_JPEG_QUALITY = 90
+
+# codec name -> (fourcc, container extension)
+SEGMENT_CODECS = {
+    "mjpg": ("MJPG", ".avi"),
+    "mp4v": ("mp4v", ".mp4"),
+}
+DEFAULT_SEGMENT_CODEC = "mjpg"
+DEFAULT_SEGMENT_SECONDS = 60.0
+
+DEFAULT_QUEUE_SIZE = 48  # ~2 s of frames at 24 fps
+DEFAULT_WRITER_WORKERS = 2
+DEFAULT_OVERFLOW_POLICY = OVERFLOW_DROP_OLDEST
+BLOCK_TIMEOUT = 1.0  # seconds a blocked submit waits before giving up
+STOP_POLL = 0.2  # seconds an idle writer waits before checking whether the recorder was stopped
+DRAIN_TIMEOUT = 10.0  # seconds shutdown waits for the writers to finish the queued frames
+
+_STOP = object()
+_REPEAT = object()  # queued in place of a frame: the sink writes its previous frame again
+
+
+def frame_stem(ts):
+    """Tên file (không có đuôi) của frame chụp lúc ts trong chế độ png."""
+    return f"frame_{ts.strftime('%Y%m%d_%H%M%S_%f')}"
+
+
+class ImageSink:
+    """
+    Ghi mỗi frame thành một file riêng (chế độ mặc định): PNG cho frame đã
+    decode, còn JpegFrame từ MJPEG passthrough được ghi nguyên bytes (.jpg).
+    Với jpeg_quality (chế độ "jpg") hoặc khi đĩa sắp đầy (usage.level khác
+    STORAGE_OK) frame đã decode được ghi JPEG thay cho PNG.
+    write() trả về (tên file, offset, size) cho frame index.
+    """
+
+    ordered = False  # frames may be written by several workers at once
+
+    def __init__(self, save_folder, usage=None, jpeg_quality=None):
+        self.save_folder = save_folder
+        self.usage = usage  # optional DiskUsage, counts the bytes written
+        self.jpeg_quality = jpeg_quality  # None = PNG for decoded frames
+
+    def write(self, ts, frame):
+        stem = os.path.join(self.save_folder, frame_stem(ts))
+        quality = self.jpeg_quality
+        if self.usage is not None and self.usage.level != STORAGE_OK:
+            quality = min(quality or DEGRADED_JPEG_QUALITY, DEGRADED_JPEG_QUALITY)
+        if isinstance(frame, JpegFrame):
+            with open(stem + ".jpg", "wb") as f:
+                f.write(frame.data)
+            name, size = stem + ".jpg", len(frame.data)
+        elif quality is not None:
+            name = stem + ".jpg"
+            if not cv2.imwrite(name, frame, [cv2.IMWRITE_JPEG_QUALITY, quality]):
+                raise IOError(f"imwrite failed for {name}")
+            size = os.path.getsize(name)
+        else:
+            name = stem + ".png"
+            if not cv2.imwrite(name, frame):
+                raise IOError(f"imwrite failed for {name}")
+            size = os.path.getsize(name)
+        if self.usage is not None:
+            self.usage.add(size)
+        return os.path.basename(name), 0, size
+
+    def close(self):
+        pass
+
+
+class SegmentSink:
+    """
+    Ghi frame vào các segment video nối tiếp (segment_0001.avi, ...).
+    Mỗi segment có file sidecar .csv chứa timestamp của từng frame.
+    write() trả về (tên segment, số thứ tự frame trong segment, 0).
+    repeat() ghi lại frame trước: container có fps cố định, nên frame trùng
+    vẫn phải có mặt để thời lượng video khớp thời gian thực.
+    """
+
+    ordered = True  # VideoWriter needs frames in capture order
+
+    def __init__(
+        self,
+        save_folder,
+        fps,
+        codec=DEFAULT_SEGMENT_CODEC,
+        segment_seconds=DEFAULT_SEGMENT_SECONDS,
+        usage=None,
+    ):
+        if codec not in SEGMENT_CODECS:
+            raise ValueError(f"Unknown segment codec: {codec}")
+        self.save_folder = save_folder
+        self.fps = max(1.0, float(fps))
+        self.fourcc, self.ext = SEGMENT_CODECS[codec]
+        self.segment_seconds = max(1.0, float(segment_seconds))
+        # continue numbering so a second recording never overwrites the first
+        self.segment_no = _last_segment_no(save_folder)
+        self.writer = None
+        self.sidecar = None
+        self.segment_start = None
+        self.frame_size = None
+        self.frames_in_segment = 0
+        self.last_frame = None  # decoded, for repeat()
+        self.usage = usage  # optional DiskUsage, counts the bytes written
+        self.path = None  # open segment file
+        self.path_bytes = 0  # its size when last checked
+
+    def write(self, ts, frame):
+        frame = as_array(frame)
+        if frame is None:
+            raise IOError("cannot decode frame")
+        h, w = frame.shape[:2]
+        if (
+            self.writer is None
+            or (w, h) != self.frame_size
+            or (ts - self.segment_start).total_seconds() >= self.segment_seconds
+        ):
+            self._roll(ts, (w, h))
+        self.writer.write(frame)
+        self.last_frame = frame
+        line = f"{self.frames_in_segment},{ts.isoformat()},{ts.timestamp():.6f}\n"
+        self.sidecar.write(line)
+        self.frames_in_segment += 1
+        if self.usage is not None:
+            self.usage.add(len(line))
+            self._count_segment_bytes()
+        return f"segment_{self.segment_no:04d}{self.ext}", self.frames_in_segment - 1, 0
+
+    def repeat(self, ts):
+        """Ghi lại frame trước với timestamp ts. None nếu chưa có frame nào."""
+        if self.last_frame is None:
+            return None
+        return self.write(ts, self.last_frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+            if self.usage is not None:
+                self._count_segment_bytes()
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+
+    def _count_segment_bytes(self):
+        # VideoWriter hides its file: one stat per frame, add what it grew by
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        self.usage.add(size - self.path_bytes)
+        self.path_bytes = size
+
+    def _roll(self, ts, frame_size):
+        self.close()
+        self.segment_no += 1
+        base = os.path.join(self.save_folder, f"segment_{self.segment_no:04d}")
+        self.writer = cv2.VideoWriter(
+            base + self.ext,
+            cv2.VideoWriter_fourcc(*self.fourcc),
+            self.fps,
+            frame_size,
+        )
+        if not self.writer.isOpened():
+            self.writer = None
+            raise IOError(f"Cannot open VideoWriter for {base + self.ext}")
+        self.path = base + self.ext
+        self.path_bytes = 0
+        self.sidecar = open(base + ".csv", "w", buffering=1)
+        self.sidecar.write("frame,timestamp,epoch\n")
+        self.segment_start = ts
+        self.frame_size = frame_size
+        self.frames_in_segment = 0
+
+
+def _last_segment_no(folder):
+    last = 0
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return 0
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == ".csv" and stem.startswith("segment_"):
+            try:
+                last = max(last, int(stem[len("segment_"):]))
+            except ValueError:
+                pass
+    return last
+
+
+def make_sink(
+    mode,
+    save_folder,
+    fps,
+    codec=DEFAULT_SEGMENT_CODEC,
+    segment_seconds=DEFAULT_SEGMENT_SECONDS,
+    usage=None,
+    jpeg_quality=DEFAULT_JPEG_QUALITY,
+):
+    if mode == RECORD_MODE_PNG:
+        return ImageSink(save_folder, usage)
+    if mode == RECORD_MODE_JPEG:
+        return ImageSink(save_folder, usage, jpeg_quality)
+    if mode == RECORD_MODE_SEGMENT:
+        return SegmentSink(save_folder, fps, codec, segment_seconds, usage)
+    raise ValueError(f"Unknown record mode: {mode}")
+
+
+class FrameRecorder:
+    """
+    Ghi frame xuống đĩa ở các worker thread riêng, tách khỏi capture thread.
+    Capture thread chỉ gọi submit(); hàng đợi có giới hạn, khi đầy thì áp
+    dụng overflow policy và đếm số frame bị bỏ. Nếu có index
+    (FrameIndexWriter), mỗi frame đã ghi được thêm vào index theo thứ tự submit.
+    """
+
+    def __init__(
+        self,
+        cam_id,
+        sink,
+        on_error=None,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        workers=DEFAULT_WRITER_WORKERS,
+        policy=DEFAULT_OVERFLOW_POLICY,
+        metrics=None,
+        index=None,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.cam_id = cam_id
+        self.sink = sink
+        self.on_error = on_error
+        self.metrics = metrics  # optional CameraMetrics ("write" stage)
+        self.index = index  # optional FrameIndexWriter, closed with the sink
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        # an ordered sink (video segments) is fed by a single writer
+        self.num_workers = 1 if sink.ordered else max(1, workers)
+        self.workers = []
+        self.alive_workers = 0
+        self.seq = 0  # capture-order number of submitted frames and repeats
+        self.submitted = 0
+        self.repeats = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.closed = False  # set by stop(): submit() refuses new frames
+        self.stats_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.num_workers):
+            t = threading.Thread(
+                target=self._worker,
+                name=f"cam{self.cam_id+1}-writer{i}",
+                daemon=True,
+            )
+            self.workers.append(t)
+        self.alive_workers = len(self.workers)
+        for t in self.workers:
+            t.start()
+
+    def submit(self, frame, ts=None):
+        """Đưa frame vào hàng đợi. Trả về False nếu frame bị bỏ."""
+        if ts is None:
+            ts = datetime.datetime.now()
+        with self.stats_lock:
+            if self.closed:
+                # late frame from a capture/sync thread after stop()
+                self.dropped += 1
+                return False
+            seq = self.seq
+            self.seq += 1
+            self.submitted += 1
+        return self._enqueue((seq, ts, frame))
+
+    def _enqueue(self, item):
+        seq = item[0]
+        if self.policy == OVERFLOW_BLOCK:
+            try:
+                self.queue.put(item, timeout=BLOCK_TIMEOUT)
+                return True
+            except queue.Full:
+                self._count_drop(seq)
+                return False
+
+        if self.policy == OVERFLOW_DROP_NEWEST:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self._count_drop(seq)
+                return False
+
+        # drop oldest: make room by discarding the head of the queue
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    old = self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.queue.task_done()
+                if old is _STOP:
+                    # never discard a shutdown marker (a full queue: the writers exit on their own)
+                    try:
+                        self.queue.put_nowait(old)
+                    except queue.Full:
+                        pass
+                    self._count_drop(seq)
+                    return False
+                self._count_drop(old[0])
+
+    def mark_repeat(self, ts):
+        """
+        Frame trùng frame trước. Ảnh: không ghi, chỉ thêm entry repeat vào
+        index. Segment video: ghi lại frame trước (xem SegmentSink.repeat).
+        """
+        with self.stats_lock:
+            if self.closed:
+                return
+            seq = self.seq
+            self.seq += 1
+            self.repeats += 1
+        if self.sink.ordered:
+            self._enqueue((seq, ts, _REPEAT))
+        elif self.index is not None:
+            self.index.add_repeat(seq, ts)
+
+    def stop(self, wait=False):
+        """
+        Dừng các worker sau khi ghi hết frame còn trong hàng đợi. Không chặn
+        khi hàng đợi đầy: marker chỉ để đánh thức worker, worker rảnh cũng
+        tự thoát khi recorder đã đóng.
+        """
+        with self.stats_lock:
+            if self.closed:
+                return
+            self.closed = True
+        for _ in self.workers:
+            try:
+                self.queue.put_nowait(_STOP)
+            except queue.Full:
+                break
+        if wait:
+            self.join()
+
+    def join(self, timeout=None):
+        """Chờ các worker ghi xong (sau stop()). False nếu vẫn còn worker sau timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self.workers:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(t.is_alive() for t in self.workers)
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "submitted": self.submitted,
+                "repeats": self.repeats,
+                "written": self.written,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queue_depth": self.queue.qsize(),
+            }
+
+    def _count_drop(self, seq):
+        with self.stats_lock:
+            self.dropped += 1
+        if self.index is not None:
+            self.index.skip(seq)
+
+    def _worker(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=STOP_POLL)
+            except queue.Empty:
+                if self.closed:
+                    break
+                continue
+            try:
+                if item is _STOP:
+                    break
+                seq, ts, frame = item
+                self._write(seq, ts, frame)
+            finally:
+                self.queue.task_done()
+        with self.stats_lock:
+            self.alive_workers -= 1
+            last = self.alive_workers == 0
+        if last:
+            # a blocked submit() that got in just before stop(): nobody writes it now
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.queue.task_done()
+                if item is not _STOP:
+                    self._count_drop(item[0])
+            # the last worker out closes the open file/segment
+            try:
+                self.sink.close()
+            except Exception as e:
+                print(f"[cam{self.cam_id+1}] close error: {e}")
+            if self.index is not None:
+                self.index.close()
+
+    def _write(self, seq, ts, frame):
+        try:
+            t0 = time.perf_counter()
+            if frame is _REPEAT:
+                location = self.sink.repeat(ts)
+                if location is None:
+                    # nothing written yet to repeat
+                    if self.index is not None:
+                        self.index.skip(seq)
+                    return
+            else:
+                location = self.sink.write(ts, frame)
+            if self.index is not None:
+                self.index.add(seq, ts, *location)
+            if self.metrics is not None:
+                self.metrics.observe("write", time.perf_counter() - t0)
+            if frame is not _REPEAT:
+                with self.stats_lock:
+                    self.written += 1
+        except Exception as e:
+            if self.index is not None:
+                self.index.skip(seq)
+            with self.stats_lock:
+                self.errors += 1
+            print(f"[cam{self.cam_id+1}] save error: {e}")
+            if self.on_error:
+                self.on_error(f"Save error: {e}")
@@ -0,0 +1,273 @@
+"""
+retention.py
+Giới hạn dung lượng của OUTPUT_ROOT: RetentionManager (thread ưu tiên thấp)
+xoá hoặc chuyển sang archive các session cũ nhất khi vượt budget hoặc khi
+đĩa còn trống dưới ngưỡng, và hạ chất lượng ghi (STORAGE_LOW / STORAGE_FULL)
+trước khi đĩa đầy thay vì để imwrite lỗi ở mọi frame.
+Dung lượng session hiện tại được cộng dồn từ recorder (DiskUsage), không
+quét lại thư mục.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+from utils import log
+
+
+GIB = 1024 ** 3
+MIB = 1024 ** 2
+RETENTION_BUDGET_BYTES = 0  # cap on the total size of OUTPUT_ROOT, 0 = no cap
+RETENTION_MIN_FREE_BYTES = 0  # oldest sessions are removed to keep this much disk free, 0 = off
+RETENTION_INTERVAL = 2.0  # seconds between free-space checks
+RETENTION_NICE = 10  # niceness of the retention thread (Linux)
+RETENTION_DELETE_BATCH = 64  # files removed between two short pauses
+RETENTION_DELETE_PAUSE = 0.01  # seconds; keeps deletion from starving the writers
+SESSION_SIZE_FILE = "session_size"  # bytes of a finished session, saves a rescan next run
+RETENTION_MIN_AGE = 600.0  # seconds a finished session must be untouched before it may be removed
+# session folders made by create_session_folder(): <YYYYmmdd_HHMMSS>_<host id hex>
+SESSION_NAME_RE = re.compile(r"^\d{8}_\d{6}_[0-9a-fA-F]+$")
+
+# storage levels, from the headroom left before the disk (or the budget) is full
+STORAGE_OK = "ok"
+STORAGE_LOW = "low"  # record every other frame, decoded frames as JPEG instead of PNG
+STORAGE_FULL = "full"  # recording paused until space comes back
+STORAGE_LEVELS = (STORAGE_OK, STORAGE_LOW, STORAGE_FULL)
+# a level starts at the larger of a fixed size and this many seconds of writing
+STORAGE_LOW_BYTES = 1 * GIB
+STORAGE_LOW_SECONDS = 120.0
+STORAGE_FULL_BYTES = 128 * MIB
+STORAGE_FULL_SECONDS = 15.0
+STORAGE_RECOVER_FACTOR = 1.5  # headroom needed to leave a level, avoids flapping
+DEGRADED_JPEG_QUALITY = 85
+RATE_SMOOTHING = 0.3  # weight of the newest write-rate sample
+
+
+class DiskUsage:
+    """
+    Byte ghi bởi một session (recorder gọi add() sau mỗi lần ghi) và mức
+    storage hiện tại do RetentionManager đặt; capture/writer thread chỉ đọc
+    level nên không tốn gì trên đường ghi.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.level = STORAGE_OK
+
+    def add(self, nbytes):
+        if nbytes > 0:
+            with self.lock:
+                self.total += nbytes
+
+
+def _tree_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_tree(path):
+    """Xoá từng file, nghỉ ngắn sau mỗi RETENTION_DELETE_BATCH file."""
+    removed = 0
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+            removed += 1
+            if removed % RETENTION_DELETE_BATCH == 0:
+                time.sleep(RETENTION_DELETE_PAUSE)
+        os.rmdir(root)
+
+
+def _read_size(path):
+    """Dung lượng ghi trong SESSION_SIZE_FILE, None nếu session chưa đóng."""
+    try:
+        with open(os.path.join(path, SESSION_SIZE_FILE)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _last_modified(path):
+    # the session folder and its camN folders change whenever a file is added
+    latest = os.stat(path).st_mtime
+    for entry in os.scandir(path):
+        latest = max(latest, entry.stat(follow_symlinks=False).st_mtime)
+    return latest
+
+
+def _lower_priority():
+    # per-thread niceness works on Linux (each thread has its own task id)
+    if not hasattr(os, "setpriority") or not hasattr(threading, "get_native_id"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), RETENTION_NICE)
+    except OSError:
+        pass
+
+
+class RetentionManager(threading.Thread):
+    """
+    Mỗi RETENTION_INTERVAL giây: đo chỗ trống (một lần statvfs), cộng dung
+    lượng session hiện tại từ DiskUsage, rồi xoá (hoặc move sang
+    archive_root) session cũ nhất cho tới khi tổng <= budget_bytes và chỗ
+    trống >= min_free_bytes (mỗi giới hạn = 0 là tắt). Chỉ thư mục tên
+    <timestamp>_<hex> đã đóng (có SESSION_SIZE_FILE) và không đổi trong
+    RETENTION_MIN_AGE giây mới bị xoá: session hiện tại, session đang ghi
+    của instance khác và thư mục lạ thì không. Nếu vẫn thiếu chỗ thì đổi
+    usage.level và gửi event STORAGE (level, headroom, used).
+    """
+
+    def __init__(
+        self,
+        window,
+        output_root,
+        session_root,
+        usage,
+        budget_bytes=RETENTION_BUDGET_BYTES,
+        min_free_bytes=RETENTION_MIN_FREE_BYTES,
+        archive_root=None,
+        interval=RETENTION_INTERVAL,
+    ):
+        super().__init__(daemon=True, name="retention")
+        self.window = window
+        self.output_root = output_root
+        self.session_root = session_root
+        self.usage = usage
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.archive_root = archive_root
+        self.interval = interval
+        self.running = True
+        self._wake = threading.Event()
+        self.sessions = []  # [path, bytes] of earlier sessions, oldest first
+        self.old_bytes = 0
+        self.rate = 0.0  # bytes/s written by the current session
+        self.removed = 0
+        self.frees_disk = True
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        # the next run reads this instead of walking the session
+        try:
+            with open(os.path.join(self.session_root, SESSION_SIZE_FILE), "w") as f:
+                f.write(str(self.usage.total))
+        except OSError as e:
+            print(f"[Retention] cannot write session size: {e}")
+
+    def used_bytes(self):
+        return self.old_bytes + self.usage.total
+
+    def run(self):
+        _lower_priority()
+        self._scan_sessions()
+        # moving to an archive on the same disk keeps the budget but frees nothing
+        self.frees_disk = self.archive_root is None or not _same_device(self.archive_root, self.output_root)
+        if not self.frees_disk:
+            log(self.window, f"Archive {self.archive_root} is on the recordings disk, only the budget is enforced", "warning")
+        last_total = self.usage.total
+        last_check = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            total = self.usage.total
+            sample = (total - last_total) / max(1e-6, now - last_check)
+            self.rate += RATE_SMOOTHING * (sample - self.rate)
+            last_total, last_check = total, now
+            try:
+                self._enforce()
+            except Exception as e:
+                print(f"[Retention] error: {e}")
+            self._wake.wait(self.interval)
+
+    def _scan_sessions(self):
+        # once per run; sessions finished by an earlier run carry their size
+        try:
+            names = sorted(os.listdir(self.output_root))  # <timestamp>_<MAC>: oldest first
+        except OSError:
+            names = []
+        current = os.path.abspath(self.session_root)
+        for name in names:
+            path = os.path.join(self.output_root, name)
+            if not SESSION_NAME_RE.match(name) or not os.path.isdir(path) or os.path.abspath(path) == current:
+                continue
+            size = _read_size(path)
+            if size is None:
+                # unfinished (crashed or still recording elsewhere): counted, never removed
+                size = _tree_size(path)
+            self.sessions.append([path, size])
+            self.old_bytes += size
+
+    def _free_bytes(self):
+        return shutil.disk_usage(self.output_root).free
+
+    def _over_limit(self, free):
+        if self.budget_bytes and self.used_bytes() > self.budget_bytes:
+            return True
+        return self.frees_disk and self.min_free_bytes > 0 and free < self.min_free_bytes
+
+    def _removable(self, path):
+        if _read_size(path) is None:
+            return False
+        try:
+            return time.time() - _last_modified(path) >= RETENTION_MIN_AGE
+        except OSError:
+            return False
+
+    def _enforce(self):
+        free = self._free_bytes()
+        for entry in list(self.sessions):
+            if not self.running or not self._over_limit(free):
+                break
+            path, size = entry
+            if not self._removable(path):
+                continue
+            self.sessions.remove(entry)
+            self.old_bytes -= size
+            self._remove_session(path, size)
+            free = self._free_bytes()
+        headroom = free
+        if self.budget_bytes:
+            headroom = min(headroom, self.budget_bytes - self.used_bytes())
+        level = self._level_for(headroom)
+        if level != self.usage.level:
+            self.usage.level = level
+            self.window.write_event_value("STORAGE", (level, headroom, self.used_bytes()))
+
+    def _level_for(self, headroom):
+        full = max(STORAGE_FULL_BYTES, self.rate * STORAGE_FULL_SECONDS)
+        low = max(STORAGE_LOW_BYTES, self.rate * STORAGE_LOW_SECONDS)
+        current = self.usage.level
+        if headroom < full or (current == STORAGE_FULL and headroom < full * STORAGE_RECOVER_FACTOR):
+            return STORAGE_FULL
+        if headroom < low or (current != STORAGE_OK and headroom < low * STORAGE_RECOVER_FACTOR):
+            return STORAGE_LOW
+        return STORAGE_OK
+
+    def _remove_session(self, path, size):
+        name = os.path.basename(path)
+        try:
+            if self.archive_root is not None:
+                os.makedirs(self.archive_root, exist_ok=True)
+                shutil.move(path, os.path.join(self.archive_root, name))
+                log(self.window, f"Retention: archived session {name} ({size / MIB:.0f} MB) -> {self.archive_root}")
+            else:
+                _remove_tree(path)
+                log(self.window, f"Retention: deleted session {name} ({size / MIB:.0f} MB)")
+            self.removed += 1
+        except Exception as e:
+            # left in place and not retried this run
+            log(self.window, f"Retention: cannot remove {name}: {e}", "error")
+
+
+def _same_device(path, other):
+    try:
+        os.makedirs(path, exist_ok=True)
+        return os.stat(path).st_dev == os.stat(other).st_dev
+    except OSError:
+        return False
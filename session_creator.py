@@ -1,7 +1,10 @@
 OUTPUT_ROOT = "recordings"
+HOST_ID_FILE = ".host_id"  # cached mac_address_hex() in OUTPUT_ROOT, skips the NIC scan
 import os
 import datetime
 import uuid
+from frame_index import FrameIndex, INDEX_FILE
+from retention import DiskUsage
 def now_timestamp_str():
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -29,9 +32,79 @@ def mac_address_hex():
     if first_octet & 0x01:
         print("⚠️  uuid.getnode() trả về giá trị ngẫu nhiên (không phải MAC thật).")
     return mac
-def create_session_folder():
+
+
+_host_id = None
+
+
+def host_id(output_root=OUTPUT_ROOT):
+    """
+    mac_address_hex() nhưng cache trong process và trong output_root/HOST_ID_FILE:
+    liệt kê mọi NIC qua psutil chỉ chạy ở lần đầu tiên trên máy.
+    """
+    global _host_id
+    if _host_id is not None:
+        return _host_id
+    path = os.path.join(output_root, HOST_ID_FILE)
+    try:
+        with open(path) as f:
+            cached = f.read().strip()
+        if cached and all(c in "0123456789abcdefABCDEF" for c in cached):
+            _host_id = cached
+            return _host_id
+    except OSError:
+        pass
+    _host_id = mac_address_hex()
+    try:
+        os.makedirs(output_root, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(_host_id)
+    except OSError as e:
+        print(f"[Session] cannot cache host id: {e}")
+    return _host_id
+
+
+def create_session_folder(output_root=OUTPUT_ROOT):
     # create session folder with timestamp + mac
-    session_name = f"{now_timestamp_str()}_{mac_address_hex()}"
-    session_root = os.path.join(OUTPUT_ROOT, session_name)
+    session_name = f"{now_timestamp_str()}_{host_id(output_root)}"
+    session_root = os.path.join(output_root, session_name)
     os.makedirs(session_root, exist_ok=True)
-    return session_root
\ No newline at end of file
+    return session_root
+
+
+class SessionStore:
+    """
+    Một session ghi hình: OUTPUT_ROOT/<timestamp>_<MAC>/camN. Mỗi camera có
+    frame index (frames.idx) nên tìm frame theo thời gian không cần list
+    thư mục. Truyền root để mở lại một session đã có. usage đếm byte các
+    recorder đã ghi trong session (dùng bởi RetentionManager).
+    """
+
+    def __init__(self, root=None, output_root=OUTPUT_ROOT):
+        self.output_root = output_root
+        self.root = root if root is not None else create_session_folder(output_root)
+        self.usage = DiskUsage()
+
+    def cam_folder(self, cam_idx):
+        return os.path.join(self.root, f"cam{cam_idx+1}")
+
+    def cameras(self):
+        """cam_idx của các camera có frame index trong session."""
+        found = []
+        for name in os.listdir(self.root):
+            if name.startswith("cam") and name[3:].isdigit():
+                if os.path.exists(os.path.join(self.root, name, INDEX_FILE)):
+                    found.append(int(name[3:]) - 1)
+        return sorted(found)
+
+    def open_index(self, cam_idx):
+        return FrameIndex(self.cam_folder(cam_idx))
+
+    def frames_between(self, cam_idx, start, end):
+        """Frame của cam_idx chụp trong [start, end); start/end là datetime hoặc epoch."""
+        if isinstance(start, datetime.datetime):
+            start = start.timestamp()
+        if isinstance(end, datetime.datetime):
+            end = end.timestamp()
+        with self.open_index(cam_idx) as index:
+            return index.between(start, end)
\ No newline at end of file
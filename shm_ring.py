@@ -0,0 +1,122 @@
+import struct
+from multiprocessing import shared_memory
+import numpy as np
+from mjpeg_stream import JpegFrame
+
+
+DEFAULT_SLOTS = 3
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3  # one raw 1080p BGR frame
+
+KIND_JPEG = 0  # data is an encoded JPEG (MJPEG passthrough)
+KIND_BGR = 1  # data is a raw h x w x 3 uint8 frame
+
+# ring header: write_seq, read_seq
+_RING_HDR = struct.Struct("<QQ")
+# slot header: seq, length, kind, height, width, timestamp
+_SLOT_HDR = struct.Struct("<QIBHHd")
+
+
+class SharedFrameRing:
+    """
+    Ring buffer frame trong multiprocessing.shared_memory, một writer (process
+    camera) và một reader (GUI). Mỗi slot được bảo vệ bằng seqlock: writer xoá
+    seq của slot trước khi ghi và đặt lại sau khi ghi xong, reader đọc seq
+    trước/sau khi copy để phát hiện frame bị ghi đè giữa chừng.
+    """
+
+    def __init__(self, name=None, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES, create=False):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.stride = _SLOT_HDR.size + slot_bytes
+        size = _RING_HDR.size + slots * self.stride
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.buf = self.shm.buf
+        self.owner = create
+        if create:
+            _RING_HDR.pack_into(self.buf, 0, 0, 0)
+            for i in range(slots):
+                _SLOT_HDR.pack_into(self.buf, self._slot_off(i), 0, 0, 0, 0, 0, 0.0)
+
+    @classmethod
+    def create(cls, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES):
+        return cls(None, slots, slot_bytes, create=True)
+
+    @classmethod
+    def attach(cls, name, slots=DEFAULT_SLOTS, slot_bytes=DEFAULT_SLOT_BYTES):
+        return cls(name, slots, slot_bytes, create=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _slot_off(self, i):
+        return _RING_HDR.size + i * self.stride
+
+    # ---------------- writer side ----------------
+    def write(self, data, kind, shape=(0, 0), ts=0.0):
+        """Ghi một frame; trả về seq, hoặc None nếu frame lớn hơn slot."""
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).reshape(-1)
+        n = len(data)
+        if n > self.slot_bytes:
+            return None
+        write_seq, _ = _RING_HDR.unpack_from(self.buf, 0)
+        seq = write_seq + 1
+        off = self._slot_off(seq % self.slots)
+        # mark the slot as being written
+        struct.pack_into("<Q", self.buf, off, 0)
+        start = off + _SLOT_HDR.size
+        self.buf[start:start + n] = data
+        _SLOT_HDR.pack_into(self.buf, off, 0, n, kind, shape[0], shape[1], ts)
+        struct.pack_into("<Q", self.buf, off, seq)
+        struct.pack_into("<Q", self.buf, 0, seq)
+        return seq
+
+    def consumer_caught_up(self):
+        """True nếu reader đã lấy frame mới nhất (dùng để hạn chế FRAME event)."""
+        write_seq, read_seq = _RING_HDR.unpack_from(self.buf, 0)
+        return read_seq >= write_seq
+
+    # ---------------- reader side ----------------
+    def latest_seq(self):
+        return _RING_HDR.unpack_from(self.buf, 0)[0]
+
+    def read_latest(self, after=0):
+        """
+        Đọc frame mới nhất có seq > after. Trả về (seq, kind, data, shape, ts)
+        hoặc None nếu chưa có frame mới / slot đang bị ghi đè.
+        """
+        seq = self.latest_seq()
+        if seq <= after:
+            return None
+        off = self._slot_off(seq % self.slots)
+        s1, n, kind, h, w, ts = _SLOT_HDR.unpack_from(self.buf, off)
+        if s1 != seq:
+            return None
+        start = off + _SLOT_HDR.size
+        data = bytes(self.buf[start:start + n])
+        s2 = struct.unpack_from("<Q", self.buf, off)[0]
+        if s2 != seq:
+            return None
+        struct.pack_into("<Q", self.buf, 8, seq)
+        return seq, kind, data, (h, w), ts
+
+    def close(self):
+        self.buf = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+
+
+def frame_from_ring(kind, data, shape):
+    """Dựng lại frame (JpegFrame hoặc ndarray BGR) từ dữ liệu đọc ra khỏi ring."""
+    if kind == KIND_JPEG:
+        return JpegFrame(data)
+    h, w = shape
+    return np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
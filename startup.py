@@ -0,0 +1,169 @@
+"""
+startup.py
+Bring-up song song cho nhiều camera: mở stream trên một pool giới hạn
+(StartupOrchestrator) thay vì lần lượt trên GUI thread, và ghi mốc thời
+gian của từng camera (StartupTimeline) tới frame đầu tiên.
+"""
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+STARTUP_WORKERS = 4  # cameras whose streams are opened at the same time
+STARTUP_FILE = "startup_timeline.csv"
+# per-camera bring-up steps, in order:
+# detected: DeviceManager saw the device; forwarded: adb forward done;
+# queued: GUI/headless loop handed it to the pool; stream_open: start_capture() returned;
+# first_frame: first frame read from the stream
+STARTUP_STEPS = ("detected", "forwarded", "queued", "stream_open", "first_frame")
+
+
+class StartupTimeline:
+    """
+    Mốc thời gian (monotonic, giây tính từ lúc app start) của mỗi lần
+    bring-up camera. Khi có first_frame, một dòng được ghi vào
+    startup_timeline.csv của session. Gọi được từ mọi thread.
+    """
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+        self.app = {}  # app-wide steps, e.g. "session"
+        self.cams = {}  # cam_idx -> {"serial": ..., step: monotonic}
+        self.file = None
+        self.writer = None
+
+    def open(self, session_root):
+        path = os.path.join(session_root, STARTUP_FILE)
+        new_file = not os.path.exists(path)
+        with self.lock:
+            self.file = open(path, "a", newline="", buffering=1)
+            self.writer = csv.writer(self.file)
+            if new_file:
+                self.writer.writerow(["cam", "serial"] + list(STARTUP_STEPS) + ["ttff"])
+
+    def mark_app(self, step, t=None):
+        with self.lock:
+            self.app[step] = time.monotonic() if t is None else t
+            return self.app[step] - self.t0
+
+    def mark(self, cam_idx, step, t=None, serial=None):
+        """
+        Ghi mốc `step` cho cam_idx. "detected" bắt đầu một lần bring-up mới
+        (thiết bị cắm lại). Trả về dict mốc (giây từ t0) khi đây là
+        first_frame của lần bring-up, ngược lại None.
+        """
+        t = time.monotonic() if t is None else t
+        with self.lock:
+            marks = self.cams.get(cam_idx)
+            if marks is None or step == "detected":
+                marks = self.cams[cam_idx] = {}
+            if serial is not None:
+                marks["serial"] = serial
+            if step in marks:
+                return None  # later reconnects do not move the bring-up marks
+            marks[step] = t
+            if step != "first_frame":
+                return None
+            row = {s: marks[s] - self.t0 for s in STARTUP_STEPS if s in marks}
+            row["serial"] = marks.get("serial", "")
+            # time to first frame, from detection (hot-plug) or from launch
+            row["ttff"] = t - marks.get("detected", self.t0)
+            if self.writer is not None:
+                self.writer.writerow(
+                    [cam_idx + 1, row["serial"]]
+                    + [f"{row[s]:.3f}" if s in row else "" for s in STARTUP_STEPS]
+                    + [f"{row['ttff']:.3f}"]
+                )
+            return row
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                self.writer = None
+
+
+def format_bring_up(cam_idx, row):
+    """'cam3 first frame 1.84s after launch (forwarded +0.12s, ...)' cho log."""
+    parts = []
+    prev = None
+    for step in STARTUP_STEPS:
+        if step not in row:
+            continue
+        if prev is not None:
+            parts.append(f"{step} +{row[step] - prev:.2f}s")
+        prev = row[step]
+    text = f"cam{cam_idx+1} first frame {row['first_frame']:.2f}s after launch, ttff {row['ttff']:.2f}s"
+    return text + (f" ({', '.join(parts)})" if parts else "")
+
+
+class StartupOrchestrator:
+    """
+    Mở stream của các camera trên một pool tối đa `workers` thread; GUI
+    thread chỉ submit. Kết quả về qua event CAM_STARTED
+    (cam_idx, ok, error, giây mở stream). cancel(cam_idx) (thiết bị bị rút,
+    Stop All) bỏ lần mở đang chờ; start token của client chặn cả lần mở đã
+    bắt đầu nếu stop_capture() đến trước.
+    """
+
+    def __init__(self, window, timeline=None, workers=STARTUP_WORKERS):
+        self.window = window
+        self.timeline = timeline
+        self.lock = threading.Lock()
+        self.pending = {}  # cam_idx -> (future, client) not finished yet
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="startup")
+
+    def start(self, cam_idx, client):
+        if self.timeline is not None:
+            self.timeline.mark(cam_idx, "queued")
+        token = client.start_token()
+        with self.lock:
+            self._cancel(cam_idx)
+            future = self.pool.submit(self._bring_up, cam_idx, client, token)
+            self.pending[cam_idx] = (future, client)
+
+    def cancel(self, cam_idx):
+        """Bỏ lần mở stream đang chờ của cam_idx (gọi trước stop_capture())."""
+        with self.lock:
+            self._cancel(cam_idx)
+
+    def _cancel(self, cam_idx):
+        # caller holds self.lock
+        job = self.pending.pop(cam_idx, None)
+        if job is not None:
+            job[0].cancel()
+
+    def _bring_up(self, cam_idx, client, token):
+        t0 = time.monotonic()
+        error = None
+        started = None
+        try:
+            started = client.start_capture(token)
+        except Exception as e:
+            error = str(e)
+        with self.lock:
+            job = self.pending.get(cam_idx)
+            if job is None or job[1] is not client:
+                return  # cancelled: the caller already stopped this client
+            del self.pending[cam_idx]
+        if started is None and error is None:
+            return  # stop_capture() came first, start_capture() did nothing
+        ok = error is None and client.running
+        if ok and self.timeline is not None:
+            self.timeline.mark(cam_idx, "stream_open")
+        if not ok and error is None:
+            error = client.error_msg or "Cannot open stream"
+        self.window.write_event_value("CAM_STARTED", (cam_idx, ok, error, time.monotonic() - t0))
+
+    def stop(self):
+        with self.lock:
+            for cam_idx in list(self.pending):
+                self._cancel(cam_idx)
+        try:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        except TypeError:  # Python 3.8: the pending jobs were cancelled above
+            self.pool.shutdown(wait=False)
@@ -0,0 +1,192 @@
+import csv
+import datetime
+import math
+import os
+import threading
+import time
+from metrics import Histogram
+from recorder import frame_stem
+
+
+SYNC_MAX_SKEW = 0.025  # seconds; frame sets spread wider than this are dropped
+SYNC_WAIT_TICKS = 3  # a set still missing a camera this many ticks later is incomplete
+SYNC_INDEX_FILE = "sync_index.csv"
+SYNC_SETTLE = 2.0  # headless: membership is frozen once no camera joined for this long
+
+# wall clock at monotonic 0, so a monotonic capture time maps to one stable wall time
+_EPOCH_OFFSET = time.time() - time.monotonic()
+
+
+def monotonic_to_datetime(mono):
+    """Thời điểm capture (time.monotonic()) -> datetime dùng cho tên file."""
+    return datetime.datetime.fromtimestamp(mono + _EPOCH_OFFSET)
+
+
+class SyncClock:
+    """
+    Lưới tick chung (monotonic) cho mọi camera trong sync mode. DroidCam
+    chạy tự do nên không trigger được điện thoại: mỗi camera lấy frame đầu
+    tiên tới sau mỗi tick, cùng một lưới cho mọi camera.
+    """
+
+    def __init__(self, fps):
+        self.lock = threading.Lock()
+        self.fps = max(1.0, float(fps))
+        self.start = time.monotonic()
+        self.base_tick = 0
+
+    def tick_at(self, mono):
+        return self.base_tick + int(math.floor((mono - self.start) * self.fps))
+
+    def tick_time(self, tick):
+        return self.start + (tick - self.base_tick) / self.fps
+
+    def set_fps(self, fps):
+        # re-anchor at the next tick so tick numbers keep increasing
+        with self.lock:
+            now = time.monotonic()
+            self.base_tick = self.tick_at(now) + 1
+            self.start = now
+            self.fps = max(1.0, float(fps))
+
+
+class SyncGroup:
+    """
+    Ghép frame của các camera đang ghi theo tick của SyncClock. Một set đủ
+    camera và skew <= max_skew thì được đưa vào recorder của từng camera;
+    ngược lại bị bỏ. Mọi set (kể cả bị bỏ) được ghi vào sync_index.csv:
+    một dòng cho mỗi (tick, camera) với thời điểm capture và skew đo được.
+    Set chỉ được xét sau khi membership được chốt (join_all() hoặc
+    freeze()); trước đó frame bị bỏ, vì chưa biết set cần những camera nào.
+    """
+
+    def __init__(self, session_root, fps, max_skew=SYNC_MAX_SKEW, wait_ticks=SYNC_WAIT_TICKS):
+        self.clock = SyncClock(fps)
+        self.max_skew = max_skew
+        self.wait_ticks = wait_ticks
+        self.lock = threading.Lock()
+        self.members = set()  # cam ids expected in every set
+        self.since = {}  # cam id -> first tick it is expected in, for cameras joining after the freeze
+        self.frozen = False
+        self.last_join = time.monotonic()
+        self.pending = {}  # tick -> {cam_id: (capture_mono, frame, recorder)}
+        self.sets = 0
+        self.dropped_skew = 0
+        self.incomplete = 0
+        self.skew = Histogram()
+        self.path = os.path.join(session_root, SYNC_INDEX_FILE)
+        new_file = not os.path.exists(self.path)
+        self.file = open(self.path, "a", newline="", buffering=1)
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(
+                ["tick", "tick_time", "status", "skew_ms", "cam", "epoch", "offset_ms", "frame"]
+            )
+
+    def join_all(self, cam_ids):
+        """Đăng ký mọi camera rồi chốt membership; gọi trước khi camera nào bắt đầu ghi."""
+        with self.lock:
+            self.members.update(cam_ids)
+            self.frozen = True
+
+    def join(self, cam_id):
+        """Thêm một camera; sau khi đã chốt thì nó chỉ bắt buộc có mặt từ tick kế tiếp."""
+        with self.lock:
+            if cam_id in self.members:
+                return
+            self.members.add(cam_id)
+            self.last_join = time.monotonic()
+            if self.frozen:
+                self.since[cam_id] = self.clock.tick_at(self.last_join) + 1
+
+    def freeze(self):
+        """Chốt membership (headless: camera đến dần qua DEVICE_ADDED). Trả về cam ids."""
+        with self.lock:
+            self.frozen = True
+            return sorted(self.members)
+
+    def leave(self, cam_id):
+        with self.lock:
+            self.members.discard(cam_id)
+            self.since.pop(cam_id, None)
+            ready = self._collect_ready(None)
+        self._submit(ready)
+
+    def offer(self, cam_id, tick, capture_mono, frame, recorder):
+        """Frame của cam_id cho tick; được ghi khi set của tick đó hoàn tất."""
+        with self.lock:
+            if not self.frozen:
+                return  # a set cannot be judged complete while members may still join
+            self.pending.setdefault(tick, {})[cam_id] = (capture_mono, frame, recorder)
+            ready = self._collect_ready(tick)
+        self._submit(ready)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sets": self.sets,
+                "dropped_skew": self.dropped_skew,
+                "incomplete": self.incomplete,
+                "skew_ms": self.skew.summary(),
+            }
+
+    def close(self):
+        with self.lock:
+            ready = self._collect_ready(None, flush=True)
+        self._submit(ready)
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _collect_ready(self, newest, flush=False):
+        # caller holds self.lock; returns frames to hand to the recorders
+        ready = []
+        for tick in sorted(self.pending):
+            entries = self.pending[tick]
+            complete = all(m in entries for m in self.members if self.since.get(m, tick) <= tick)
+            stale = flush or (newest is not None and tick <= newest - self.wait_ticks)
+            if not complete and not stale:
+                continue
+            del self.pending[tick]
+            times = [e[0] for e in entries.values()]
+            skew = max(times) - min(times)
+            if not complete:
+                status = "incomplete"
+                self.incomplete += 1
+            elif skew > self.max_skew:
+                status = "skew"
+                self.dropped_skew += 1
+            else:
+                status = "ok"
+                self.sets += 1
+                self.skew.observe(skew * 1000.0)
+            self._write_index(tick, status, skew, entries)
+            if status == "ok":
+                ready.extend(entries.values())
+        return ready
+
+    def _write_index(self, tick, status, skew, entries):
+        if self.file is None:
+            return
+        tick_time = self.clock.tick_time(tick)
+        for cam_id in sorted(entries):
+            mono = entries[cam_id][0]
+            wall = monotonic_to_datetime(mono)
+            self.writer.writerow(
+                [
+                    tick,
+                    f"{tick_time + _EPOCH_OFFSET:.6f}",
+                    status,
+                    f"{skew * 1000.0:.2f}",
+                    cam_id + 1,
+                    f"{wall.timestamp():.6f}",
+                    f"{(mono - tick_time) * 1000.0:.2f}",
+                    frame_stem(wall),
+                ]
+            )
+
+    def _submit(self, ready):
+        for mono, frame, recorder in ready:
+            if recorder is not None:
+                recorder.submit(frame, monotonic_to_datetime(mono))
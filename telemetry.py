@@ -0,0 +1,170 @@
+import csv
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import get_battery_via_adb, BATTERY_STATUS_NAMES
+
+
+BATTERY_MIN_INTERVAL = 5.0  # seconds, used while the level/temperature moves
+BATTERY_MAX_INTERVAL = 60.0  # seconds, reached after repeated stable samples
+BATTERY_WORKERS = 8  # concurrent adb calls across devices
+BATTERY_FILE = "battery.bin"
+BATTERY_DEVICES_FILE = "battery_devices.csv"
+
+# one sample: epoch, device id, level (-1 unknown), temperature in 0.1 °C
+# (-32768 unknown), status code (0 unknown) -> 15 bytes per sample
+_SAMPLE = struct.Struct("<dHhhB")
+_STATUS_CODES = {name: code for code, name in BATTERY_STATUS_NAMES.items()}
+_NO_TEMP = -32768
+
+
+class BatteryStore:
+    """
+    Chuỗi thời gian pin/nhiệt độ của một session, dạng nhị phân append-only
+    (battery.bin). Serial được map sang device id nhỏ trong battery_devices.csv.
+    """
+
+    def __init__(self, session_root):
+        self.path = os.path.join(session_root, BATTERY_FILE)
+        self.devices_path = os.path.join(session_root, BATTERY_DEVICES_FILE)
+        self.lock = threading.Lock()
+        self.ids = {}
+        if os.path.exists(self.devices_path):
+            with open(self.devices_path, newline="") as f:
+                for row in csv.DictReader(f):
+                    self.ids[row["serial"]] = int(row["id"])
+        new_index = not os.path.exists(self.devices_path)
+        self.devices_file = open(self.devices_path, "a", newline="", buffering=1)
+        if new_index:
+            self.devices_file.write("id,serial\n")
+        self.file = open(self.path, "ab")
+
+    def append(self, serial, info, ts=None):
+        ts = time.time() if ts is None else ts
+        level = info.get("level", -1) if info else -1
+        temp = info.get("temperature") if info else None
+        status = _STATUS_CODES.get(info.get("status"), 0) if info else 0
+        with self.lock:
+            dev_id = self.ids.get(serial)
+            if dev_id is None:
+                dev_id = self.ids[serial] = len(self.ids)
+                self.devices_file.write(f"{dev_id},{serial}\n")
+            self.file.write(
+                _SAMPLE.pack(
+                    ts,
+                    dev_id,
+                    level,
+                    _NO_TEMP if temp is None else int(round(temp * 10)),
+                    status,
+                )
+            )
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            self.devices_file.close()
+
+
+def read_battery_series(session_root):
+    """Đọc lại battery.bin -> list dict (ts, serial, level, temperature, status)."""
+    names = {}
+    with open(os.path.join(session_root, BATTERY_DEVICES_FILE), newline="") as f:
+        for row in csv.DictReader(f):
+            names[int(row["id"])] = row["serial"]
+    with open(os.path.join(session_root, BATTERY_FILE), "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % _SAMPLE.size  # ignore a torn last record
+    samples = []
+    for ts, dev_id, level, temp, status in _SAMPLE.iter_unpack(data[:usable]):
+        samples.append(
+            {
+                "ts": ts,
+                "serial": names.get(dev_id, str(dev_id)),
+                "level": None if level < 0 else level,
+                "temperature": None if temp == _NO_TEMP else temp / 10.0,
+                "status": BATTERY_STATUS_NAMES.get(status),
+            }
+        )
+    return samples
+
+
+class BatteryMonitor(threading.Thread):
+    """
+    Poll pin cho mọi thiết bị song song, không giữ DeviceManager.lock.
+    Mỗi thiết bị có interval riêng: gấp đôi sau mỗi mẫu không đổi (tối đa
+    BATTERY_MAX_INTERVAL), trở về BATTERY_MIN_INTERVAL khi mức pin hoặc
+    nhiệt độ thay đổi.
+    """
+
+    def __init__(self, window, get_assigned, store=None):
+        super().__init__(daemon=True)
+        self.window = window
+        self.get_assigned = get_assigned  # () -> {cam_idx: serial}
+        self.store = store
+        self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=BATTERY_WORKERS, thread_name_prefix="battery")
+        self.next_due = {}  # serial -> time
+        self.interval = {}  # serial -> seconds
+        self.last = {}  # serial -> (level, temperature)
+        self._wake = threading.Event()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        self.executor.shutdown(wait=False)
+        if self.store is not None:
+            self.store.close()
+
+    def run(self):
+        while self.running:
+            now = time.time()
+            assigned = self.get_assigned()
+            live = set(assigned.values())
+            for serial in list(self.next_due):
+                if serial not in live:
+                    self.next_due.pop(serial, None)
+                    self.interval.pop(serial, None)
+                    self.last.pop(serial, None)
+            due = [
+                (cam_idx, serial)
+                for cam_idx, serial in assigned.items()
+                if self.next_due.get(serial, 0.0) <= now
+            ]
+            if due:
+                futures = [
+                    (cam_idx, serial, self.executor.submit(get_battery_via_adb, serial))
+                    for cam_idx, serial in due
+                ]
+                for cam_idx, serial, fut in futures:
+                    try:
+                        info = fut.result()
+                    except Exception as e:
+                        print(f"[BatteryMonitor] cam{cam_idx+1} ({serial}) error: {e}")
+                        info = None
+                    self._record(cam_idx, serial, info)
+            wait = BATTERY_MIN_INTERVAL
+            if self.next_due:
+                wait = max(0.5, min(self.next_due.values()) - time.time())
+            self._wake.wait(min(wait, BATTERY_MIN_INTERVAL))
+
+    def _record(self, cam_idx, serial, info):
+        if not self.running:
+            return
+        sample = (info.get("level"), info.get("temperature")) if info else None
+        interval = self.interval.get(serial, BATTERY_MIN_INTERVAL)
+        if sample is not None and sample == self.last.get(serial):
+            interval = min(interval * 2, BATTERY_MAX_INTERVAL)
+        else:
+            interval = BATTERY_MIN_INTERVAL
+        self.interval[serial] = interval
+        self.last[serial] = sample
+        self.next_due[serial] = time.time() + interval
+        if self.store is not None and info:
+            try:
+                self.store.append(serial, info)
+            except Exception as e:
+                print(f"[BatteryMonitor] store error: {e}")
+        self.window.write_event_value("BATTERY_UPDATE", (cam_idx, serial, info))
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+import pytest
+
+# the modules live flat at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_bus import EventBus  # noqa: E402
+from fake_droidcam import FakeDroidCam  # noqa: E402
+
+
+def wait_for(predicate, timeout=5.0, interval=0.02):
+    """Chờ tới khi predicate() đúng; trả về giá trị cuối cùng của predicate()."""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if result or time.monotonic() > deadline:
+            return result
+        time.sleep(interval)
+
+
+def drain(bus, event=None):
+    """Các event đang chờ trên bus ([(event, value)], lọc theo tên nếu có)."""
+    found = []
+    while not bus.events.empty():
+        key, value = bus.events.get_nowait()
+        if event is None or key == event:
+            found.append((key, value))
+    return found
+
+
+@pytest.fixture
+def bus():
+    return EventBus()
+
+
+@pytest.fixture
+def droidcam():
+    cam = FakeDroidCam(size=(320, 240), fps=30).start()
+    yield cam
+    cam.stop()
@@ -0,0 +1,106 @@
+import socket
+import time
+
+import pytest
+
+from adb_client import AdbClient, AdbError, _read_status, _read_length_prefixed, _send_request, parse_devices
+from fake_adb_server import FakeAdbServer
+
+
+@pytest.fixture
+def server():
+    srv = FakeAdbServer(devices=["emu-1", "emu-2"]).start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def client(server):
+    c = AdbClient(*server.address, timeout=2.0)
+    yield c
+    c.close()
+
+
+def test_request_framing():
+    a, b = socket.socketpair()
+    try:
+        _send_request(a, "host:version")
+        assert b.recv(64) == b"000chost:version"
+        a.sendall(b"OKAY0005hello")
+        _read_status(b)
+        assert _read_length_prefixed(b) == "hello"
+        a.sendall(b"FAIL0009not found")
+        with pytest.raises(AdbError, match="not found"):
+            _read_status(b)
+        a.sendall(b"WHAT")
+        with pytest.raises(AdbError, match="unexpected"):
+            _read_status(b)
+    finally:
+        a.close()
+        b.close()
+
+
+def test_parse_devices():
+    assert parse_devices("emu-1\tdevice\nemu-2\toffline\n\n") == [("emu-1", "device"), ("emu-2", "offline")]
+
+
+def test_host_services(client):
+    assert client.version() == 0x29
+    assert client.devices() == [("emu-1", "device"), ("emu-2", "device")]
+    with pytest.raises(AdbError, match="not found"):
+        client.shell_oneshot("nope", "true")
+
+
+def test_shell_output_and_exit_code(client):
+    assert client.shell("emu-1", "echo hi") == ("hi\n", 0)
+    assert client.shell("emu-1", "false")[1] == 1
+    assert client.shell_oneshot("emu-1", "getprop ro.serialno") == ("emu-1\n", 0)
+
+
+def test_session_is_reused(server, client):
+    client.shell("emu-1", "true")
+    session = client._sessions["emu-1"]
+    opened = server.requests  # host:transport + shell,raw:
+    for i in range(5):
+        assert client.shell("emu-1", f"echo {i}") == (f"{i}\n", 0)
+    assert server.requests == opened
+    assert client._sessions["emu-1"] is session
+
+
+def test_busy_session_falls_back_to_oneshot(server, client):
+    client.shell("emu-1", "true")
+    session = client._sessions["emu-1"]
+    before = server.requests
+    with session.lock:  # another thread is using the session
+        assert client.shell("emu-1", "echo busy") == ("busy\n", 0)
+    assert server.requests == before + 2  # one-shot transport + shell:
+    assert client._sessions["emu-1"] is session
+
+
+def test_stale_session_runs_command_once(server, client):
+    client.shell("emu-1", "true")
+    session = client._sessions["emu-1"]
+    session.sock.shutdown(socket.SHUT_RD)  # closed while idle
+    assert client.shell("emu-1", "input tap 1 2") == ("", 0)
+    assert server.get_device("emu-1").taps == [(1, 2)]
+    assert client._sessions.get("emu-1") is not session
+
+
+def test_failure_after_send_is_not_retried(server, client):
+    client.shell("emu-1", "true")
+    with pytest.raises(OSError):
+        client.shell("emu-1", "input tap 3 4; sleep 1", timeout=0.2)
+    time.sleep(1.0)
+    assert server.get_device("emu-1").taps == [(3, 4)]
+    assert "emu-1" not in client._sessions
+    # the next call opens a fresh session
+    assert client.shell("emu-1", "echo again") == ("again\n", 0)
+
+
+def test_forward_and_killforward(server, client):
+    client.forward("emu-2", 15555, 4747)
+    assert server.forwards["tcp:15555"] == ("emu-2", "tcp:4747")
+    client.killforward("emu-2", 15555)
+    assert "tcp:15555" not in server.forwards
+    with pytest.raises(AdbError):
+        client.killforward("emu-2", 15555)
@@ -0,0 +1,79 @@
+import socket
+import time
+
+import camera_control
+from camera_control import CameraControl
+
+from conftest import drain, wait_for
+
+
+def _result(bus):
+    assert wait_for(lambda: not bus.events.empty())
+    (_, value), = drain(bus, "CTRL_RESULT")
+    return value
+
+
+def test_coalesced_zoom_presses_are_all_sent(droidcam, bus):
+    ctrl = CameraControl(0, droidcam.address[1], bus)
+    for action in ("zoomin", "zoomin", "zoomin", "zoomout", "zoomin"):
+        ctrl.submit(action)  # queued before the worker runs: coalesced to +3
+    ctrl.start()
+    try:
+        cam_idx, action, ok, latency_ms, presses, detail = _result(bus)
+        assert (cam_idx, action, ok, presses) == (0, "zoomin", True, 3)
+        assert droidcam.controls == {"zoomin": 3}
+        assert ctrl.sent == 3
+        ctrl.submit("led_toggle")
+        _, action, ok, _, presses, _ = _result(bus)
+        assert (action, ok, presses) == ("led_toggle", True, 1)
+    finally:
+        ctrl.stop()
+
+
+def test_failed_zoom_reports_steps_sent(bus):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()  # nothing listens: every request fails
+    ctrl = CameraControl(0, port, bus)
+    ctrl.submit("zoomout")
+    ctrl.submit("zoomout")
+    ctrl.start()
+    try:
+        _, action, ok, _, presses, detail = _result(bus)
+        assert (action, ok, presses) == ("zoomout", False, 0)
+        assert detail.endswith("after 0/2 steps")
+    finally:
+        ctrl.stop()
+
+
+def test_timed_out_command_is_not_resent(droidcam, bus, monkeypatch):
+    monkeypatch.setattr(camera_control, "CONTROL_TIMEOUT", 0.3)
+    ctrl = CameraControl(0, droidcam.address[1], bus)
+    ctrl.start()
+    try:
+        ctrl.submit("af")  # open the keep-alive connection first
+        assert _result(bus)[2] is True
+        droidcam.control_delay = 0.8  # the phone toggles the LED, then answers too late
+        ctrl.submit("led_toggle")
+        _, action, ok, _, presses, _ = _result(bus)
+        assert (action, ok, presses) == ("led_toggle", False, 0)
+        time.sleep(1.0)
+        assert droidcam.controls["led_toggle"] == 1
+    finally:
+        ctrl.stop()
+
+
+def test_stale_keep_alive_connection_is_retried(droidcam, bus):
+    ctrl = CameraControl(0, droidcam.address[1], bus)
+    ctrl.start()
+    try:
+        ctrl.submit("af")
+        assert _result(bus)[2] is True
+        ctrl.conn.sock.shutdown(socket.SHUT_RDWR)  # as if the phone dropped the idle connection
+        ctrl.submit("led_toggle")
+        _, action, ok, _, presses, _ = _result(bus)
+        assert (action, ok, presses) == ("led_toggle", True, 1)
+        assert droidcam.controls["led_toggle"] == 1
+    finally:
+        ctrl.stop()
@@ -0,0 +1,54 @@
+import csv
+import json
+import os
+import time
+
+import utils
+from capture_core import CaptureCore
+from capture_settings import CaptureSettings
+from fake_droidcam import start_fake_rig
+from log_sink import LOG_FILE
+
+
+def _pump(core, bus, predicate, timeout=10.0):
+    """Chạy event loop như headless.py tới khi predicate() đúng."""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        event, values = bus.read(timeout=50)
+        core.dispatch(event, values)
+    return predicate()
+
+
+def test_devices_recording_and_shutdown(bus, tmp_path, monkeypatch):
+    adb, cams = start_fake_rig(2, size=(160, 120), fps=20)
+    # the device manager talks to the fake adb server
+    monkeypatch.setattr(utils._adb_client, "port", adb.address[1])
+    core = CaptureCore(bus, str(tmp_path), 10, CaptureSettings(), max_cameras=2, startup_workers=2)
+    try:
+        core.start()
+        # before any device: cameras join the sync group as they arrive
+        core.start_recording("jpg", "mjpg", 60.0, sync=True)
+        assert _pump(core, bus, lambda: sum(bool(r) for r in core.cam_running.values()) == 2)
+        assert core.cam_saving == {0: True, 1: True}
+        assert _pump(core, bus, lambda: core.sync.frozen)  # settled after SYNC_SETTLE
+        assert _pump(core, bus, lambda: core.sync.stats()["sets"] >= 5)
+
+        adb.remove_device("fake-0002")
+        assert _pump(core, bus, lambda: core.cam_clients.get(1) is None)
+        assert core.cam_saving[1] is False and core.sync.members == {0}
+    finally:
+        core.close()
+        for cam in cams:
+            cam.stop()
+        adb.stop()
+    root = core.session_root
+    with open(os.path.join(root, "sync_index.csv"), newline="") as f:
+        statuses = {row["status"] for row in csv.DictReader(f)}
+    assert "ok" in statuses
+    with open(os.path.join(root, LOG_FILE), encoding="utf-8") as f:
+        lines = [json.loads(line)["msg"] for line in f]
+    # same shutdown as both front ends: record stats, then the sync summary
+    stats = [i for i, m in enumerate(lines) if m.startswith("cam1 recorded")]
+    summary = [i for i, m in enumerate(lines) if m.startswith("Sync: ")]
+    assert stats and summary and stats[-1] < summary[-1]
+    assert any(m == "Sync group: cam1, cam2, recording frame sets" for m in lines)
@@ -0,0 +1,82 @@
+import os
+import time
+
+import cv2
+
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG
+from fake_droidcam import FakeDroidCam
+from frame_index import FrameIndex, FLAG_REPEAT, INDEX_FILE, NAMES_FILE
+
+from conftest import wait_for
+
+
+def test_repeats_are_indexed_not_written(bus, tmp_path):
+    # the phone sends each image 3 times: 30 fps stream, 10 distinct images/s
+    cam = FakeDroidCam(size=(320, 240), fps=30, repeat=3).start()
+    folder = str(tmp_path / "cam1")
+    client = CameraClient(0, cam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG)
+    client.set_save_folder(folder)
+    try:
+        client.start_capture()
+        assert wait_for(lambda: client.preview.seq > 0)
+        client.metrics_snapshot()  # start the metrics interval here
+        previewed = client.preview.seq
+        client.set_saving(True, mode="jpg")
+        time.sleep(1.5)
+        client.set_saving(False)
+        snap = client.metrics_snapshot()
+        previewed = client.preview.seq - previewed
+    finally:
+        client.stop_capture()
+        cam.stop()
+    stats = client.record_stats()
+    assert stats["written"] > 0 and stats["repeats"] >= stats["written"]
+    assert snap["repeats"] > 0
+    assert snap["source_fps"] < snap["fps"] / 2
+    # only distinct images reach the preview
+    assert previewed <= snap["frames"] - snap["repeats"] + 1
+
+    files = [n for n in os.listdir(folder) if n not in (INDEX_FILE, NAMES_FILE)]
+    assert len(files) == stats["written"]
+    with FrameIndex(folder) as index:
+        entries = [index[i] for i in range(len(index))]
+    # repeats of an image seen before recording started have nothing to point at
+    first = entries[0].seq
+    assert entries[0].flags == 0 and first < 3
+    assert [e.seq for e in entries] == list(range(first, stats["written"] + stats["repeats"]))
+    for prev, entry in zip(entries, entries[1:]):
+        assert entry.ts >= prev.ts
+        if entry.flags & FLAG_REPEAT:
+            assert (entry.path, entry.offset, entry.size) == (prev.path, prev.offset, prev.size)
+        else:
+            assert entry.path != prev.path and os.path.exists(entry.path)
+
+
+def test_repeats_keep_segment_duration(bus, tmp_path):
+    # the segment container has a fixed fps: dropping repeats would play 3x too fast
+    cam = FakeDroidCam(size=(320, 240), fps=30, repeat=3).start()
+    folder = str(tmp_path / "cam1")
+    client = CameraClient(0, cam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG)
+    client.set_save_folder(folder)
+    try:
+        client.start_capture()
+        assert wait_for(lambda: client.preview.seq > 0)
+        client.set_saving(True, mode="segment")
+        time.sleep(2.0)
+        client.set_saving(False)
+    finally:
+        client.stop_capture()
+        cam.stop()
+    assert client.flush_recording()
+    stats = client.record_stats()
+    assert stats["repeats"] > stats["written"] > 0
+
+    with open(os.path.join(folder, "segment_0001.csv")) as f:
+        epochs = [float(line.split(",")[2]) for line in f.readlines()[1:]]
+    video = cv2.VideoCapture(os.path.join(folder, "segment_0001.avi"))
+    frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = video.get(cv2.CAP_PROP_FPS)
+    video.release()
+    # repeats of an image seen before recording started have nothing to copy
+    assert frames == len(epochs) and 0 <= stats["written"] + stats["repeats"] - frames < 3
+    assert abs(frames / fps - (epochs[-1] - epochs[0])) < 0.3
@@ -0,0 +1,46 @@
+import socket
+
+from adb_client import AdbClient
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG
+from fake_droidcam import start_fake_rig, DROIDCAM_PORT
+
+from conftest import wait_for
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_forwards_relay_to_each_fake_phone(bus):
+    adb, cams = start_fake_rig(2, size=(160, 120), fps=20)
+    client_adb = AdbClient(port=adb.address[1])
+    clients = []
+    try:
+        serials = [serial for serial, state in client_adb.devices() if state == "device"]
+        assert serials == ["fake-0001", "fake-0002"]
+        for i, serial in enumerate(serials):
+            port = _free_port()
+            client_adb.forward(serial, port, DROIDCAM_PORT)
+            client = CameraClient(i, port, bus, fps=20, source=CAPTURE_SOURCE_MJPEG)
+            clients.append(client)
+            assert client.start_capture()
+        assert wait_for(lambda: all(c.preview.seq > 3 for c in clients))
+        # every stream came from its own phone through its own forward
+        assert all(cam.frames_sent > 3 for cam in cams)
+        assert sorted(adb.forwards) == sorted(f"tcp:{c.local_port}" for c in clients)
+
+        # unplugging a phone removes its forward and closes the relay
+        adb.remove_device("fake-0002")
+        assert list(adb.forwards) == [f"tcp:{clients[0].local_port}"]
+        with socket.socket() as s:
+            s.settimeout(1.0)
+            assert s.connect_ex(("127.0.0.1", clients[1].local_port)) != 0
+    finally:
+        for client in clients:
+            client.stop_capture()
+        client_adb.close()
+        adb.stop()
+        for cam in cams:
+            cam.stop()
@@ -0,0 +1,60 @@
+import datetime
+import os
+
+from frame_index import FrameIndexWriter, FrameIndex, FLAG_REPEAT, INDEX_FILE
+
+T0 = 1_700_000_000.0
+
+
+def _dt(ts):
+    return datetime.datetime.fromtimestamp(ts)
+
+
+def test_out_of_order_adds_are_written_in_seq_order(tmp_path):
+    writer = FrameIndexWriter(str(tmp_path))
+    writer.add(1, _dt(T0 + 0.1), "b.jpg")
+    writer.add(2, _dt(T0 + 0.2), "c.jpg")
+    writer.add_repeat(4, _dt(T0 + 0.4))
+    writer.skip(3)  # dropped frame
+    writer.add(0, _dt(T0), "a.jpg")
+    writer.close()
+    with FrameIndex(str(tmp_path)) as index:
+        entries = [index[i] for i in range(len(index))]
+    assert [e.seq for e in entries] == [0, 1, 2, 4]
+    assert [os.path.basename(e.path) for e in entries] == ["a.jpg", "b.jpg", "c.jpg", "c.jpg"]
+    assert [e.flags for e in entries] == [0, 0, 0, FLAG_REPEAT]
+
+
+def test_bisect_and_between(tmp_path):
+    writer = FrameIndexWriter(str(tmp_path))
+    for seq in range(100):
+        writer.add(seq, _dt(T0 + seq * 0.1), "segment.avi", offset=seq)
+    writer.close()
+    with FrameIndex(str(tmp_path)) as index:
+        assert len(index) == 100
+        assert index.bisect(T0 - 1) == 0
+        assert index.bisect(T0 + 2.05) == 21
+        assert index.bisect(T0 + 100) == 100
+        frames = index.between(T0 + 1.0, T0 + 1.5)
+        assert [f.offset for f in frames] == [10, 11, 12, 13, 14]
+        assert index.between(T0 + 20, T0 + 30) == []
+        assert index[-1].offset == 99
+
+
+def test_reopen_after_crash_drops_partial_entry_and_continues(tmp_path):
+    writer = FrameIndexWriter(str(tmp_path))
+    for seq in range(3):
+        writer.add(seq, _dt(T0 + seq), f"{seq}.jpg")
+    writer.close()
+    # a crash in the middle of an entry
+    with open(tmp_path / INDEX_FILE, "ab") as f:
+        f.write(b"\x00" * 7)
+    writer = FrameIndexWriter(str(tmp_path))
+    writer.add_repeat(0, _dt(T0 + 3))  # repeat of the last frame recorded before
+    writer.add(1, _dt(T0 + 4), "4.jpg")
+    writer.close()
+    with FrameIndex(str(tmp_path)) as index:
+        entries = [index[i] for i in range(len(index))]
+    assert [e.seq for e in entries] == [0, 1, 2, 3, 4]
+    assert entries[3].flags == FLAG_REPEAT and entries[3].path == entries[2].path
+    assert os.path.basename(entries[4].path) == "4.jpg"
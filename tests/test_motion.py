@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG
+from frame_index import FrameIndex
+from motion import MotionTrigger
+
+from conftest import drain, wait_for
+
+
+def _image(value):
+    return np.full((60, 80, 3), value, dtype=np.uint8)
+
+
+def test_pre_roll_and_post_roll():
+    # 8 fps: ts = i / 8 keeps the arithmetic exact
+    trigger = MotionTrigger(pre_roll=0.5, post_roll=1.0, jpeg_interval=0)
+    for i in range(16):  # 2 s of a static scene
+        out, changed = trigger.process(_image(0), i / 8)
+        assert out == [] and not changed
+    out, changed = trigger.process(_image(255), 16 / 8)  # activity at 2.0 s
+    assert changed and trigger.active
+    # 0.5 s before the last idle frame, then the active one
+    assert [ts for ts, _ in out] == [1.375, 1.5, 1.625, 1.75, 1.875, 2.0]
+    assert trigger.discarded == 11
+    recorded = []
+    for i in range(17, 40):
+        out, changed = trigger.process(_image(255), i / 8)
+        recorded.extend(ts for ts, _ in out)
+        if changed:
+            break
+    assert not trigger.active
+    assert recorded[-1] == 3.0 and i / 8 == 3.125  # recorded up to 1 s after the activity
+
+
+def test_repeats_end_the_post_roll():
+    trigger = MotionTrigger(pre_roll=0.5, post_roll=0.5, jpeg_interval=0)
+    trigger.process(_image(0), 0.0)
+    trigger.process(_image(255), 0.125)
+    assert trigger.active
+    assert not trigger.repeat(0.5)
+    assert trigger.repeat(0.75)
+    assert not trigger.active and trigger.last_score == 0.0
+
+
+def test_motion_recording_through_fake_droidcam(droidcam, bus, tmp_path):
+    droidcam.still = True
+    folder = str(tmp_path / "cam1")
+    client = CameraClient(0, droidcam.address[1], bus, fps=20, source=CAPTURE_SOURCE_MJPEG)
+    client.set_save_folder(folder)
+    client.start_capture()
+    try:
+        assert wait_for(lambda: client.preview.seq > 0)
+        client.set_saving(True, mode="jpg", trigger="motion")
+        client.motion.pre_roll = 0.5
+        client.motion.post_roll = 0.5
+        time.sleep(1.0)
+        assert client.record_stats()["submitted"] == 0
+        started = time.time()
+        droidcam.still = False
+        time.sleep(1.0)
+        droidcam.still = True
+        stopped = time.time()
+        states = []
+        # the static scene is a stream of repeats: the post-roll still ends
+        assert wait_for(lambda: states.extend(v[1] for _, v in drain(bus, "MOTION")) or states == [True, False])
+        time.sleep(0.5)
+        client.set_saving(False)
+    finally:
+        client.stop_capture()
+    with FrameIndex(folder) as index:
+        stamps = [index.ts(i) for i in range(len(index))]
+    assert len(stamps) >= 15
+    assert started - 0.5 - 0.2 <= stamps[0] <= started + 0.2  # pre-roll
+    assert stamps[-1] <= stopped + 0.2  # nothing new once the scene is still
+
+
+def test_pre_roll_is_capped_by_memory():
+    frame_size = _image(0).nbytes
+    trigger = MotionTrigger(pre_roll=10.0, jpeg_interval=0, pre_roll_bytes=5 * frame_size)
+    for i in range(40):
+        trigger.process(_image(0), i / 8)
+        assert trigger.buffer_bytes <= 5 * frame_size
+    assert len(trigger.buffer) == 5 and trigger.discarded == 35
+    out, changed = trigger.process(_image(255), 40 / 8)
+    assert changed and [ts for ts, _ in out] == [4.375, 4.5, 4.625, 4.75, 4.875, 5.0]
+    assert trigger.buffer_bytes == 0
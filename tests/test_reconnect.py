@@ -0,0 +1,123 @@
+import threading
+import time
+
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG, WATCHDOG_INTERVAL
+from fake_droidcam import FakeDroidCam
+
+from conftest import drain, wait_for
+
+
+def _events(bus, seen):
+    seen.extend(key for key, _ in drain(bus))
+    return seen
+
+
+def _frames_flowing(client, timeout=5.0):
+    seq = client.preview.seq
+    return wait_for(lambda: client.preview.seq > seq + 3, timeout)
+
+
+def test_watchdog_tears_down_a_stalled_read(droidcam, bus):
+    # socket timeout 5 s, watchdog at 0.5 s: only the watchdog can end the stall
+    client = CameraClient(0, droidcam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG, read_timeout=5.0)
+    client.start_capture()
+    try:
+        assert _frames_flowing(client)
+        client.read_timeout = 0.5
+        droidcam.stall(1.5)
+        seen = []
+        assert wait_for(lambda: "CAM_RECONNECTED" in _events(bus, seen), timeout=10.0)
+        assert seen.index("CAM_STALLED") < seen.index("CAM_RECONNECTING") < seen.index("CAM_RECONNECTED")
+        assert client.stalls == 1 and client.reconnects == 1
+        assert _frames_flowing(client)
+    finally:
+        client.stop_capture()
+
+
+def test_reconnects_and_reforwards_when_the_server_comes_back(bus):
+    cam = FakeDroidCam(size=(320, 240), fps=30).start()
+    port = cam.address[1]
+    client = CameraClient(0, port, bus, fps=30, source=CAPTURE_SOURCE_MJPEG, read_timeout=1.0)
+    reforwards = []
+    client.reforward = lambda: reforwards.append(time.monotonic())
+    client.start_capture()
+    try:
+        assert _frames_flowing(client)
+        cam.stop()  # phone unplugged / app killed
+        seen = []
+        assert wait_for(lambda: "CAM_RECONNECTING" in _events(bus, seen))
+        time.sleep(1.5)  # a few failed attempts with backoff
+        cam = FakeDroidCam(port=port, size=(320, 240), fps=30).start()
+        assert wait_for(lambda: "CAM_RECONNECTED" in _events(bus, seen), timeout=15.0)
+        assert reforwards  # the adb forward is recreated after REFORWARD_AFTER_ATTEMPTS
+        assert client.running and client.error_msg is None
+        assert _frames_flowing(client)
+    finally:
+        client.stop_capture()
+        cam.stop()
+
+
+def test_stop_ends_the_reconnect_loop(bus):
+    cam = FakeDroidCam(size=(320, 240), fps=30).start()
+    client = CameraClient(0, cam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG, read_timeout=1.0)
+    client.start_capture()
+    try:
+        assert _frames_flowing(client)
+        cam.stop()
+        assert wait_for(lambda: "CAM_RECONNECTING" in [k for k, _ in drain(bus)])
+        thread = client.thread
+        client.stop_capture()
+        thread.join(3.0)
+        assert not thread.is_alive()
+        assert not client.running
+    finally:
+        client.stop_capture()
+
+
+class _StuckCapture:
+    """Backend bỏ qua timeout: grab() treo tới khi được thả, không có abort()."""
+
+    def __init__(self):
+        self.released = threading.Event()
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        self.released.wait(10.0)
+        return False
+
+    def release(self):
+        self.released.set()
+
+
+def test_replacing_a_stuck_thread_keeps_the_start_token(droidcam, bus):
+    client = CameraClient(0, droidcam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG, read_timeout=0.5)
+    client.start_capture()
+    stuck = _StuckCapture()
+    try:
+        assert _frames_flowing(client)
+        token = client.start_token()
+        old_thread = client.thread
+        with client.lock:
+            client.capture = stuck
+        assert wait_for(lambda: client.thread is not old_thread, timeout=5.0)
+        assert old_thread.is_alive()  # left behind, still stuck in grab()
+        assert client.start_token() == token  # a pending start_capture(token) is not refused
+        assert _frames_flowing(client)
+    finally:
+        client.stop_capture()
+        stuck.released.set()
+
+
+def test_quick_restart_leaves_one_watchdog(droidcam, bus):
+    client = CameraClient(0, droidcam.address[1], bus, fps=30, source=CAPTURE_SOURCE_MJPEG)
+    client.start_capture()
+    try:
+        old = client.watchdog
+        client.stop_capture()
+        client.start_capture()
+        old.join(2 * WATCHDOG_INTERVAL)
+        assert not old.is_alive() and client.watchdog.is_alive()
+    finally:
+        client.stop_capture()
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+import pytest
+
+import recorder
+from camera_client import CameraClient
+from retention import DiskUsage
+from recorder import FrameRecorder, OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
+
+from conftest import wait_for
+
+
+class GatedSink:
+    """Sink giả: write() chờ gate mở, ghi lại frame đã nhận."""
+
+    ordered = True  # one writer: the queue fills deterministically
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.frames = []
+        self.closed = False
+
+    def write(self, ts, frame):
+        self.gate.wait(5.0)
+        self.frames.append(frame)
+        return (f"{frame}.jpg",)
+
+    def close(self):
+        self.closed = True
+
+
+def _busy_recorder(policy, queue_size=2):
+    """Recorder có writer đang kẹt ở frame 0 và hàng đợi rỗng."""
+    sink = GatedSink()
+    rec = FrameRecorder(0, sink, queue_size=queue_size, policy=policy)
+    rec.start()
+    rec.submit(0)
+    assert wait_for(lambda: rec.queue.qsize() == 0)
+    return rec, sink
+
+
+@pytest.mark.parametrize(
+    "policy, written",
+    [(OVERFLOW_DROP_NEWEST, [0, 1, 2]), (OVERFLOW_DROP_OLDEST, [0, 3, 4])],
+)
+def test_overflow_policies(policy, written):
+    rec, sink = _busy_recorder(policy)
+    results = [rec.submit(i) for i in range(1, 5)]
+    sink.gate.set()
+    rec.stop(wait=True)
+    assert sink.frames == written and sink.closed
+    stats = rec.stats()
+    assert (stats["submitted"], stats["written"], stats["dropped"]) == (5, 3, 2)
+    if policy == OVERFLOW_DROP_NEWEST:
+        assert results == [True, True, False, False]
+
+
+def test_block_policy_gives_up_after_timeout(monkeypatch):
+    monkeypatch.setattr(recorder, "BLOCK_TIMEOUT", 0.1)
+    rec, sink = _busy_recorder(OVERFLOW_BLOCK, queue_size=1)
+    assert rec.submit(1)
+    started = time.monotonic()
+    assert not rec.submit(2)
+    assert time.monotonic() - started >= 0.1
+    sink.gate.set()
+    rec.stop(wait=True)
+    assert sink.frames == [0, 1] and rec.stats()["dropped"] == 1
+
+
+def test_stop_does_not_block_on_a_full_queue():
+    rec, sink = _busy_recorder(OVERFLOW_BLOCK)
+    assert rec.submit(1) and rec.submit(2)  # queue full, writer stuck
+    started = time.monotonic()
+    rec.stop()
+    assert time.monotonic() - started < 0.1
+    # a frame arriving after stop() is counted, never queued
+    assert not rec.submit(3)
+    sink.gate.set()
+    for t in rec.workers:
+        t.join(2.0)
+    assert sink.frames == [0, 1, 2] and sink.closed
+    stats = rec.stats()
+    assert (stats["submitted"], stats["written"], stats["dropped"]) == (3, 3, 1)
+
+
+class UnorderedSink(GatedSink):
+    ordered = False
+
+
+def test_idle_writers_exit_after_stop():
+    sink = UnorderedSink()
+    sink.gate.set()
+    # room for one stop marker only: the other writers notice the stop on their own
+    rec = FrameRecorder(0, sink, queue_size=1, workers=3, policy=OVERFLOW_DROP_OLDEST)
+    rec.start()
+    assert len(rec.workers) == 3
+    rec.stop(wait=True)
+    assert sink.closed and rec.alive_workers == 0
+
+
+def test_flush_recording_waits_for_queued_frames(droidcam, bus, tmp_path):
+    folder = str(tmp_path / "cam1")
+    client = CameraClient(0, droidcam.address[1], bus, fps=30)
+    client.usage = DiskUsage()
+    client.set_save_folder(folder)
+    client.start_capture()
+    try:
+        assert wait_for(lambda: client.preview.seq > 0)
+        client.set_saving(True, mode="png")
+        time.sleep(1.0)
+    finally:
+        client.stop_capture()
+    assert client.flush_recording()
+    stats = client.record_stats()
+    assert stats["queue_depth"] == 0 and stats["written"] == stats["submitted"] - stats["dropped"] > 0
+    # what the session size file is written from
+    images = [os.path.join(folder, n) for n in os.listdir(folder) if n.startswith("frame_")]
+    assert len(images) == stats["written"]
+    assert client.usage.total == sum(os.path.getsize(p) for p in images)
@@ -0,0 +1,117 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG
+from startup import StartupOrchestrator, StartupTimeline
+
+from conftest import drain, wait_for
+
+
+class _SlowClient:
+    """Chiếm worker của pool trong `seconds` giây."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.running = False
+        self.error_msg = None
+        self.gate = threading.Event()
+
+    def start_token(self):
+        return 0
+
+    def start_capture(self, token=None):
+        self.gate.wait(self.seconds)
+        self.running = True
+        return True
+
+
+@pytest.fixture
+def silent_port():
+    # accepts connections (backlog) but never answers: opening the stream hangs until the timeout
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def _client(port, bus):
+    return CameraClient(0, port, bus, fps=10, source=CAPTURE_SOURCE_MJPEG, read_timeout=1.0)
+
+
+def test_bring_up_reports_and_marks_timeline(droidcam, bus):
+    timeline = StartupTimeline()
+    starter = StartupOrchestrator(bus, timeline, workers=2)
+    client = _client(droidcam.address[1], bus)
+    try:
+        starter.start(0, client)
+        assert wait_for(lambda: not bus.events.empty())
+        (event, (cam_idx, ok, error, seconds)), = drain(bus, "CAM_STARTED")
+        assert (cam_idx, ok, error) == (0, True, None)
+        assert client.running
+        assert {"queued", "stream_open"} <= set(timeline.cams[0])
+    finally:
+        starter.stop()
+        client.stop_capture()
+
+
+def test_queued_bring_up_is_cancelled(droidcam, bus):
+    starter = StartupOrchestrator(bus, workers=1)
+    blocker = _SlowClient(5.0)
+    client = _client(droidcam.address[1], bus)
+    try:
+        starter.start(0, blocker)
+        starter.start(1, client)
+        # DEVICE_REMOVED while cam2 waits for a worker
+        starter.cancel(1)
+        client.stop_capture()
+        blocker.gate.set()
+        assert wait_for(lambda: not starter.pending)
+        time.sleep(0.2)
+        assert not client.running and client.thread is None
+        assert [v[0] for _, v in drain(bus, "CAM_STARTED")] == [0]
+    finally:
+        starter.stop()
+
+
+def test_stop_while_opening_does_not_block_or_start(silent_port, bus):
+    starter = StartupOrchestrator(bus, workers=1)
+    client = _client(silent_port, bus)
+    try:
+        starter.start(0, client)
+        assert wait_for(lambda: client._opening)
+        t0 = time.monotonic()
+        starter.cancel(0)
+        client.stop_capture()
+        assert time.monotonic() - t0 < 0.5  # the GUI thread does not wait for the open
+        # both open attempts (MJPEG, then OpenCV) time out
+        assert wait_for(lambda: not client._opening and not starter.pending, timeout=6.0)
+        assert not client.running and client.thread is None
+        assert drain(bus, "CAM_STARTED") == []
+    finally:
+        starter.stop()
+
+
+def test_start_after_stop_is_refused(droidcam, bus):
+    client = _client(droidcam.address[1], bus)
+    token = client.start_token()
+    client.stop_capture()
+    assert client.start_capture(token) is None
+    assert not client.running
+    assert client.start_capture() is True
+    client.stop_capture()
+
+
+def test_stop_cancels_queued_jobs(bus):
+    starter = StartupOrchestrator(bus, workers=1)
+    blocker = _SlowClient(5.0)
+    queued = _SlowClient(0)
+    starter.start(0, blocker)
+    starter.start(1, queued)
+    starter.stop()
+    blocker.gate.set()
+    time.sleep(0.2)
+    assert not queued.running
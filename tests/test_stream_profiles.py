@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import pytest
+
+from camera_client import CameraClient, CAPTURE_SOURCE_MJPEG
+from capture_settings import StreamProfile, load_settings
+from fake_droidcam import make_frames
+from mjpeg_stream import JpegFrame
+from preview import PreviewPump, PreviewRenderer
+
+from conftest import wait_for
+
+
+@pytest.fixture
+def client(droidcam, bus, tmp_path):
+    c = CameraClient(0, droidcam.address[1], bus, fps=10, source=CAPTURE_SOURCE_MJPEG)
+    c.profile = StreamProfile("preview", (320, 240), None, None, None)
+    c.record_profile = StreamProfile("hd", (640, 480), 30.0, None, "jpg")
+    c.set_save_folder(str(tmp_path / "cam1"))
+    yield c
+    c.stop_capture()
+
+
+def test_record_profile_reopens_stream_and_restores_user_fps(droidcam, client):
+    client.start_capture()
+    assert client.running
+    assert client.fps == 10
+    client.set_saving(True)
+    assert client.fps == 30.0
+    assert wait_for(lambda: "640x480" in droidcam.requested)
+    client.fps = 12  # -APPLYFPS- while the record profile pins the fps
+    assert client.fps == 30.0
+    client.set_saving(False)
+    assert client.fps == 12
+    assert wait_for(lambda: droidcam.requested[-1:] == ["320x240"])
+    assert client.uri.endswith("/video?320x240")
+
+
+def test_stream_id_changes_on_reopen(droidcam, client):
+    client.start_capture()
+    first = client.stream_id
+    client.set_saving(True)
+    assert wait_for(lambda: client.stream_id > first)
+
+
+def test_load_settings(tmp_path):
+    path = tmp_path / "capture_settings.dat"
+    path.write_text(
+        "ip=192.168.0.7\n"
+        "profile.small.size=640x480  # comment\n"
+        "profile.hd.size=1280x720\n"
+        "profile.hd.fps=30\n"
+        "profile.hd.format=jpg\n"
+        "preview_profile=small\n"
+        "record_profile=hd\n"
+        "cam2.record_profile=small\n"
+    )
+    settings = load_settings(str(path))
+    assert settings.ip == "192.168.0.7"
+    preview, record = settings.camera_profiles(0)
+    assert preview.size == (640, 480) and record.fps == 30.0 and record.format == "jpg"
+    assert settings.camera_profiles(1)[1].name == "small"
+    path.write_text("record_profile=missing\n")
+    with pytest.raises(ValueError, match=r":1: unknown profile"):
+        load_settings(str(path))
+
+
+def _jpeg(w, h):
+    return JpegFrame(make_frames(w, h, count=1)[0])
+
+
+def _rendered_size(data):
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return img.shape[1], img.shape[0]
+
+
+@pytest.mark.parametrize("first, second", [((640, 480), (1280, 960)), ((1280, 960), (320, 240))])
+def test_renderer_follows_resolution_change(first, second):
+    renderer = PreviewRenderer(size=(160, 120))
+    for _ in range(2):
+        assert _rendered_size(renderer.render(_jpeg(*first))) == (160, 120)
+    for _ in range(2):
+        assert _rendered_size(renderer.render(_jpeg(*second))) == (160, 120)
+    assert renderer.source_size == second
+
+
+class _Element:
+    def update(self, data=None):
+        self.data = data
+
+
+class _Client:
+    def __init__(self, frame, stream_id):
+        self.frame = frame
+        self.stream_id = stream_id
+        self.preview = self
+
+    def take(self):
+        frame, self.frame = self.frame, None
+        return frame
+
+
+def test_pump_forgets_source_size_when_stream_reopens():
+    pump = PreviewPump(fps=1000, size=(160, 120))
+    window = {"-IMG1-": _Element()}
+    pump.pump(window, {0: _Client(_jpeg(640, 480), 1)})
+    assert pump.renderers[0].source_size == (640, 480)
+    pump.last_draw.clear()
+    pump.pump(window, {0: _Client(_jpeg(320, 240), 2)})
+    assert pump.renderers[0].source_size == (320, 240)
+    assert _rendered_size(window["-IMG1-"].data) == (160, 120)
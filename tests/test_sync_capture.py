@@ -0,0 +1,75 @@
+import csv
+
+import pytest
+
+from sync_capture import SyncGroup
+
+
+class _Recorder:
+    def __init__(self):
+        self.frames = []
+
+    def submit(self, frame, ts):
+        self.frames.append(frame)
+
+
+@pytest.fixture
+def group(tmp_path):
+    g = SyncGroup(str(tmp_path), fps=10, max_skew=0.025, wait_ticks=3)
+    yield g
+    g.close()
+
+
+def _rows(group):
+    group.close()
+    with open(group.path, newline="") as f:
+        return [(int(r["tick"]), r["status"], int(r["cam"])) for r in csv.DictReader(f)]
+
+
+def test_nothing_is_emitted_before_membership_is_frozen(group):
+    rec = _Recorder()
+    group.join(0)
+    for tick in range(10):
+        group.offer(0, tick, tick / 10, f"a{tick}", rec)
+    assert rec.frames == [] and group.pending == {}
+    group.join(1)
+    assert group.freeze() == [0, 1]
+    group.offer(0, 20, 2.0, "a20", rec)
+    assert rec.frames == []  # cam2 is still missing
+    group.offer(1, 20, 2.01, "b20", rec)
+    assert sorted(rec.frames) == ["a20", "b20"]
+    assert _rows(group) == [(20, "ok", 1), (20, "ok", 2)]
+
+
+def test_single_camera_sets_are_incomplete_after_join_all(group):
+    rec = _Recorder()
+    group.join_all([0, 1])
+    for tick in range(5):
+        group.offer(0, tick, tick / 10, f"a{tick}", rec)
+    assert rec.frames == []
+    assert group.stats()["incomplete"] == 2  # ticks 0 and 1 are 3 ticks old
+    assert {status for _, status, _ in _rows(group)} == {"incomplete"}
+
+
+def test_camera_joining_after_freeze_is_expected_from_its_next_tick(group):
+    rec = _Recorder()
+    group.join_all([0])
+    first = group.clock.tick_at(group.clock.start)
+    group.offer(0, first, group.clock.start, "a", rec)
+    assert rec.frames == ["a"]
+    group.join(1)
+    since = group.since[1]
+    assert since > first
+    group.offer(0, since, group.clock.tick_time(since), "a2", rec)
+    assert rec.frames == ["a"]  # waits for cam2 now
+    group.offer(1, since, group.clock.tick_time(since) + 0.005, "b2", rec)
+    assert rec.frames == ["a", "a2", "b2"]
+
+
+def test_skewed_set_is_dropped(group):
+    rec = _Recorder()
+    group.join_all([0, 1])
+    group.offer(0, 1, 0.10, "a", rec)
+    group.offer(1, 1, 0.15, "b", rec)
+    assert rec.frames == []
+    assert group.stats()["dropped_skew"] == 1
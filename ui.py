@@ -1,25 +1,67 @@
 
 import PySimpleGUI as sg 
-def make_camera_frame(cam_idx):
+from recorder import (
+    RECORD_MODES,
+    SEGMENT_CODECS,
+    DEFAULT_RECORD_MODE,
+    DEFAULT_SEGMENT_CODEC,
+    DEFAULT_SEGMENT_SECONDS,
+)
+from motion import RECORD_TRIGGERS, DEFAULT_TRIGGER
+from preview import preview_size_for
+import re
+
+
+ALWAYS_VISIBLE_TILES = 2  # cam1/cam2 tiles are shown even before a device connects
+TILE_EVENT_RE = re.compile(r"^-(LED|AF|ZOOMIN|ZOOMOUT|EXPLON|EXPLOFF)(\d+)-$")
+
+
+def grid_columns(num_cameras):
+    return 2 if num_cameras <= 4 else 4
+
+
+def parse_tile_event(event):
+    """'-ZOOMIN3-' -> ('ZOOMIN', 2). Trả về (None, None) nếu không phải nút của tile."""
+    m = TILE_EVENT_RE.match(event) if isinstance(event, str) else None
+    if not m:
+        return None, None
+    return m.group(1), int(m.group(2)) - 1
+
+
+def make_camera_frame(cam_idx, preview_size):
+    n = cam_idx + 1
     return [
-        [sg.Image(key=f"-IMG{cam_idx+1}-")],
-        [sg.Button('LED ON/OFF', key=f'-LED{cam_idx+1}-', size=(12,2)),
-         sg.Button('AutoFocus', key=f'-AF{cam_idx+1}-', size=(12,2)),
-         sg.Button('Zoom +', key=f'-ZOOMIN{cam_idx+1}-', size=(12,2)),
-         sg.Button('Zoom -', key=f'-ZOOMOUT{cam_idx+1}-', size=(12,2)),
-         sg.Button('Exp.Lock ON', key=f'-EXPLON{cam_idx+1}-', size=(12,2)),
-         sg.Button('Exp.Lock OFF', key=f'-EXPLOFF{cam_idx+1}-', size=(12,2))]
+        [sg.Image(key=f"-IMG{n}-", size=preview_size)],
+        [sg.Text("Device:"), sg.Text("", key=f"-DEV{n}-", size=(20,1)),
+         sg.Text("Tap (x,y):"), sg.InputText("", key=f"-TAP{n}-", size=(10,1))],
+        [sg.Button('LED ON/OFF', key=f'-LED{n}-', size=(10,1)),
+         sg.Button('AutoFocus', key=f'-AF{n}-', size=(10,1)),
+         sg.Button('Zoom +', key=f'-ZOOMIN{n}-', size=(10,1))],
+        [sg.Button('Zoom -', key=f'-ZOOMOUT{n}-', size=(10,1)),
+         sg.Button('Exp.Lock ON', key=f'-EXPLON{n}-', size=(10,1)),
+         sg.Button('Exp.Lock OFF', key=f'-EXPLOFF{n}-', size=(10,1))],
+        [sg.Text("", key=f"-STATS{n}-", size=(48,1), font=("Courier", 8))]
     ]
 
+
+def make_camera_grid(num_cameras):
+    preview_size = preview_size_for(num_cameras)
+    cols = grid_columns(num_cameras)
+    tiles = [
+        sg.pin(sg.Frame(f"Cam{idx+1}", make_camera_frame(idx, preview_size),
+                        key=f"-TILE{idx+1}-", element_justification="center",
+                        visible=idx < ALWAYS_VISIBLE_TILES))
+        for idx in range(num_cameras)
+    ]
+    return [tiles[i:i + cols] for i in range(0, len(tiles), cols)]
+
+
 # ---------- Main Window ----------
-def make_main_window(default_fps):
+def make_main_window(default_fps, num_cameras=2):
     sg.theme("DarkBlue3")
-    
-    cam1_frame = sg.Frame("Cam1 (Left)", make_camera_frame(0), element_justification="center")
-    cam2_frame = sg.Frame("Cam2 (Right)", make_camera_frame(1), element_justification="center")
-    
+
     layout = [
-        [sg.Text("DroidCam USB Multi (max 2 devices)", font=("Helvetica", 16))],
+        [sg.Text(f"DroidCam USB Multi (max {num_cameras} devices)", font=("Helvetica", 16))],
         [
             sg.Text("FPS:"), sg.InputText(str(default_fps), key="-FPS-", size=(6,1)),
             sg.Button("Apply FPS", key="-APPLYFPS-"),
@@ -28,14 +70,22 @@ def make_main_window(default_fps):
             sg.Button("Start Recording", key="-START_REC-"),
             sg.Button("Stop Recording", key="-STOP_REC-"),
         ],
-        [cam1_frame, cam2_frame],
-        [sg.Text("Cam1 device:"), sg.Text("", key="-DEV1-"),
-         sg.Text("   Cam2 device:"), sg.Text("", key="-DEV2-")],
-        [sg.Text("Tap coords Cam1 (x,y):"), sg.InputText("", key="-TAP1-", size=(16,1)),
-         sg.Text("Tap coords Cam2:"), sg.InputText("", key="-TAP2-", size=(16,1))],
+        [
+            sg.Text("Record mode:"),
+            sg.Combo(list(RECORD_MODES), default_value=DEFAULT_RECORD_MODE, key="-RECMODE-", readonly=True, size=(9,1)),
+            sg.Text("Codec:"),
+            sg.Combo(list(SEGMENT_CODECS), default_value=DEFAULT_SEGMENT_CODEC, key="-CODEC-", readonly=True, size=(6,1)),
+            sg.Text("Segment (s):"),
+            sg.InputText(str(int(DEFAULT_SEGMENT_SECONDS)), key="-SEGSEC-", size=(6,1)),
+            sg.Text("Trigger:"),
+            sg.Combo(list(RECORD_TRIGGERS), default_value=DEFAULT_TRIGGER, key="-TRIGGER-", readonly=True, size=(7,1)),
+            sg.Checkbox("Sync cameras", key="-SYNC-", default=False),
+        ],
+        [sg.Column(make_camera_grid(num_cameras), scrollable=num_cameras > 4,
+                   vertical_scroll_only=True, expand_x=True, expand_y=True)],
         [sg.Text("Package/Activity to start (optional):"), sg.InputText("", key="-PKGACT-", size=(60,1))],
         [sg.Multiline(default_text="Status messages will appear here...", size=(80,6), key="-LOG-")],
         [sg.Button("Exit")]
     ]
-    
-    return sg.Window("DroidCam USB Multi", layout, finalize=True)
\ No newline at end of file
+
+    return sg.Window("DroidCam USB Multi", layout, finalize=True, resizable=True)
@@ -1,9 +1,16 @@
 
 import datetime
+import os
 import subprocess
 import uuid
 import time
+from adb_client import AdbClient, AdbError
+from log_sink import log_sink
 DEVICE_REMOTE_PORT = 4747
+# "native": nói trực tiếp giao thức adb server (localhost:5037), không fork `adb`
+# "subprocess": gọi binary `adb` cho mỗi lệnh như trước
+ADB_BACKEND = os.environ.get("DROIDCAM_ADB_BACKEND", "native")
+_adb_client = AdbClient()
    # Zoom in
 def now_timestamp_str():
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -37,6 +44,47 @@ def run_adb(args, timeout=5):
     elif not isinstance(args, list):
         raise TypeError(f"args must be list or str, got {type(args)}")
 
+    if ADB_BACKEND == "native":
+        res = _run_adb_native(args, timeout)
+        if res is not None:
+            return res
+    return _run_adb_subprocess(args, timeout)
+
+
+def _run_adb_native(args, timeout):
+    """
+    Chạy các lệnh adb hay dùng qua AdbClient. Trả về None nếu lệnh không được
+    hỗ trợ hoặc adb server chưa chạy (khi đó dùng binary `adb`, nó sẽ tự
+    khởi động server).
+    """
+    serial = None
+    if len(args) >= 2 and args[0] == "-s":
+        serial, args = args[1], args[2:]
+    try:
+        if args == ["devices"] and serial is None:
+            lines = "".join(f"{s}\t{st}\n" for s, st in _adb_client.devices())
+            return "List of devices attached\n" + lines.strip(), "", 0
+        if serial is None:
+            return None
+        if args[:1] == ["shell"] and len(args) > 1:
+            out, code = _adb_client.shell(serial, " ".join(args[1:]), timeout)
+            return out.strip(), "", code
+        if args[:2] == ["forward", "--remove"] and len(args) == 3:
+            _adb_client.killforward(serial, args[2][len("tcp:"):])
+            return "", "", 0
+        if args[:1] == ["forward"] and len(args) == 3:
+            _adb_client.forward(serial, args[1][len("tcp:"):], args[2][len("tcp:"):])
+            return "", "", 0
+    except ConnectionRefusedError:
+        return None
+    except AdbError as e:
+        return "", str(e), 1
+    except OSError as e:
+        return "", str(e), -1
+    return None
+
+
+def _run_adb_subprocess(args, timeout):
     cmd = ["adb"] + args
     try:
         p = subprocess.run(
@@ -103,8 +151,22 @@ def adb_toggle_led(serial):
     output = run_adb(serial, ["shell", "settings", "put", "system", "torch_enabled", "0"])
     return output is not None
 
-def get_battery_via_adb(serial,window):
-    """Trả về dict thông tin pin qua adb dumpsys battery"""
+BATTERY_STATUS_NAMES = {
+    1: "UNKNOWN",
+    2: "CHARGING",
+    3: "DISCHARGING",
+    4: "NOT CHARGING",
+    5: "FULL",
+}
+
+
+def get_battery_via_adb(serial, window=None):
+    """
+    Trả về dict thông tin pin qua adb dumpsys battery
+    (level, status, temperature °C). Không đụng tới GUI: hàm này chạy trên
+    thread nền, kết quả được gửi về GUI qua event BATTERY_UPDATE.
+    `window` chỉ giữ lại để tương thích với code cũ.
+    """
     out, err, code = run_adb(["-s", serial, "shell", "dumpsys", "battery"])
     if code != 0 or not out:
         return None
@@ -119,19 +181,14 @@ def get_battery_via_adb(serial,window):
         elif line.startswith("status:"):
             try:
                 st = int(line.split(":")[1].strip())
-                m = {
-                    1: "UNKNOWN",
-                    2: "CHARGING",
-                    3: "DISCHARGING",
-                    4: "NOT CHARGING",
-                    5: "FULL",
-                }
-                info["status"] = m.get(st, f"status_{st}")
+                info["status"] = BATTERY_STATUS_NAMES.get(st, f"status_{st}")
             except:
                 info["status"] = line.split(":")[1].strip()
-                
-    
-    log(window, f"Battery for {serial}: {info}")
+        elif line.startswith("temperature:"):
+            try:
+                info["temperature"] = int(line.split(":")[1].strip()) / 10.0
+            except:
+                pass
     return info
 
 
@@ -161,13 +218,14 @@ def adb_input_tap(serial, x, y):
     return code == 0
 
 
-def log(window, msg):
-    try:
-        cur = window['-LOG-'].get()
-        new = cur + "\n" + f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {msg}"
-        window['-LOG-'].update(new)
-    except:
-        pass
+def log(window, msg, level="info"):
+    """
+    Ghi log vào log_sink (an toàn từ mọi thread). -LOG- được cập nhật theo lô
+    khi GUI thread gọi log_sink.flush(window).
+    """
+    log_sink.write(msg, level)
+
+
 def adb_set_exposure(serial, value):
     """Set exposure, value can be 'auto', 'lock', numeric level etc."""
     # Device-specific: placeholder, may need camera2 API or app